@@ -0,0 +1,70 @@
+#
+# Benchmark: rows per second loading a table with the bulk loader's COPY and batched INSERT paths,
+# against one ORM add and commit per row (how a request writes).
+#
+# Needs Postgres, configured as for the API (POSTGRES_CONNECTION_STRING, ENVIRONMENT).
+#
+# Run with: poetry run python -m benchmarks.bulk_load
+#
+
+import datetime
+import time
+import uuid
+from typing import Any, Dict, Iterator
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from focus_api.db import create_engine
+from focus_api.db.bulk import copy_rows, insert_rows
+from focus_api.db.config import get_config
+from focus_api.models.base import Base
+
+ROWS = 20000
+ORM_ROWS = 1000
+
+
+class BenchmarkRow(Base):
+    __tablename__ = "benchmark_bulk_row"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    name: Mapped[str] = mapped_column(String)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+
+
+def generate_rows(count: int) -> Iterator[Dict[str, Any]]:
+    now = datetime.datetime.now(datetime.UTC)
+    for index in range(count):
+        yield {"id": uuid.uuid4(), "name": f"applicant {index}", "created_at": now}
+
+
+def main() -> None:
+    engine = create_engine(get_config(), name="benchmark")
+    table = BenchmarkRow.__table__
+    table.drop(engine, checkfirst=True)  # type: ignore[attr-defined]
+    table.create(engine)  # type: ignore[attr-defined]
+    try:
+        start = time.monotonic()
+        with Session(engine) as session:
+            for row in generate_rows(ORM_ROWS):
+                session.add(BenchmarkRow(**row))
+                session.commit()
+        print(f"{'orm per row':>12}: {ORM_ROWS / (time.monotonic() - start):10.0f} rows/s")
+
+        for name, load in (
+            ("executemany", lambda: insert_rows(engine, BenchmarkRow, generate_rows(ROWS))),
+            (
+                "values",
+                lambda: insert_rows(engine, BenchmarkRow, generate_rows(ROWS), method="values"),
+            ),
+            ("copy", lambda: copy_rows(engine, BenchmarkRow, generate_rows(ROWS))),
+        ):
+            result = load()
+            print(f"{name:>12}: {result.rows_per_second:10.0f} rows/s")
+    finally:
+        table.drop(engine)  # type: ignore[attr-defined]
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+#
+# Benchmark: throughput and latency of every operation in openapi.yaml, with regression checks.
+#
+# Each operation is called with a request built from the examples in the spec (see
+# example_value), first a few times to warm up and then --requests times, and is reported with
+# its requests per second, p50/p95/p99 latency and response statuses. The peak RSS of the process
+# serving the requests is reported with them.
+#
+# The app is served either
+#
+# - in process (--server inprocess, the default), through create_app().test_client(), which
+#   measures the app itself without a network or server in the way; or
+# - by real workers (--server uvicorn or --server gunicorn, with --workers), called over HTTP by
+#   --concurrency threads, which measures what a deployment would see.
+#
+# Like the API, this needs Postgres (POSTGRES_CONNECTION_STRING and ENVIRONMENT, e.g. from
+# `make start-db`). Operations calling external services answer 503 unless those are configured;
+# to include them, start the imposter mocks with `make start-external-apis` and set e.g.
+# USPS_BASE_URL=http://localhost:8080.
+#
+# --output writes the results as JSON, to keep as a baseline. --compare checks a run against a
+# baseline and exits with status 1 if any operation's throughput fell, or its p95 latency or the
+# peak RSS grew, by more than --threshold (a fraction). Only compare runs made on the same machine
+# with the same options; numbers from different machines aren't comparable.
+#
+# Run with: poetry run python -m benchmarks.endpoints [--server uvicorn] [--output results.json]
+#           poetry run python -m benchmarks.endpoints --compare results.json
+#
+
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from focus_api.app import get_specification_path
+from focus_api.utils.spec_cache import load_specification
+
+EXAMPLE_UUID = "6ddcf443-d1bf-4acd-83cc-b1f2d0dc2369"
+
+FORMAT_EXAMPLES = {
+    "uuid": EXAMPLE_UUID,
+    "date": "2024-05-08",
+    "date-time": "2024-05-08T12:34:56.789789+00:00",
+    "email": "a.b.c@email.com",
+}
+
+# A function sending one request, returning its status code
+Send = Callable[[str, str, Optional[Dict[str, Any]]], int]
+
+
+@dataclass
+class Operation:
+    operation_id: str
+    method: str
+    path: str
+    body: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class OperationResult:
+    requests: int
+    requests_per_second: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+
+def example_value(schema: Dict[str, Any]) -> Any:
+    """A value for a (resolved) schema, from its examples where it has them."""
+    if "example" in schema:
+        return schema["example"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "allOf" in schema:
+        value: Dict[str, Any] = {}
+        for part in schema["allOf"]:
+            value.update(example_value(part))
+        return value
+    if "oneOf" in schema or "anyOf" in schema:
+        return example_value((schema.get("oneOf") or schema["anyOf"])[0])
+
+    schema_type = schema.get("type", "object")
+    if schema_type == "object":
+        return {name: example_value(prop) for name, prop in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return []
+    if schema_type in ("number", "integer"):
+        return schema.get("minimum", 1)
+    if schema_type == "boolean":
+        return True
+    return FORMAT_EXAMPLES.get(schema.get("format", ""), "string")
+
+
+def get_operations(specification: Any) -> List[Operation]:
+    """An example request for each operation in the spec, in the order of the spec."""
+    base_path = specification["servers"][0]["url"].rstrip("/")
+    operations = []
+    for path, path_item in specification["paths"].items():
+        for method, operation in path_item.items():
+            if not isinstance(operation, dict) or "operationId" not in operation:
+                continue
+
+            for parameter in operation.get("parameters", []):
+                if parameter["in"] == "path":
+                    value = example_value(parameter.get("schema", {}))
+                    path = path.replace("{" + parameter["name"] + "}", str(value))
+
+            body = None
+            content = operation.get("requestBody", {}).get("content", {})
+            if "application/json" in content:
+                body = example_value(content["application/json"].get("schema", {}))
+
+            operations.append(
+                Operation(operation["operationId"], method.upper(), base_path + path, body)
+            )
+    return operations
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def run_operation(
+    send: Send, operation: Operation, count: int, concurrency: int, warmup: int
+) -> OperationResult:
+    for _ in range(warmup):
+        send(operation.method, operation.path, operation.body)
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def call() -> None:
+        start = time.perf_counter()
+        status = send(operation.method, operation.path, operation.body)
+        latency = time.perf_counter() - start
+        with lock:
+            latencies.append(latency)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        for _ in range(count):
+            call()
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(call) for _ in range(count)]:
+                future.result()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return OperationResult(
+        requests=count,
+        requests_per_second=round(count / elapsed, 1),
+        p50_ms=round(1000 * statistics.median(latencies), 3),
+        p95_ms=round(1000 * percentile(latencies, 0.95), 3),
+        p99_ms=round(1000 * percentile(latencies, 0.99), 3),
+        statuses=dict(sorted(statuses.items())),
+    )
+
+
+def in_process_send() -> Send:
+    from focus_api.app import create_app
+
+    client = create_app().test_client()
+
+    def send(method: str, path: str, body: Optional[Dict[str, Any]]) -> int:
+        return int(client.request(method, path, json=body).status_code)
+
+    return send
+
+
+def http_send(base_url: str) -> Send:
+    # A session (and so a keep-alive connection) per thread, as a client would have
+    local = threading.local()
+
+    def send(method: str, path: str, body: Optional[Dict[str, Any]]) -> int:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session.request(method, base_url + path, json=body, timeout=60).status_code
+
+    return send
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def start_server(server: str, port: int, workers: int) -> subprocess.Popen[bytes]:
+    if server == "gunicorn":
+        command = [
+            "gunicorn",
+            "focus_api.__main__:app",
+            # As deployed, with the worker count from --workers
+            "--config=python:focus_api.gunicorn_config",
+            f"--workers={workers}",
+            f"--bind=127.0.0.1:{port}",
+        ]
+    else:
+        command = [
+            "uvicorn",
+            "focus_api.__main__:app",
+            f"--workers={workers}",
+            f"--port={port}",
+            "--log-level=warning",
+        ]
+    process = subprocess.Popen(
+        [sys.executable, "-m", *command], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{server} exited with status {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/v1/health", timeout=1).ok:
+                return process
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{server} didn't start answering within 60 seconds")
+
+
+def process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            for child in children.read().split():
+                pids.extend(process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Peak RSS of this process, or the sum over a server process and its workers (Linux)."""
+    if pid is None:
+        # kilobytes on Linux, bytes on macOS
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, 1)
+
+    total_kb = 0
+    for tree_pid in process_tree(pid):
+        try:
+            with open(f"/proc/{tree_pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            pass
+    return round(total_kb / 1024, 1) if total_kb else None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    operations = [
+        operation
+        for operation in get_operations(load_specification(get_specification_path()))
+        if not args.operation or operation.operation_id in args.operation
+    ]
+
+    process = None
+    if args.server == "inprocess":
+        send = in_process_send()
+        concurrency = 1
+    else:
+        port = free_port()
+        process = start_server(args.server, port, args.workers)
+        send = http_send(f"http://127.0.0.1:{port}")
+        concurrency = args.concurrency
+
+    try:
+        results = {
+            operation.operation_id: asdict(
+                run_operation(send, operation, args.requests, concurrency, args.warmup)
+            )
+            for operation in operations
+        }
+        rss = peak_rss_mb(process.pid if process is not None else None)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    return {
+        "options": {
+            "server": args.server,
+            "workers": args.workers if process is not None else None,
+            "concurrency": concurrency,
+            "requests": args.requests,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "peak_rss_mb": rss,
+        "operations": results,
+    }
+
+
+def grew(current: Optional[float], baseline: Optional[float], threshold: float) -> bool:
+    if current is None or not baseline:
+        return False
+    return current > baseline * (1 + threshold)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Regressions of current from baseline, beyond threshold."""
+    if current["options"] != baseline["options"]:
+        raise ValueError(
+            f"The baseline was run with {baseline['options']}, not {current['options']}"
+        )
+
+    regressions = []
+    for operation_id, result in current["operations"].items():
+        before = baseline["operations"].get(operation_id)
+        if before is None:
+            continue
+        if result["requests_per_second"] < before["requests_per_second"] * (1 - threshold):
+            regressions.append(
+                f"{operation_id}: {result['requests_per_second']} req/s, "
+                f"was {before['requests_per_second']}"
+            )
+        if grew(result["p95_ms"], before["p95_ms"], threshold):
+            regressions.append(f"{operation_id}: p95 {result['p95_ms']}ms, was {before['p95_ms']}")
+        if result["statuses"].keys() != before["statuses"].keys():
+            regressions.append(
+                f"{operation_id}: statuses {result['statuses']}, was {before['statuses']}"
+            )
+
+    if grew(current["peak_rss_mb"], baseline["peak_rss_mb"], threshold):
+        regressions.append(f"peak RSS {current['peak_rss_mb']}MB, was {baseline['peak_rss_mb']}MB")
+    return regressions
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(f"{'operation':<45} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for operation_id, result in results["operations"].items():
+        statuses = " ".join(f"{status}x{count}" for status, count in result["statuses"].items())
+        print(
+            f"{operation_id:<45} {result['requests_per_second']:9.1f} {result['p50_ms']:9.2f} "
+            f"{result['p95_ms']:9.2f} {result['p99_ms']:9.2f}  {statuses}"
+        )
+    print(f"peak RSS: {results['peak_rss_mb']}MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark each operation in openapi.yaml")
+    parser.add_argument(
+        "--server", choices=("inprocess", "uvicorn", "gunicorn"), default="inprocess"
+    )
+    parser.add_argument("--workers", type=int, default=2, help="server worker processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads, for servers")
+    parser.add_argument("--requests", type=int, default=200, help="requests per operation")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per operation")
+    parser.add_argument(
+        "--operation", action="append", help="only this operationId (may be repeated)"
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="fail on regressions from this baseline JSON file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed regression, as a fraction"
+    )
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+            output.write("\n")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%} of {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
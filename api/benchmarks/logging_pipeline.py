@@ -0,0 +1,71 @@
+#
+# Microbenchmark: time spent on the logging thread per access log line, with a synchronous
+# StreamHandler versus the queued BatchingStreamHandler, writing to a stream where each write
+# takes WRITE_LATENCY (e.g. a pipe to a log collector that is momentarily behind).
+#
+# Run with: poetry run python -m benchmarks.logging_pipeline
+#
+
+import io
+import logging
+import time
+import timeit
+from typing import Callable, Self
+
+from focus_api.utils.logging.batching import BatchingStreamHandler
+from focus_api.utils.logging.formatters import JsonFormatter
+
+WRITE_LATENCY = 0.0002
+
+
+class SlowStream(io.StringIO):
+    def write(self: Self, s: str) -> int:
+        time.sleep(WRITE_LATENCY)
+        return len(s)
+
+
+def access_log(logger: logging.Logger) -> Callable[[], None]:
+    def run() -> None:
+        logger.info(
+            "%s %s %s",
+            200,
+            "GET",
+            "/v1/health?",
+            extra={
+                "remote_addr": "127.0.0.1",
+                "response_length": 120,
+                "response_type": "application/json",
+                "status_code": 200,
+                "response_time_ms": 1.234,
+            },
+        )
+
+    return run
+
+
+def measure(name: str, handler: logging.Handler, number: int) -> float:
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger(f"benchmarks.{name}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    try:
+        return min(timeit.repeat(access_log(logger), number=number, repeat=5)) / number
+    finally:
+        handler.flush()
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def main() -> None:
+    number = 2000
+    before = measure("sync", logging.StreamHandler(SlowStream()), number)
+    after = measure("queued", BatchingStreamHandler(SlowStream(), queue_size=100000), number)
+    print(
+        f"per line: StreamHandler {before * 1e6:8.1f}us   "
+        f"BatchingStreamHandler {after * 1e6:8.1f}us   speedup {before / after:5.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#
+# Microbenchmark: Response.to_api_response() + connexion's JSON encoding, versus
+# Response.to_json_response().
+#
+# Run with: poetry run python -m benchmarks.response_serialization
+#
+
+import datetime
+import timeit
+from typing import Any, Callable
+
+import flask
+from connexion.context import _receive, _scope  # type: ignore
+from connexion.frameworks.flask import FlaskJSONProvider  # type: ignore
+from connexion.jsonifier import Jsonifier  # type: ignore
+
+from focus_api.controllers.response import success_response
+
+# The jsonifier connexion's FlaskApi uses to encode tuple responses
+jsonifier = Jsonifier(flask.json, indent=2)
+
+
+def small_payload() -> dict[str, Any]:
+    return {
+        "status": "up",
+        "timestamp": datetime.datetime.now(datetime.UTC),
+        "apiName": "api",
+        "apiVersion": "v1",
+    }
+
+
+def large_payload() -> list[dict]:
+    return [
+        {
+            "id": f"6ddcf443-d1bf-4acd-83cc-{i:012d}",
+            "applicationType": "renewal",
+            "applicant": {
+                "first": "Ringo",
+                "middle": "Beatle",
+                "last": "Starr",
+                "dob": "1970-07-07",
+                "primaryAddress": {
+                    "address1": "123 Main St",
+                    "city": "Richmond",
+                    "state": "VA",
+                    "zip": "00000",
+                    "country": "US",
+                },
+                "alternateNames": [],
+            },
+            "heightFt": 5,
+            "heightIn": 11,
+            "datetimeStarted": datetime.datetime.now(datetime.UTC),
+        }
+        for i in range(1000)
+    ]
+
+
+def current(payload: Callable[[], Any]) -> Callable[[], bytes]:
+    def run() -> bytes:
+        body, _status, _headers = success_response("Success", payload()).to_api_response()
+        return jsonifier.dumps(body).encode()
+
+    return run
+
+
+def fast_path(payload: Callable[[], Any]) -> Callable[[], bytes]:
+    def run() -> bytes:
+        return success_response("Success", payload()).to_json_response().body
+
+    return run
+
+
+def main() -> None:
+    app = flask.Flask(__name__)
+    app.json = FlaskJSONProvider(app)
+    _scope.set({"type": "http", "method": "GET", "path": "/v1/bench", "headers": []})
+    _receive.set(None)
+
+    with app.app_context():
+        for name, payload, number in (
+            ("small", small_payload, 20000),
+            ("large", large_payload, 50),
+        ):
+            before = min(timeit.repeat(current(payload), number=number, repeat=5)) / number
+            after = min(timeit.repeat(fast_path(payload), number=number, repeat=5)) / number
+            print(
+                f"{name:>6} data: to_api_response {before * 1e6:10.1f}us   "
+                f"to_json_response {after * 1e6:10.1f}us   speedup {before / after:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#
+# Benchmark: how long the API takes to import and create, with a budget for each.
+#
+# A fresh interpreter imports focus_api.__main__ (as uvicorn and gunicorn do) under
+# `python -X importtime`, then creates the app with lazy startup (see create_app), which doesn't
+# connect to the database. The report lists
+#
+# - the total import time, and the time spent in focus_api's own modules (their self time) as
+#   opposed to the libraries they import;
+# - the time spent importing each top-level package's modules;
+# - the --top slowest modules, by cumulative and by self time;
+# - how long create_app(lazy=True) took.
+#
+# Each run starts a new interpreter, and the median of --runs runs is reported, as the first is
+# often slower while the OS caches the files. The script exits with status 1 if the import time,
+# focus_api's own import time or the create time exceeds its budget (--import-budget-ms,
+# --own-budget-ms, --create-budget-ms), so it can run in CI.
+#
+# Needs the same environment as the API (ENVIRONMENT, POSTGRES_CONNECTION_STRING), but not a
+# running Postgres.
+#
+# Run with: poetry run python -m benchmarks.startup [--top 30] [--import-budget-ms 1500]
+#
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List
+
+MODULE = "focus_api.__main__"
+
+# Run in the child: import under -X importtime, then time create_app and print it as JSON.
+CHILD_SCRIPT = f"""
+import json, time
+import {MODULE}
+from focus_api.app import create_app
+start = time.perf_counter()
+create_app(lazy=True)
+print(json.dumps({{"create_ms": 1000 * (time.perf_counter() - start)}}))
+"""
+
+
+@dataclass
+class ModuleImport:
+    name: str
+    # Microseconds importing the module itself, and including the modules it imported
+    self_us: int
+    cumulative_us: int
+
+
+@dataclass
+class StartupRun:
+    imports: List[ModuleImport]
+    create_ms: float
+
+    def import_ms(self) -> float:
+        # Top-level imports are those not nested under another, i.e. not indented in the output.
+        return sum(module.cumulative_us for module in self.imports if module.name[0] != " ") / 1000
+
+    def own_ms(self) -> float:
+        return (
+            sum(
+                module.self_us
+                for module in self.imports
+                if module.name.strip().split(".")[0] == "focus_api"
+            )
+            / 1000
+        )
+
+    def package_ms(self) -> Dict[str, float]:
+        """Import time of each top-level package: the self time of all its modules."""
+        packages: Dict[str, float] = defaultdict(float)
+        for module in self.imports:
+            packages[module.name.strip().split(".")[0]] += module.self_us / 1000
+        return packages
+
+
+def parse_importtime(stderr: str) -> List[ModuleImport]:
+    """Parse `import time: self [us] | cumulative | imported package` lines."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        if not self_us.strip().isdigit():
+            # The header line
+            continue
+        # Keep the leading spaces of the name, which show how deeply it was nested.
+        imports.append(ModuleImport(name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure() -> StartupRun:
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if process.returncode != 0:
+        sys.stderr.write(process.stderr)
+        raise RuntimeError(f"Importing {MODULE} failed with status {process.returncode}")
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(process.stderr)
+    # Only the imports up to MODULE's own line; those after were made by create_app.
+    names = [module.name for module in imports]
+    return StartupRun(imports[: names.index(MODULE) + 1], result["create_ms"])
+
+
+def print_report(runs: List[StartupRun], top: int) -> Dict[str, float]:
+    # The module breakdown is from the run closest to the median import time.
+    import_ms = statistics.median(run.import_ms() for run in runs)
+    run = min(runs, key=lambda run: abs(run.import_ms() - import_ms))
+    totals = {
+        "import_ms": import_ms,
+        "own_ms": statistics.median(run.own_ms() for run in runs),
+        "create_ms": statistics.median(run.create_ms for run in runs),
+    }
+
+    print(f"{'package':<40} {'ms':>9}")
+    for package, ms in sorted(run.package_ms().items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<40} {ms:9.1f}")
+
+    for label, key in (("cumulative", "cumulative_us"), ("self", "self_us")):
+        print()
+        print(f"{'module, by ' + label + ' time':<60} {'self ms':>9} {'cumul. ms':>10}")
+        for module in sorted(run.imports, key=lambda module: -getattr(module, key))[:top]:
+            print(
+                f"{module.name.strip():<60} {module.self_us / 1000:9.1f} "
+                f"{module.cumulative_us / 1000:10.1f}"
+            )
+
+    print()
+    print(f"import {MODULE}: {totals['import_ms']:.1f}ms, median of {len(runs)}")
+    print(f"  of which focus_api's own modules: {totals['own_ms']:.1f}ms")
+    print(f"create_app(lazy=True): {totals['create_ms']:.1f}ms")
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=f"Time importing {MODULE} and creating the app")
+    parser.add_argument("--runs", type=int, default=5, help="interpreters to start")
+    parser.add_argument("--top", type=int, default=20, help="modules and packages to list")
+    parser.add_argument("--import-budget-ms", type=float, default=1500)
+    parser.add_argument("--own-budget-ms", type=float, default=100)
+    parser.add_argument("--create-budget-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    totals = print_report([measure() for _ in range(args.runs)], args.top)
+
+    over_budget = [
+        f"{name} {totals[key]:.1f}ms, budget {budget}ms"
+        for name, key, budget in (
+            ("import", "import_ms", args.import_budget_ms),
+            ("focus_api's own imports", "own_ms", args.own_budget_ms),
+            ("create_app", "create_ms", args.create_budget_ms),
+        )
+        if totals[key] > budget
+    ]
+    for line in over_budget:
+        print(f"OVER BUDGET {line}")
+    if over_budget:
+        sys.exit(1)
+    print("within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-from opr_api.app import create_app
+from focus_api.app import LazyApp, create_app
 
-app = create_app()
+# Created on the first call, so that importing this module (as uvicorn and gunicorn do) is cheap.
+app = LazyApp(create_app)
 
 if __name__ == "__main__":
     app.run()
@@ -1,26 +1,68 @@
+import functools
 import os
+import threading
 import time
-from contextlib import contextmanager
-from typing import Generator, List, Union
+from contextlib import asynccontextmanager, contextmanager
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Generator,
+    List,
+    Optional,
+    Self,
+    Set,
+    TypeVar,
+    Union,
+    cast,
+)
 
 import connexion  # type: ignore
 import connexion.mock  # type: ignore
 import flask
-from connexion.middleware import MiddlewarePosition  # type: ignore
+from a2wsgi import WSGIMiddleware
+from connexion.datastructures import MediaTypeDict  # type: ignore
+from connexion.middleware import ConnexionMiddleware, MiddlewarePosition  # type: ignore
+from connexion.middleware.response_validation import ResponseValidationMiddleware  # type: ignore
+from connexion.spec import Specification  # type: ignore
+from connexion.validators import VALIDATOR_MAP  # type: ignore
 from flask import g
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette.middleware.cors import CORSMiddleware
+from starlette.types import Receive, Scope, Send
 
-from opr_api.db import init
-from opr_api.utils.logging import get_logger
+from focus_api.db import init, instrumentation, warmup
+from focus_api.db.aio import LazyAsyncSessionFactory, current_session, init_async
+from focus_api.db.routing import READ_ONLY
+from focus_api.middleware import (
+    AsyncControllerMiddleware,
+    RequestMetricsMiddleware,
+    SampledResponseValidationMiddleware,
+)
+from focus_api.middleware.response_validation import ResponseValidationConfig
+from focus_api.middleware.response_validation import get_config as get_response_validation_config
+from focus_api.utils import deadline, health, profiling, prometheus
+from focus_api.utils.env import get_bool_env, get_int_env
+from focus_api.utils.logging import get_logger
+from focus_api.utils.spec_cache import add_api, load_specification
+from focus_api.utils.startup import StartupTimer
+from focus_api.utils.uploads import StreamingMultiPartValidator
 
 logger = get_logger(__name__)
 
+F = TypeVar("F", bound=Callable[..., Any])
+
 
 def openapi_filenames() -> List[str]:
     return ["../openapi.yaml"]
 
 
+def get_specification_path() -> str:
+    return os.path.join(os.path.dirname(__file__), openapi_filenames()[0])
+
+
 def get_project_root_dir() -> str:
     return os.path.join(
         os.path.dirname(__file__),
@@ -38,48 +80,186 @@ def db_session() -> Generator[Session, None, None]:
     yield session
 
 
-def create_app() -> connexion.FlaskApp:
-    logger.info("Starting API")
+@asynccontextmanager
+async def async_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """Get a SQLAlchemy AsyncSession, for use in `async def` controllers."""
+    session = current_session.get()
+    if session is None:
+        raise Exception("No async database session available in request context")
 
-    db_session_factory = init()
+    yield session
 
-    # Enable mock responses for unimplemented paths.
-    resolver = connexion.mock.MockResolver(mock_all=False)
 
-    app = connexion.FlaskApp(
-        __name__,
-        strict_validation=True,
-        validate_responses=True,
-    )
+def read_only(function: F) -> F:
+    """Mark a controller as read-only, so its queries may be served by a read replica.
 
-    # These settings should get adjusted based on how the API and consumers are deployed
-    app.add_middleware(
-        CORSMiddleware,
-        position=MiddlewarePosition.BEFORE_EXCEPTION,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
-    app.add_api(
-        openapi_filenames()[0],
-        resolver=resolver,
-        strict_validation=True,
-        validate_responses=True,
-    )
+    This is the controller-level equivalent of `x-read-only: true` on the OpenAPI operation.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with db_session() as session:
+            session.info[READ_ONLY] = True
+        return function(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def get_read_only_operations(specification: Specification) -> Set[str]:
+    """Get the operationIds marked with `x-read-only: true` in the OpenAPI spec."""
+    return {
+        operation["operationId"]
+        for path in specification["paths"].values()
+        for operation in path.values()
+        if isinstance(operation, dict) and operation.get("x-read-only")
+    }
+
+
+def get_validator_map() -> dict[str, Any]:
+    """connexion's validators, with multipart bodies streamed instead of buffered in memory."""
+    return {
+        **VALIDATOR_MAP,
+        "body": MediaTypeDict(
+            {
+                **VALIDATOR_MAP["body"],
+                "multipart/form-data": StreamingMultiPartValidator,
+            }
+        ),
+    }
+
+
+def get_middlewares(response_validation_config: ResponseValidationConfig) -> List[Any]:
+    """connexion's middleware stack, with response validation sampled instead of exhaustive."""
+    return [
+        (
+            functools.partial(
+                SampledResponseValidationMiddleware, config=response_validation_config
+            )
+            if middleware is ResponseValidationMiddleware
+            else middleware
+        )
+        for middleware in ConnexionMiddleware.default_middlewares
+    ]
+
+
+def get_lazy_startup() -> bool:
+    return get_bool_env("APP_LAZY_STARTUP") or False
+
+
+def create_app(lazy: Optional[bool] = None) -> connexion.FlaskApp:
+    """Create the API.
+
+    With lazy startup (by default from APP_LAZY_STARTUP), nothing that can wait for the first
+    request that needs it is done up front: the database isn't connected to, the async engine
+    (and asyncpg) is created by the first async controller, the health prober is started by
+    the first /health/deep, and the metrics writer isn't started (gunicorn's post_fork starts it
+    in each worker). connexion itself already defers the rest: the Swagger UI, resolving
+    operations to controllers (importing them) and mock responses are set up when its middleware
+    stack is built, on the first request.
+    """
+    if lazy is None:
+        lazy = get_lazy_startup()
+    logger.info("Starting API", extra={"lazy": lazy})
+    startup = StartupTimer()
+
+    with startup.phase("init_db"):
+        db_session_factory = init(connect=not lazy)
+        # Query counts and database time per request, and slow query logging; off by default.
+        instrumentation.install(instrumentation.get_config())
+    async_db_session_factory: Callable[[], AsyncSession]
+    if lazy:
+        async_db_session_factory = LazyAsyncSessionFactory()
+    else:
+        with startup.phase("init_async_db"):
+            async_db_session_factory = init_async()
+        with startup.phase("start_health_prober"):
+            # Checks the database and external services in the background, for /health/deep.
+            health.get_prober()
+    with startup.phase("load_specification"):
+        specification = load_specification(get_specification_path())
+        read_only_operations = get_read_only_operations(specification)
+        deadline.configure(specification, deadline.get_config())
+
+    with startup.phase("create_flask_app"):
+        # Enable mock responses for unimplemented paths.
+        resolver = connexion.mock.MockResolver(mock_all=False)
+
+        # Responses are validated against the spec; in production only a sample of them, with
+        # violations logged rather than returned as 500s. See
+        # focus_api.middleware.response_validation.
+        app = connexion.FlaskApp(
+            __name__,
+            middlewares=get_middlewares(get_response_validation_config()),
+            strict_validation=True,
+            validate_responses=True,
+        )
+
+        # These settings should get adjusted based on how the API and consumers are deployed
+        app.add_middleware(
+            CORSMiddleware,
+            position=MiddlewarePosition.BEFORE_EXCEPTION,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+        # The threads running Flask controllers; more than the pool has connections would only
+        # wait for one. See focus_api.utils.workers. connexion doesn't expose the size, so its
+        # (private) WSGI middleware is replaced; pyproject.toml pins connexion to the versions
+        # which have it, and tests/utils/test_workers.py checks it.
+        threads = get_int_env("APP_THREADS")
+        if threads is not None:
+            app._middleware_app.asgi_app = WSGIMiddleware(app.app.wsgi_app, workers=threads)
+        # Per-route latency histograms and in-flight counts, exposed at /metrics.
+        app.add_middleware(RequestMetricsMiddleware, position=MiddlewarePosition.BEFORE_SECURITY)
+        # Call `async def` controllers on the event loop instead of a Flask worker thread.
+        app.add_middleware(
+            AsyncControllerMiddleware,
+            position=MiddlewarePosition.BEFORE_CONTEXT,
+            session_factory=async_db_session_factory,
+        )
+    with startup.phase("add_api"):
+        add_api(
+            app,
+            specification,
+            resolver=resolver,
+            strict_validation=True,
+            validate_responses=True,
+            validator_map=get_validator_map(),
+        )
 
     flask_app = app.app
+    # Opt-in profiling of sampled requests, or of requests with the profiling header.
+    profiler = profiling.create_profiler(profiling.get_config())
 
     @flask_app.before_request
     def push_db() -> None:
         g.db = db_session_factory
         g.start_time = time.monotonic()
         g.connexion_flask_app = app
+        instrumentation.start()
+
+        operation_id = connexion.context.operation.operation_id
+        g.deadline_token = deadline.start(operation_id)
+
+        if operation_id in read_only_operations:
+            db_session_factory.info[READ_ONLY] = True
+
+        if profiler is not None:
+            g.profile = profiler.start(operation_id, flask.request.headers)
 
     @flask_app.teardown_request
     def close_db(
         exception: Union[Exception | None] = None,
     ) -> None:
+        deadline_token = g.pop("deadline_token", None)
+        if deadline_token is not None:
+            deadline.finish(deadline_token)
+
+        profile = g.pop("profile", None)
+        if profile is not None and profiler is not None:
+            profiler.finish(profile)
+
         try:
             logger.debug("Closing DB session")
             db = g.pop(
@@ -98,6 +278,7 @@ def create_app() -> connexion.FlaskApp:
         response: flask.Response,
     ) -> flask.Response:
         response_time_ms = 1000 * (time.monotonic() - g.get("start_time"))
+        query_stats = instrumentation.finish() or {}
         logger.info(
             "%s %s %s",
             response.status_code,
@@ -109,8 +290,60 @@ def create_app() -> connexion.FlaskApp:
                 "response_type": response.content_type,
                 "status_code": response.status_code,
                 "response_time_ms": response_time_ms,
+                **query_stats,
             },
         )
         return response
 
+    warmup_config = warmup.get_config()
+    if warmup_config.enabled:
+        with startup.phase("warm_up"):
+            # Mapper configuration, statement compilation and connecting, ahead of the first
+            # requests.
+            warmup.warm_up(
+                cast(Engine, db_session_factory.session_factory.kw["bind"]), warmup_config
+            )
+
+    if not lazy:
+        prometheus.start_writer()
+    startup.report()
     return app
+
+
+def build_middleware_stack(app: connexion.FlaskApp) -> None:
+    """Set up connexion's middleware stack now, rather than on the first request.
+
+    This resolves every operation (importing the controllers) and sets up the Swagger UI, e.g. in
+    a gunicorn master with preload_app, so that the workers share the result. connexion builds
+    the stack with a private method, see the pin in pyproject.toml.
+    """
+    middleware = app.middleware
+    if middleware.middleware_stack is None:
+        middleware.app, middleware.middleware_stack = middleware._build_middleware_stack()
+
+
+class LazyApp:
+    """An ASGI app which creates the API on its first call rather than on import.
+
+    Importing the module which holds it (for uvicorn or gunicorn to find) is then cheap, and the
+    API is created by the server's lifespan startup event, or by the first request. get() creates
+    it up front, e.g. before forking workers.
+    """
+
+    def __init__(self: Self, factory: Callable[[], connexion.FlaskApp]) -> None:
+        self.factory = factory
+        self._app: Optional[connexion.FlaskApp] = None
+        self._lock = threading.Lock()
+
+    def get(self: Self) -> connexion.FlaskApp:
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    self._app = self.factory()
+        return self._app
+
+    async def __call__(self: Self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.get()(scope, receive, send)
+
+    def run(self: Self, **kwargs: Any) -> None:
+        self.get().run(**kwargs)
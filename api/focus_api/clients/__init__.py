@@ -0,0 +1,56 @@
+#
+# Outbound HTTP clients for external services (USPS address validation, eligibility, photo
+# quality and payments).
+#
+# get_session(name) returns the process-wide ServiceSession for a service, configured from
+# environment variables prefixed with its name (see focus_api.clients.config). Reusing the session
+# reuses its keep-alive connections, so controllers should always call services through it:
+#
+#   response = get_session("usps").get("/addresses", params=...)
+#
+# A CircuitOpenError (a requests ConnectionError) is raised instead of calling a service which is
+# failing; controllers should treat it like the service being unavailable.
+#
+
+import os
+import threading
+from typing import Dict
+
+from focus_api.clients.circuit_breaker import CircuitOpenError  # noqa: F401
+from focus_api.clients.config import get_config
+from focus_api.clients.session import ServiceSession
+
+USPS = "usps"
+ELIGIBILITY = "eligibility"
+PHOTO = "photo"
+PAYMENT = "payment"
+
+_sessions: Dict[str, ServiceSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(name: str) -> ServiceSession:
+    session = _sessions.get(name)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _sessions[name] = ServiceSession(get_config(name))
+    return session
+
+
+def close_sessions() -> None:
+    """Close every session and its pooled connections."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def forget_sessions_after_fork() -> None:
+    """Drop sessions inherited from the parent process, without closing the parent's sockets."""
+    _sessions.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=forget_sessions_after_fork)
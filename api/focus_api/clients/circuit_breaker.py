@@ -0,0 +1,81 @@
+#
+# Circuit breaker for calls to an external service.
+#
+# While a service is down, every call to it would otherwise wait for its timeouts (and retries)
+# before failing, tying up request threads. The breaker counts consecutive failures; once
+# failure_threshold is reached it opens and calls fail immediately with CircuitOpenError. After
+# reset_timeout seconds one trial call is let through (half open): success closes the circuit,
+# failure opens it again.
+#
+
+import threading
+import time
+from typing import Self
+
+import requests
+
+from focus_api.utils import metrics
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+CIRCUIT_OPENED = metrics.counter(
+    "outbound_circuit_opened_total", "Times the circuit to an external service opened"
+)
+CIRCUIT_REJECTED = metrics.counter(
+    "outbound_circuit_rejected_total", "Calls failed fast because the circuit was open"
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a service whose circuit is open."""
+
+
+class CircuitBreaker:
+    def __init__(
+        self: Self, name: str, failure_threshold: int = 5, reset_timeout: float = 30
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self: Self) -> None:
+        """Raise CircuitOpenError if the call shouldn't be made."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let this call through as a trial; others keep failing fast until it completes.
+                self.state = HALF_OPEN
+                return
+
+        CIRCUIT_REJECTED.inc(service=self.name)
+        raise CircuitOpenError(f"Circuit to {self.name} is open")
+
+    def record_success(self: Self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("circuit closed", extra={"service": self.name})
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self: Self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                CIRCUIT_OPENED.inc(service=self.name)
+                logger.warning(
+                    "circuit opened", extra={"service": self.name, "failures": self.failures}
+                )
@@ -0,0 +1,87 @@
+import os
+from dataclasses import dataclass, field
+from typing import FrozenSet, Optional
+
+from focus_api.utils.env import get_float_env, get_int_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ServiceConfig:
+    name: str
+    # Prefixed to relative URLs passed to the session, e.g. "https://secure.shippingapis.com"
+    base_url: Optional[str] = None
+    # Connections kept alive to the service, per process. When all are in use, callers wait for
+    # one (pool_block) rather than opening more, which caps the load we put on the service.
+    pool_maxsize: int = 10
+    pool_block: bool = True
+    # Seconds to wait for a connection to be established, and for each read of the response
+    connect_timeout: float = 3
+    read_timeout: float = 10
+    # Retries of connection errors and retry_statuses responses. Only idempotent methods are
+    # retried, unless retry_methods says otherwise (e.g. never add POST for payments).
+    retries: int = 2
+    retry_statuses: FrozenSet[int] = frozenset({502, 503, 504})
+    retry_methods: FrozenSet[str] = field(
+        default_factory=lambda: frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+    )
+    # Delay before retry n is backoff_factor * 2 ** (n - 1) seconds, capped at backoff_max, plus up
+    # to backoff_jitter seconds of random jitter so that callers don't retry in lockstep.
+    backoff_factor: float = 0.2
+    backoff_max: float = 5
+    backoff_jitter: float = 0.2
+    # After this many consecutive failed calls the circuit opens and calls fail fast, until
+    # circuit_reset_timeout seconds have passed and a trial call is let through.
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: float = 30
+
+
+def get_config(name: str) -> ServiceConfig:
+    """Configuration for a service, from environment variables prefixed with its name.
+
+    e.g. USPS_BASE_URL, USPS_POOL_MAXSIZE, USPS_READ_TIMEOUT for the "usps" service.
+    """
+    prefix = name.upper()
+    service_config = ServiceConfig(name=name, base_url=os.getenv(f"{prefix}_BASE_URL"))
+
+    pool_maxsize_override = get_int_env(f"{prefix}_POOL_MAXSIZE")
+    if pool_maxsize_override is not None:
+        service_config.pool_maxsize = pool_maxsize_override
+
+    connect_timeout_override = get_float_env(f"{prefix}_CONNECT_TIMEOUT")
+    if connect_timeout_override is not None:
+        service_config.connect_timeout = connect_timeout_override
+
+    read_timeout_override = get_float_env(f"{prefix}_READ_TIMEOUT")
+    if read_timeout_override is not None:
+        service_config.read_timeout = read_timeout_override
+
+    retries_override = get_int_env(f"{prefix}_RETRIES")
+    if retries_override is not None:
+        service_config.retries = retries_override
+
+    circuit_failure_threshold_override = get_int_env(f"{prefix}_CIRCUIT_FAILURE_THRESHOLD")
+    if circuit_failure_threshold_override is not None:
+        service_config.circuit_failure_threshold = circuit_failure_threshold_override
+
+    circuit_reset_timeout_override = get_float_env(f"{prefix}_CIRCUIT_RESET_TIMEOUT")
+    if circuit_reset_timeout_override is not None:
+        service_config.circuit_reset_timeout = circuit_reset_timeout_override
+
+    logger.info(
+        "Constructed outbound service configuration",
+        extra={
+            "service": service_config.name,
+            "base_url": service_config.base_url,
+            "pool_maxsize": service_config.pool_maxsize,
+            "connect_timeout": service_config.connect_timeout,
+            "read_timeout": service_config.read_timeout,
+            "retries": service_config.retries,
+            "circuit_failure_threshold": service_config.circuit_failure_threshold,
+            "circuit_reset_timeout": service_config.circuit_reset_timeout,
+        },
+    )
+
+    return service_config
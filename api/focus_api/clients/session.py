@@ -0,0 +1,166 @@
+#
+# A requests Session for one external service.
+#
+# ServiceSession keeps a pool of keep-alive connections to the service (so most calls skip the TCP
+# and TLS handshakes, and the DNS lookup), applies the service's default timeouts and retries, and
+# guards calls with a circuit breaker. Each call is timed and counted by service and outcome.
+#
+# Within a request with a deadline (see focus_api.utils.deadline), a slow service can't hold the
+# request past its budget: the time remaining is split between the connect and read timeouts, and
+# a retry is only made if it can finish (backoff and a whole attempt) before the deadline.
+# Otherwise the call fails with requests.Timeout.
+#
+
+import time
+from contextvars import ContextVar
+from typing import Any, Optional, Self
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import BaseHTTPResponse
+from urllib3.util.retry import Retry
+
+from focus_api.clients.circuit_breaker import CircuitBreaker
+from focus_api.clients.config import ServiceConfig
+from focus_api.utils import deadline, metrics
+
+OUTBOUND_REQUEST_DURATION = metrics.histogram(
+    "outbound_request_duration_seconds",
+    "Time for calls to external services including retries, by service and status",
+)
+OUTBOUND_REQUEST_ERRORS = metrics.counter(
+    "outbound_request_errors_total", "Failed calls to external services, by service and error"
+)
+
+# The longest one attempt of the current call can take: its connect and read timeouts together
+attempt_timeout: ContextVar[Optional[float]] = ContextVar("attempt_timeout", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """A retry couldn't finish before the request's deadline.
+
+    Not an OSError, so that requests passes it through rather than wrapping it in a
+    ConnectionError; ServiceSession raises it as a requests.Timeout.
+    """
+
+
+class DeadlineRetry(Retry):
+    """Retries which stop at the request's deadline, rather than running past it."""
+
+    def increment(
+        self: Self,
+        method: Optional[str] = None,
+        url: Optional[str] = None,
+        response: Optional[BaseHTTPResponse] = None,
+        error: Optional[Exception] = None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Self:
+        retry = super().increment(method, url, response, error, *args, **kwargs)
+        remaining = deadline.remaining()
+        if remaining is None:
+            return retry
+
+        wait = retry.get_backoff_time()
+        if retry.respect_retry_after_header and response is not None:
+            retry_after = retry.get_retry_after(response)
+            if retry_after is not None:
+                wait = retry_after
+        if wait + (attempt_timeout.get() or 0) > remaining:
+            if response is not None:
+                # Release the connection back to the pool, as urllib3 would before retrying
+                response.drain_conn()
+            raise DeadlineExceeded(f"No time left to retry {method} {url} before the deadline")
+        return retry
+
+
+class ServiceSession(requests.Session):
+    def __init__(self: Self, config: ServiceConfig) -> None:
+        super().__init__()
+        self.config = config
+        self.circuit_breaker = CircuitBreaker(
+            config.name,
+            failure_threshold=config.circuit_failure_threshold,
+            reset_timeout=config.circuit_reset_timeout,
+        )
+
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=config.pool_maxsize,
+            pool_block=config.pool_block,
+            max_retries=DeadlineRetry(
+                total=config.retries,
+                status_forcelist=config.retry_statuses,
+                allowed_methods=config.retry_methods,
+                backoff_factor=config.backoff_factor,
+                backoff_max=config.backoff_max,
+                backoff_jitter=config.backoff_jitter,
+                # Return the last response rather than raising once retries run out.
+                raise_on_status=False,
+            ),
+        )
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def request(  # type: ignore[override]
+        self: Self, method: str, url: str, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        if self.config.base_url is not None and not url.startswith(("http://", "https://")):
+            url = self.config.base_url.rstrip("/") + "/" + url.lstrip("/")
+        kwargs.setdefault("timeout", (self.config.connect_timeout, self.config.read_timeout))
+        kwargs["timeout"] = self.limit_timeout(kwargs["timeout"])
+
+        self.circuit_breaker.before_call()
+        start = time.perf_counter()
+        token = attempt_timeout.set(total_timeout(kwargs["timeout"]))
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception as e:
+            # Any failure counts, so that a half-open circuit's trial call always settles it.
+            self.observe(start, "error")
+            OUTBOUND_REQUEST_ERRORS.inc(service=self.config.name, error=type(e).__name__)
+            self.circuit_breaker.record_failure()
+            if isinstance(e, DeadlineExceeded):
+                raise requests.Timeout(str(e)) from e
+            raise
+        finally:
+            attempt_timeout.reset(token)
+
+        status = str(response.status_code)
+        self.observe(start, status)
+        if response.status_code >= 500:
+            OUTBOUND_REQUEST_ERRORS.inc(service=self.config.name, error=status)
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+        return response
+
+    def limit_timeout(self: Self, timeout: Any) -> Any:
+        """Shorten a timeout (seconds, or a (connect, read) pair) to the request's deadline.
+
+        Connecting and reading together take no longer than the time remaining: connecting gets
+        at most half of it, and reading the rest.
+        """
+        remaining = deadline.remaining()
+        if remaining is None:
+            return timeout
+        if remaining <= 0:
+            OUTBOUND_REQUEST_ERRORS.inc(service=self.config.name, error="DeadlineExceeded")
+            raise requests.Timeout(f"Request deadline passed before calling {self.config.name}")
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        connect = remaining / 2 if connect is None else min(connect, remaining / 2)
+        read = remaining - connect if read is None else min(read, remaining - connect)
+        return (connect, read)
+
+    def observe(self: Self, start: float, status: str) -> None:
+        OUTBOUND_REQUEST_DURATION.observe(
+            time.perf_counter() - start, service=self.config.name, status=status
+        )
+
+
+def total_timeout(timeout: Any) -> Optional[float]:
+    """The longest an attempt with timeout can take, or None if it isn't limited."""
+    connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    if connect is None or read is None:
+        return None
+    return float(connect + read)
@@ -1 +1,6 @@
+from .address import address  # noqa: F401
+from .eligibility import eligibility  # noqa: F401
 from .health import health, health_deep  # noqa: F401
+from .job import job  # noqa: F401
+from .monitoring import metrics  # noqa: F401
+from .payment import pay  # noqa: F401
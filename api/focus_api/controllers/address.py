@@ -0,0 +1,109 @@
+import threading
+from typing import Any, Dict, Optional, cast
+
+import requests
+from connexion.lifecycle import ConnexionResponse  # type: ignore
+from sqlalchemy.engine import Engine
+from werkzeug.exceptions import ServiceUnavailable
+
+from focus_api.app import db_session
+from focus_api.clients import USPS, get_session
+from focus_api.controllers.response import ValidationErrorDetail, error_response, success_response
+from focus_api.db.cache import PostgresCacheTier
+from focus_api.utils.address import address_key, normalize_address
+from focus_api.utils.cache import MISSING, CacheConfig, TieredCache, TTLCache, get_config
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Addresses rarely change, so a day's cache is safe; it only delays noticing new construction.
+DEFAULT_CACHE_CONFIG = CacheConfig(maxsize=10000, ttl=24 * 60 * 60)
+
+# USPS statuses meaning the address can't be validated, which are cached like a suggestion
+UNMATCHED_STATUSES = (400, 404)
+
+_cache: Optional[TieredCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> TieredCache:
+    """The address validation cache, created on first use."""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache_config = get_config("address", DEFAULT_CACHE_CONFIG)
+                shared = None
+                if cache_config.postgres:
+                    with db_session() as session:
+                        shared = PostgresCacheTier(
+                            "address", cast(Engine, session.get_bind()), ttl=cache_config.ttl
+                        )
+                _cache = TieredCache(
+                    TTLCache("address", maxsize=cache_config.maxsize, ttl=cache_config.ttl),
+                    shared,
+                )
+    return _cache
+
+
+def from_usps_address(usps_address: Dict[str, Any], supplied: Dict[str, Any]) -> Dict[str, Any]:
+    """Translate a USPS standardized address into our Address schema."""
+    suggested = {
+        "address1": usps_address.get("streetAddress"),
+        "address2": usps_address.get("secondaryAddress"),
+        "city": usps_address.get("city"),
+        "state": usps_address.get("state"),
+        "zip": usps_address.get("ZIPCode"),
+        "country": supplied.get("country"),
+    }
+    if usps_address.get("ZIPCode") and usps_address.get("ZIPPlus4"):
+        suggested["zip"] = f"{usps_address['ZIPCode']}-{usps_address['ZIPPlus4']}"
+    return {name: value for name, value in suggested.items() if value}
+
+
+def lookup_usps_address(supplied: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The address USPS suggests for the supplied address, or None if it has no match.
+
+    Raises requests exceptions when USPS can't be reached or fails.
+    """
+    params = {
+        "streetAddress": supplied.get("address1"),
+        "secondaryAddress": supplied.get("address2"),
+        "city": supplied.get("city"),
+        "state": supplied.get("state"),
+        "ZIPCode": (supplied.get("zip") or "")[:5] or None,
+    }
+    response = get_session(USPS).get("/address", params=params)
+    if response.status_code in UNMATCHED_STATUSES:
+        return None
+    response.raise_for_status()
+    return from_usps_address(response.json().get("address") or {}, supplied)
+
+
+def address(body: Dict[str, Any]) -> ConnexionResponse:
+    cache = get_cache()
+    key = address_key(body)
+
+    suggested = cache.get(key)
+    if suggested is MISSING:
+        try:
+            suggested = lookup_usps_address(body)
+        except (requests.RequestException, ValueError):
+            logger.warning("USPS address validation failed", exc_info=True)
+            return error_response(
+                ServiceUnavailable,
+                "Address validation is unavailable",
+                [ValidationErrorDetail(type="service_unavailable", message="USPS")],
+            ).to_json_response()
+        cache.set(key, suggested)
+
+    return success_response(
+        "",
+        {
+            "matches": suggested is not None
+            and normalize_address(suggested) == normalize_address(body),
+            "supplied": body,
+            "suggested": suggested,
+        },
+    ).to_json_response()
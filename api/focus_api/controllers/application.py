@@ -0,0 +1,188 @@
+import asyncio
+import base64
+import datetime
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from connexion.exceptions import BadRequestProblem  # type: ignore
+from connexion.lifecycle import ConnexionResponse  # type: ignore
+from sqlalchemy.orm import Session
+from werkzeug.exceptions import ServiceUnavailable
+
+from focus_api.app import async_db_session
+from focus_api.clients import PHOTO, get_session
+from focus_api.controllers.response import ValidationErrorDetail, error_response, success_response
+from focus_api.db import jobs
+from focus_api.db.jobs import Job
+from focus_api.utils.logging import get_logger
+from focus_api.utils.offload import PoolFull, SharedBuffer, TaskTimeout, get_pool
+from focus_api.utils.photo_quality import SharedPhoto, check_photos
+from focus_api.utils.uploads import get_uploads
+
+logger = get_logger(__name__)
+
+PHOTO_FIELDS = ("photo1", "photo2", "photo3")
+
+
+def get_photos(body: Optional[dict[str, Any]]) -> Dict[str, Tuple[SharedPhoto, SharedBuffer]]:
+    """Copy the photos of a multipart upload, or of a JSON body of base64 strings, into shared
+    memory for the offload pool.
+
+    This reads the (possibly spooled to disk) uploads, so async controllers call it in a thread.
+    """
+    photos: Dict[str, Tuple[SharedPhoto, SharedBuffer]] = {}
+    uploads = get_uploads()
+    try:
+        if uploads is not None:
+            for name, upload in uploads.items():
+                buffer = SharedBuffer.from_file(upload.file, upload.size)
+                photos[name] = (SharedPhoto(name, buffer.name, upload.size), buffer)
+        else:
+            # Older clients send the photos base64 encoded in a JSON body; they're decoded in the
+            # pool.
+            for name in PHOTO_FIELDS:
+                if body is not None and body.get(name):
+                    buffer = SharedBuffer.from_bytes(body[name].encode())
+                    photos[name] = (
+                        SharedPhoto(name, buffer.name, buffer.size, base64_encoded=True),
+                        buffer,
+                    )
+    except Exception:
+        close_photos(photos)
+        raise
+    finally:
+        for upload in (uploads or {}).values():
+            upload.close()
+    return photos
+
+
+def close_photos(photos: Dict[str, Tuple[SharedPhoto, SharedBuffer]]) -> None:
+    for _photo, buffer in photos.values():
+        buffer.close()
+
+
+def read_valid_photos(
+    photos: Dict[str, Tuple[SharedPhoto, SharedBuffer]], results: Dict[str, Dict[str, Any]]
+) -> Dict[str, bytes]:
+    """Copy each valid photo out of shared memory, to be queued; async controllers call it in a
+    thread.
+    """
+    return {
+        name: bytes(buffer.buffer[: photo.size])
+        for name, (photo, buffer) in photos.items()
+        if results.get(name, {}).get("isValid")
+    }
+
+
+def photo_validation_unavailable(message: str) -> ConnexionResponse:
+    return error_response(
+        ServiceUnavailable,
+        message,
+        [ValidationErrorDetail(type="service_unavailable", message="photo validation")],
+    ).to_json_response()
+
+
+def enqueue_photos(
+    session: Session,
+    app_id: str,
+    photos: Dict[str, Tuple[SharedPhoto, SharedBuffer]],
+    results: Dict[str, Dict[str, Any]],
+    data: Dict[str, bytes],
+) -> Dict[str, uuid.UUID]:
+    """Queue a job to submit each photo in data to the Photo Quality Service; returns their ids."""
+    job_ids = {}
+    for name, photo_data in data.items():
+        photo, _buffer = photos[name]
+        result = results[name]
+        job_ids[name] = jobs.enqueue(
+            session,
+            "photo",
+            {
+                "applicationId": app_id,
+                "photo": name,
+                "contentType": result["contentType"],
+                "sha256": result["sha256"],
+                # Base64 photos are queued as sent, and decoded by the job worker.
+                "base64Encoded": photo.base64_encoded,
+            },
+            data=photo_data,
+        )
+    return job_ids
+
+
+def submit_photo(job: Job) -> Dict[str, Any]:
+    """Submit a queued photo to the Photo Quality Service; the photo job's handler."""
+    assert job.data is not None
+    data = base64.b64decode(job.data) if job.payload["base64Encoded"] else job.data
+    response = get_session(PHOTO).post(
+        "/photo",
+        data=data,
+        headers={"Content-Type": job.payload["contentType"]},
+        params={"applicationId": job.payload["applicationId"]},
+    )
+    response.raise_for_status()
+    return {"isValid": bool(response.json().get("isValid"))}
+
+
+async def photo(app_id: str, body: Optional[dict[str, Any]] = None) -> ConnexionResponse:
+    photos = await asyncio.to_thread(get_photos, body)
+    try:
+        results: Dict[str, Dict[str, Any]] = {}
+        if photos:
+            # Decoding and checking photos is CPU-bound, so it's done in the offload pool rather
+            # than holding up the other requests of this worker.
+            try:
+                results = await get_pool().run(
+                    check_photos, [photo for photo, _buffer in photos.values()]
+                )
+            except PoolFull as exception:
+                logger.warning("Photo validation pool is full")
+                response = photo_validation_unavailable("Photo validation is busy")
+                response.headers["Retry-After"] = str(exception.retry_after)
+                return response
+            except TaskTimeout:
+                logger.warning("Photo validation timed out")
+                return photo_validation_unavailable("Photo validation timed out")
+            except BrokenProcessPool:
+                # The next request starts a new pool.
+                logger.warning("Photo validation pool broke")
+                return photo_validation_unavailable("Photo validation is unavailable")
+
+        for name, result in results.items():
+            if "error" in result:
+                raise BadRequestProblem(detail=f"'{name}' is not valid base64")
+            logger.info(
+                "Photo checked",
+                extra={
+                    "photo": name,
+                    **{key: value for key, value in result.items() if key != "isValid"},
+                },
+            )
+
+        # Submitting the photos to the Photo Quality Service waits on it, so it's queued for a job
+        # worker (see focus_api.worker); the client follows the jobs at /jobs/{jobId}.
+        job_ids: Dict[str, uuid.UUID] = {}
+        data = await asyncio.to_thread(read_valid_photos, photos, results)
+        if data:
+            async with async_db_session() as session:
+                job_ids = await session.run_sync(enqueue_photos, app_id, photos, results, data)
+                await session.commit()
+
+        # The local check can only rule a photo out: whether a queued photo is valid is for the
+        # Photo Quality Service to say, and its job reports it.
+        return success_response(
+            "Photo received",
+            {
+                "applicationId": app_id,
+                "datetimeUploaded": datetime.datetime.now(datetime.UTC),
+                "status": {"isValid": None if "photo1" in job_ids else False},
+                "jobIds": job_ids,
+                "applicationStatus": {
+                    "applicationId": app_id,
+                    "currentStatus": "pending_photo_validation" if job_ids else "in_progress",
+                },
+            },
+        ).to_json_response()
+    finally:
+        await asyncio.to_thread(close_photos, photos)
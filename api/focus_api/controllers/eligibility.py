@@ -0,0 +1,52 @@
+import hashlib
+import json
+from typing import Any, Dict
+
+import requests
+from connexion.lifecycle import ConnexionResponse  # type: ignore
+from werkzeug.exceptions import ServiceUnavailable
+
+from focus_api.clients import ELIGIBILITY, get_session
+from focus_api.controllers.response import ValidationErrorDetail, error_response, success_response
+from focus_api.utils.cache import CacheConfig, TTLCache, get_config
+from focus_api.utils.logging import get_logger
+from focus_api.utils.single_flight import SingleFlight
+
+logger = get_logger(__name__)
+
+# Long enough to absorb double clicks and client retries, short enough that a changed answer from
+# the eligibility service is seen straight away.
+DEFAULT_CACHE_CONFIG = CacheConfig(maxsize=1024, ttl=5)
+
+cache_config = get_config("eligibility", DEFAULT_CACHE_CONFIG)
+checks = SingleFlight(
+    "eligibility", TTLCache("eligibility", maxsize=cache_config.maxsize, ttl=cache_config.ttl)
+)
+
+
+def check_key(body: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+
+def check_eligibility(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Ask the eligibility service whether the applicant is eligible.
+
+    Raises requests exceptions when the service can't be reached or fails.
+    """
+    response = get_session(ELIGIBILITY).post("/eligibility/check", json=body)
+    response.raise_for_status()
+    return {"isEligible": bool(response.json().get("isEligible"))}
+
+
+def eligibility(body: Dict[str, Any]) -> ConnexionResponse:
+    try:
+        result = checks.do(check_key(body), lambda: check_eligibility(body))
+    except (requests.RequestException, TimeoutError, ValueError):
+        logger.warning("Eligibility check failed", exc_info=True)
+        return error_response(
+            ServiceUnavailable,
+            "Eligibility checks are unavailable",
+            [ValidationErrorDetail(type="service_unavailable", message="Eligibility")],
+        ).to_json_response()
+
+    return success_response("", result).to_json_response()
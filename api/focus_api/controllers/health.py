@@ -1,28 +1,28 @@
 import datetime
-from typing import Any
 
-from sqlalchemy import text
+from connexion.lifecycle import ConnexionResponse  # type: ignore
 
-from opr_api.app import db_session
-from opr_api.controllers.response import success_response
+from focus_api.controllers.response import success_response
+from focus_api.utils.health import DOWN, get_prober
 
 
-def health_deep() -> tuple[dict[str, Any], int, dict[str, str]]:
-    with db_session() as session:
-        session.execute(text("SELECT 1;")).one()
-        return success_response(
-            "Response",
-            {
-                "status": "up",
-                "timestamp": datetime.datetime.now(datetime.UTC),
-                "apiName": "opr-api",
-                "apiVersion": "v1",
-                "components": {"db": {"status": "up"}},
-            },
-        ).to_api_response()
+def health_deep() -> ConnexionResponse:
+    """Report the results of the background health checks; see focus_api.utils.health."""
+    health_status = get_prober().status()
+    return success_response(
+        "Response",
+        {
+            "status": health_status["status"],
+            "timestamp": datetime.datetime.now(datetime.UTC),
+            "apiName": "opr-api",
+            "apiVersion": "v1",
+            "components": health_status["components"],
+        },
+        status_code=503 if health_status["status"] == DOWN else 200,
+    ).to_json_response()
 
 
-def health() -> tuple[dict[str, Any], int, dict[str, str]]:
+def health() -> ConnexionResponse:
     return success_response(
         "Success",
         {
@@ -31,4 +31,4 @@ def health() -> tuple[dict[str, Any], int, dict[str, str]]:
             "apiName": "opr-api",
             "apiVersion": "v1",
         },
-    ).to_api_response()
+    ).to_json_response()
@@ -0,0 +1,43 @@
+import uuid
+
+from connexion.lifecycle import ConnexionResponse  # type: ignore
+from werkzeug.exceptions import NotFound
+
+from focus_api.app import db_session
+from focus_api.controllers.response import ValidationErrorDetail, error_response, success_response
+from focus_api.db import jobs
+
+
+def job_not_found() -> ConnexionResponse:
+    return error_response(
+        NotFound, "Job not found", [ValidationErrorDetail(type="not_found", message="job")]
+    ).to_json_response()
+
+
+def job(job_id: str) -> ConnexionResponse:
+    try:
+        queued_id = uuid.UUID(job_id)
+    except ValueError:
+        # No job has an id which isn't a UUID.
+        return job_not_found()
+
+    # Not read-only: a replica may not have the job yet, just after it was queued.
+    with db_session() as session:
+        queued = jobs.get_job(session, queued_id)
+
+    if queued is None:
+        return job_not_found()
+
+    return success_response(
+        "",
+        {
+            "id": queued.id,
+            "kind": queued.kind,
+            "status": queued.status,
+            "attempts": queued.attempts,
+            "maxAttempts": queued.max_attempts,
+            "result": queued.result,
+            "createdAt": queued.created_at,
+            "updatedAt": queued.updated_at,
+        },
+    ).to_json_response()
@@ -0,0 +1,11 @@
+from connexion.lifecycle import ConnexionResponse  # type: ignore
+
+from focus_api.utils import prometheus
+
+
+def metrics() -> ConnexionResponse:
+    return ConnexionResponse(
+        status_code=200,
+        content_type=prometheus.CONTENT_TYPE,
+        body=prometheus.generate_latest(),
+    )
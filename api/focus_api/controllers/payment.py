@@ -0,0 +1,95 @@
+import datetime
+from typing import Any, Dict
+
+import requests
+from connexion.lifecycle import ConnexionResponse  # type: ignore
+from urllib3.exceptions import NewConnectionError
+
+from focus_api.app import db_session
+from focus_api.clients import PAYMENT, get_session
+from focus_api.controllers.response import success_response
+from focus_api.db import jobs, session_scope
+from focus_api.db.jobs import Job, PermanentJobError
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Sent with the job's id on every attempt, so that a processor which deduplicates payments takes a
+# job's payment at most once.
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+# Statuses for which the processor certainly didn't take the payment, and asks to try again later
+RETRY_STATUSES = frozenset({429, 503})
+
+
+def pay(body: Dict[str, Any]) -> ConnexionResponse:
+    # Processing a payment waits on the payment processor, so it's queued for a job worker (see
+    # focus_api.worker); the client follows the job at /jobs/{jobId}.
+    with db_session() as session, session_scope(session):
+        job_id = jobs.enqueue(session, "payment", body)
+
+    return success_response(
+        "Payment accepted",
+        {
+            "jobId": job_id,
+            "status": {
+                "applicationId": body["caseId"],
+                "currentStatus": "pending_payment_received",
+            },
+        },
+        status_code=202,
+    ).to_json_response()
+
+
+def was_sent(exception: requests.RequestException) -> bool:
+    """Whether the payment reached the processor before exception, e.g. a read timeout or a
+    connection reset, rather than failing to connect.
+    """
+    if isinstance(exception, requests.ConnectTimeout):
+        return False
+    if isinstance(exception, requests.ConnectionError):
+        reason = exception.args[0] if exception.args else None
+        # urllib3's MaxRetryError, after retrying the connection
+        reason = getattr(reason, "reason", reason)
+        return not isinstance(reason, NewConnectionError)
+    return isinstance(exception, requests.Timeout)
+
+
+def needs_review(job: Job, reason: str) -> PermanentJobError:
+    logger.error(
+        "Payment outcome unknown, needs review", extra={"job_id": str(job.id), "reason": reason}
+    )
+    return PermanentJobError(f"Payment outcome unknown, needs review: {reason}")
+
+
+def process_payment(job: Job) -> Dict[str, Any]:
+    """Submit a queued payment to the payment processor; the payment job's handler.
+
+    It's only retried when the processor certainly didn't take the payment. When it may have (no
+    answer after the payment was sent, a server error, or a worker stopping mid-attempt), the job
+    fails for someone to review rather than risk charging twice.
+    """
+    if job.reclaimed:
+        raise needs_review(job, "the worker sending it stopped")
+    try:
+        response = get_session(PAYMENT).post(
+            "/payments", json=job.payload, headers={IDEMPOTENCY_KEY_HEADER: str(job.id)}
+        )
+        response.raise_for_status()
+    except requests.HTTPError as exception:
+        status = exception.response.status_code if exception.response is not None else None
+        if status in RETRY_STATUSES:
+            raise
+        # The processor rejected the payment itself; trying again won't change its answer.
+        if status is not None and 400 <= status < 500:
+            raise PermanentJobError(f"Payment rejected with status {status}") from exception
+        raise needs_review(job, f"status {status}") from exception
+    except (requests.ConnectionError, requests.Timeout) as exception:
+        if was_sent(exception):
+            raise needs_review(job, type(exception).__name__) from exception
+        raise
+
+    return {
+        "applicationId": job.payload["caseId"],
+        "datetimeProcessed": datetime.datetime.now(datetime.UTC).isoformat(),
+        "processor": "paygov",
+    }
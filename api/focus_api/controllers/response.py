@@ -1,6 +1,8 @@
 from typing import Any, Optional, Type, Union
 
-from flask import request
+from connexion import request  # type: ignore
+from connexion.lifecycle import ConnexionResponse  # type: ignore
+from pydantic import Field
 from werkzeug.exceptions import (
     BadRequest,
     Conflict,
@@ -10,11 +12,12 @@ from werkzeug.exceptions import (
     ServiceUnavailable,
 )
 
-from opr_api.utils.pydantic import PydanticBaseModel
+from focus_api.db.pagination import Page
+from focus_api.utils.pydantic import PydanticBaseModel
 
 
 class ValidationErrorDetail(PydanticBaseModel):
-    type: str
+    type: str = Field(serialization_alias="errorType")
     message: str = ""
     field: Optional[str] = None
     value: Optional[str] = None
@@ -22,12 +25,32 @@ class ValidationErrorDetail(PydanticBaseModel):
 
 
 class PagingMetaData(PydanticBaseModel):
-    page_offset: int
+    page_offset: Optional[int] = None
     page_size: int
-    total_records: int
-    total_pages: int
+    # None when the total wasn't asked for; an estimate when total_records_is_estimate
+    total_records: Optional[int] = None
+    total_pages: Optional[int] = None
+    total_records_is_estimate: Optional[bool] = None
     order_by: str
     order_direction: str
+    # Opaque keyset pagination cursors for this page and the next (see focus_api.db.pagination)
+    cursor: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+    @classmethod
+    def from_page(cls, page: Page) -> "PagingMetaData":
+        return cls(
+            page_size=page.page_size,
+            total_records=page.total_records,
+            total_pages=page.total_pages,
+            total_records_is_estimate=(
+                page.total_is_estimate if page.total_records is not None else None
+            ),
+            order_by=page.order_by,
+            order_direction=page.order_direction,
+            cursor=page.cursor,
+            next_cursor=page.next_cursor,
+        )
 
 
 class MetaData(PydanticBaseModel):
@@ -45,12 +68,15 @@ class Response(PydanticBaseModel):
     warnings: Optional[list[ValidationErrorDetail]] = None
     errors: Optional[list[ValidationErrorDetail]] = None
 
-    def to_api_response(self) -> tuple[dict[str, Any], int, dict[str, str]]:
+    def set_request_meta(self) -> None:
         if self.meta is None:
-            self.meta = MetaData(method=request.method, resource=request.path)
+            self.meta = MetaData(method=request.method, resource=request.url.path)
         else:
             self.meta.method = request.method
-            self.meta.method = request.path
+            self.meta.resource = request.url.path
+
+    def to_api_response(self) -> tuple[dict[str, Any], int, dict[str, str]]:
+        self.set_request_meta()
 
         return (
             self.model_dump(exclude_none=True, by_alias=True),
@@ -58,6 +84,20 @@ class Response(PydanticBaseModel):
             {"Content-Type": "application/json"},
         )
 
+    def to_json_response(self) -> ConnexionResponse:
+        """Serialize straight to JSON bytes, skipping the intermediate dict.
+
+        Uses the serializer pydantic compiles once per model class, and returns a response
+        connexion passes through without encoding it again.
+        """
+        self.set_request_meta()
+
+        return ConnexionResponse(
+            status_code=self.status_code,
+            content_type="application/json",
+            body=self.__pydantic_serializer__.to_json(self, exclude_none=True, by_alias=True),
+        )
+
 
 def success_response(
     message: str,
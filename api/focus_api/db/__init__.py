@@ -1,19 +1,20 @@
+import dataclasses
 import json
 import os
 from contextlib import contextmanager
 from typing import Any, Dict, Generator, Optional, Union
-from urllib.parse import urlparse
 
-import psycopg2
 import sqlalchemy
-import sqlalchemy.pool as pool
 from sqlalchemy import URL
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
-import opr_api.db.handle_error  # noqa: F401
-from opr_api.db.config import DbConfig, get_config
-from opr_api.utils.logging import get_logger
+import focus_api.db.handle_error  # noqa: F401
+import focus_api.db.statement_timeout  # noqa: F401
+from focus_api.db.config import DbConfig, get_config
+from focus_api.db.pool import MeteredQueuePool, register_engine
+from focus_api.db.routing import USE_PRIMARY, ReplicaSet, RoutingSession
+from focus_api.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
@@ -24,40 +25,84 @@ def get_connection_url(config: DbConfig) -> Union[URL | str]:
     return config.connection_string
 
 
-def init(config: Optional[DbConfig] = None) -> scoped_session:
-    logger.info("connecting to postgres db")
+def init(config: Optional[DbConfig] = None, connect: bool = True) -> scoped_session:
+    """Create the engine and session factory.
+
+    With connect, connect once so that misconfiguration fails fast; otherwise the first
+    connection is made by the first query.
+    """
     db_config: DbConfig = config if config is not None else get_config()
-    connection_url = get_connection_url(db_config)
-    engine = sqlalchemy.create_engine(
-        connection_url,
-        execution_options={
-            "isolation_level": "AUTOCOMMIT",
-            "search_path": db_config.schema,
-            "statement_timeout": db_config.statement_timeout,
-        },
-    )
-    conn = engine.connect()
+    engine = create_engine(db_config)
 
-    conn_info = conn.connection.info
-    logger.info(
-        "connected to postgres db",
-        extra={**conn_info},
-    )
-    # verify_ssl(conn_info)
+    if connect:
+        connect_to_db(engine)
 
     # Explicitly commit sessions — usually with session_scope. Also disable expiry on commit,
     # as we don't need to be strict on consistency within our routes. Once we've retrieved data
     # from the database, we shouldn't make any extra requests to the db when grabbing existing
     # attributes.
+    #
+    # With read replicas configured, sessions are RoutingSessions which send the SELECTs of
+    # read-only operations to a replica.
+    session_class: type[Session] = Session
+    session_kwargs: Dict[str, Any] = {}
+    if db_config.replica_connection_strings:
+        session_class = RoutingSession
+        session_kwargs["replicas"] = create_replica_set(db_config)
+
     session_factory = scoped_session(
-        sessionmaker(autocommit=False, expire_on_commit=False, bind=engine)
+        sessionmaker(
+            class_=session_class,
+            autocommit=False,
+            expire_on_commit=False,
+            bind=engine,
+            **session_kwargs,
+        )
     )
 
-    engine.dispose()
-
     return session_factory
 
 
+def connect_to_db(engine: Engine) -> None:
+    """Connect once, logging the server's details, and return the connection to the pool.
+
+    The connection is returned rather than disposed, so the first request doesn't pay for a cold
+    connect.
+    """
+    logger.info("connecting to postgres db")
+    with engine.connect() as conn:
+        conn_info = conn.connection.dbapi_connection.info  # type: ignore[union-attr]
+        logger.info(
+            "connected to postgres db",
+            extra={
+                "dbname": conn_info.dbname,
+                "host": conn_info.host,
+                "port": conn_info.port,
+                "server_version": conn_info.server_version,
+            },
+        )
+        # verify_ssl(conn_info)
+
+
+def create_replica_set(db_config: DbConfig) -> ReplicaSet:
+    """Create a pooled engine for each replica, sized like the primary."""
+    engines = [
+        create_engine(
+            dataclasses.replace(db_config, connection_string=connection_string),
+            name=f"replica{index}",
+        )
+        for index, connection_string in enumerate(db_config.replica_connection_strings)
+    ]
+    logger.info("configured read replicas", extra={"replica_count": len(engines)})
+
+    return ReplicaSet(
+        engines,
+        selection=db_config.replica_selection,
+        max_lag=db_config.replica_max_lag,
+        lag_check_interval=db_config.replica_lag_check_interval,
+    )
+
+
 def verify_ssl(connection_info: Any) -> None:
     """Verify that the database connection is encrypted and log a warning if not.
 
@@ -74,31 +119,36 @@ def verify_ssl(connection_info: Any) -> None:
         logger.warning("database connection is not using SSL")
 
 
-def create_engine(config: Optional[DbConfig] = None) -> Engine:
-    db_config: DbConfig = config if config is not None else get_config()
+def create_engine(config: Optional[DbConfig] = None, name: str = "primary") -> Engine:
+    """Create a pooled engine sized from the DbConfig.
 
-    conn_pool = pool.QueuePool(
-        psycopg2.connect(**get_connection_parameters(db_config)),
-        max_overflow=10,
-        pool_size=20,
-        timeout=3,
-    )
+    Engines are registered with focus_api.db.pool, which reports pool metrics and resets the
+    pool in forked child processes so connections are never shared between gunicorn workers.
+    """
+    db_config: DbConfig = config if config is not None else get_config()
 
-    # The URL only needs to specify the dialect, since the connection pool
-    # handles the actual connections.
-    #
-    # (a SQLAlchemy Engine represents a Dialect+Pool)
-    return sqlalchemy.create_engine(
-        "postgresql://",
-        pool=conn_pool,
-        executemany_mode="batch",
+    engine = sqlalchemy.create_engine(
+        get_connection_url(db_config),
+        poolclass=MeteredQueuePool,
+        pool_size=db_config.pool_size,
+        max_overflow=db_config.max_overflow,
+        pool_timeout=db_config.pool_timeout,
+        pool_recycle=db_config.pool_recycle,
+        pool_pre_ping=db_config.pool_pre_ping,
+        pool_logging_name=name,
+        connect_args=get_connect_args(db_config),
+        execution_options={"isolation_level": "AUTOCOMMIT"},
         hide_parameters=db_config.hide_sql_parameter_logs,
         json_serializer=lambda o: json.dumps(o),
     )
+    register_engine(engine)
 
+    return engine
 
-def get_connection_parameters(db_config: DbConfig) -> Dict[str, Any]:
-    connect_args = {}
+
+def get_connect_args(db_config: DbConfig) -> Dict[str, Any]:
+    """Arguments passed to psycopg2.connect for every new pooled connection."""
+    connect_args: Dict[str, Any] = {}
     environment = os.getenv("ENVIRONMENT")
     if not environment:
         raise Exception("ENVIRONMENT is not set")
@@ -106,19 +156,7 @@ def get_connection_parameters(db_config: DbConfig) -> Dict[str, Any]:
     if environment != "local":
         connect_args["sslmode"] = "require"
 
-    result = urlparse(db_config.connection_string)
-    username = result.username
-    password = result.password
-    database = result.path[1:]
-    host = result.hostname
-    port = result.port
-
     return dict(
-        host=host,
-        dbname=database,
-        user=username,
-        password=password,
-        port=port,
         options=f"-c search_path={db_config.schema} -c statement_timeout={db_config.statement_timeout}",
         connect_timeout=3,
         **connect_args,
@@ -132,6 +170,9 @@ def session_scope(session: Session, close: bool = False) -> Generator[Session, N
     See https://docs.sqlalchemy.org/en/13/orm/session_basics.html#when-do-i-construct-a-session-when-do-i-commit-it-and-when-do-i-close-it
     """
 
+    # Transactions always run against the primary, including any reads inside them.
+    session.info[USE_PRIMARY] = True
+
     try:
         yield session
         session.commit()
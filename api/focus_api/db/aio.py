@@ -0,0 +1,110 @@
+#
+# asyncio database access, for `async def` controllers.
+#
+# This mirrors focus_api.db for the asyncpg driver: an async engine sized from the same DbConfig,
+# and a session factory. Async controllers run directly on the server's event loop (see
+# focus_api.middleware.async_controllers), so waiting on the database doesn't tie up a thread.
+#
+# Sync and async controllers can be mixed; each uses its own pool, so the combined pool budget
+# counts both towards Postgres max_connections.
+#
+
+import json
+import os
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Self
+
+from sqlalchemy import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine as sqlalchemy_create_async_engine
+
+from focus_api.db.config import DbConfig, get_config
+from focus_api.db.pool import MeteredAsyncAdaptedQueuePool, register_engine
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# The AsyncSession for the request being handled, set by the async controller middleware.
+current_session: ContextVar[Optional[AsyncSession]] = ContextVar("async_db_session", default=None)
+
+
+def get_async_connection_url(config: DbConfig) -> URL:
+    """Use the asyncpg driver for the configured connection string."""
+    return make_url(config.connection_string).set(drivername="postgresql+asyncpg")
+
+
+def init_async(config: Optional[DbConfig] = None) -> async_sessionmaker[AsyncSession]:
+    logger.info("configuring async postgres db")
+    db_config: DbConfig = config if config is not None else get_config()
+
+    # As with the sync sessions, commit explicitly and don't expire attributes on commit.
+    return async_sessionmaker(create_async_engine(db_config), expire_on_commit=False)
+
+
+class LazyAsyncSessionFactory:
+    """A session factory which only creates its engine (importing asyncpg) when first called.
+
+    For apps started with lazy startup, where async controllers may never be called.
+    """
+
+    def __init__(self: Self, config: Optional[DbConfig] = None) -> None:
+        self.config = config
+        self._factory: Optional[async_sessionmaker[AsyncSession]] = None
+        self._lock = threading.Lock()
+
+    def __call__(self: Self) -> AsyncSession:
+        if self._factory is None:
+            with self._lock:
+                if self._factory is None:
+                    self._factory = init_async(self.config)
+        return self._factory()
+
+
+def create_async_engine(
+    config: Optional[DbConfig] = None, name: str = "primary_async"
+) -> AsyncEngine:
+    """Create a pooled asyncpg engine sized from the DbConfig.
+
+    No connection is opened here; asyncpg connections belong to the event loop that opened them,
+    so the pool fills on first use from within the serving loop.
+    """
+    db_config: DbConfig = config if config is not None else get_config()
+
+    engine = sqlalchemy_create_async_engine(
+        get_async_connection_url(db_config),
+        poolclass=MeteredAsyncAdaptedQueuePool,
+        pool_size=db_config.pool_size,
+        max_overflow=db_config.max_overflow,
+        pool_timeout=db_config.pool_timeout,
+        pool_recycle=db_config.pool_recycle,
+        pool_pre_ping=db_config.pool_pre_ping,
+        pool_logging_name=name,
+        connect_args=get_async_connect_args(db_config),
+        execution_options={"isolation_level": "AUTOCOMMIT"},
+        hide_parameters=db_config.hide_sql_parameter_logs,
+        json_serializer=lambda o: json.dumps(o),
+    )
+    register_engine(engine.sync_engine)
+
+    return engine
+
+
+def get_async_connect_args(db_config: DbConfig) -> Dict[str, Any]:
+    """Arguments passed to asyncpg.connect, equivalent to focus_api.db.get_connect_args."""
+    connect_args: Dict[str, Any] = {}
+    environment = os.getenv("ENVIRONMENT")
+    if not environment:
+        raise Exception("ENVIRONMENT is not set")
+
+    if environment != "local":
+        connect_args["ssl"] = "require"
+
+    return dict(
+        server_settings={
+            "search_path": db_config.schema,
+            "statement_timeout": str(db_config.statement_timeout),
+        },
+        timeout=3,
+        **connect_args,
+    )
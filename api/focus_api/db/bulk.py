@@ -0,0 +1,265 @@
+#
+# Bulk loading of rows, for back-loads, replays and partner files.
+#
+# Loading row by row through the ORM costs a round trip and a unit of work flush per row. These
+# functions instead stream rows from any iterable into a table in batches, holding at most one
+# batch in memory:
+#
+# - copy_rows: COPY ... FROM STDIN, the fastest way into Postgres. Rows are rendered as CSV while
+#   Postgres reads them.
+# - insert_rows: batched INSERTs, either executemany (which SQLAlchemy sends as multi-row
+#   INSERTs) or one insert().values() statement per batch.
+#
+# Python-side column defaults (e.g. default=uuid.uuid4) are applied to attributes a model instance
+# leaves unset, and by insert_rows to columns missing from mappings. COPY doesn't apply them to
+# mappings, so there every NOT NULL column without a server default must be in the rows.
+#
+# Both take the API's pooled Engine, or a Session on it to write on the session's connection. Each
+# batch is committed as it is written (the API's engine is AUTOCOMMIT), so memory and lock use
+# stay bounded, and a failed load can be resumed after the last logged batch.
+#
+# Rows are mappings of column name to value (or sequences, in the order of columns), or instances
+# of a model on focus_api.models.base.Base. Progress is logged per batch with the rows per
+# second, and loaded rows are counted in db_bulk_rows_loaded_total.
+#
+
+import dataclasses
+import datetime
+import itertools
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Optional, Sequence, Union
+
+from sqlalchemy import Column, Table, insert, inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, scoped_session
+from sqlalchemy.sql.schema import CallableColumnDefault, ScalarElementColumnDefault
+
+from focus_api.models.base import Base
+from focus_api.utils import metrics
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+BULK_ROWS_LOADED = metrics.counter(
+    "db_bulk_rows_loaded_total", "Rows written by bulk loads, by table and method"
+)
+
+COPY_BATCH_SIZE = 10000
+INSERT_BATCH_SIZE = 1000
+
+Bind = Union[Engine, Session, "scoped_session[Session]"]
+Target = Union[Table, type[Base]]
+Row = Union[Dict[str, Any], Sequence[Any], Base]
+
+
+@dataclasses.dataclass
+class LoadResult:
+    table: str
+    method: str
+    rows: int = 0
+    batches: int = 0
+    seconds: float = 0
+
+    @property
+    def rows_per_second(self: "LoadResult") -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def get_table(target: Target) -> Table:
+    return target if isinstance(target, Table) else target.__table__  # type: ignore[return-value]
+
+
+@contextmanager
+def batch_connection(bind: Bind) -> Generator[Connection, None, None]:
+    """A connection to write one batch with.
+
+    For an engine, a pooled connection in a transaction committed after the batch; for a session,
+    its own connection, leaving the transaction to the session.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            yield conn
+    else:
+        yield bind.connection()
+
+
+def apply_default(column: Column[Any], value: Any) -> Any:
+    """Apply a column's Python-side default to a value the model instance left unset."""
+    default = column.default
+    if value is not None or not isinstance(
+        default, (ScalarElementColumnDefault, CallableColumnDefault)
+    ):
+        return value
+    if isinstance(default, CallableColumnDefault):
+        # Defaults that take no arguments are wrapped to accept (and ignore) the context.
+        return default.arg(None)  # type: ignore[arg-type]
+    return default.arg
+
+
+def row_values(row: Row, columns: Sequence[str]) -> List[Any]:
+    if isinstance(row, Base):
+        table = get_table(type(row))
+        return [apply_default(table.c[column], getattr(row, column)) for column in columns]
+    if isinstance(row, dict):
+        return [row.get(column) for column in columns]
+    return list(row)
+
+
+def batches(rows: Iterable[Row], batch_size: int) -> Iterator[List[Row]]:
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def get_columns(table: Table, rows: Iterator[Row]) -> tuple[List[str], Iterator[Row]]:
+    """The columns to load: the first row's keys for mappings, or all columns for models."""
+    first = next(rows, None)
+    if first is None:
+        return [], rows
+    rows = itertools.chain([first], rows)
+    if isinstance(first, dict):
+        return list(first), rows
+    if isinstance(first, Base):
+        return [attribute.key for attribute in inspect(first).mapper.column_attrs], rows
+    raise ValueError("columns are required when rows are sequences")
+
+
+def to_csv_field(value: Any) -> str:
+    """Render a value for COPY in CSV format, where an unquoted empty field is NULL."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        text = "t" if value else "f"
+    elif isinstance(value, (datetime.date, datetime.time)):
+        text = value.isoformat()
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        text = "\\x" + bytes(value).hex()
+    elif isinstance(value, uuid.UUID):
+        text = str(value)
+    else:
+        text = str(value)
+    return '"' + text.replace('"', '""') + '"'
+
+
+class CsvStream:
+    """A file-like object rendering rows as CSV as COPY reads it, a line at a time."""
+
+    def __init__(self: "CsvStream", rows: Iterable[Row], columns: Sequence[str]) -> None:
+        self.lines = (
+            ",".join(to_csv_field(value) for value in row_values(row, columns)) + "\n"
+            for row in rows
+        )
+        self.buffer = ""
+        self.rows = 0
+
+    def read(self: "CsvStream", size: int = -1) -> str:
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+            self.rows += 1
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self: "CsvStream", size: int = -1) -> str:
+        return self.read(size)
+
+
+def log_batch(result: LoadResult, start: float) -> None:
+    result.seconds = time.monotonic() - start
+    logger.info(
+        "Bulk load batch written",
+        extra={
+            "table": result.table,
+            "method": result.method,
+            "rows": result.rows,
+            "batches": result.batches,
+            "rows_per_second": round(result.rows_per_second),
+        },
+    )
+
+
+def copy_rows(
+    bind: Bind,
+    target: Target,
+    rows: Iterable[Row],
+    columns: Optional[Sequence[str]] = None,
+    batch_size: int = COPY_BATCH_SIZE,
+) -> LoadResult:
+    """Load rows into target with COPY, one COPY statement per batch of batch_size rows."""
+    table = get_table(target)
+    iterator = iter(rows)
+    if columns is None:
+        columns, iterator = get_columns(table, iterator)
+
+    result = LoadResult(table=table.name, method="copy")
+    start = time.monotonic()
+    while (first := next(iterator, None)) is not None:
+        # Rows are rendered from the iterator as COPY reads them, so not even a batch is held.
+        stream = CsvStream(
+            itertools.chain([first], itertools.islice(iterator, batch_size - 1)), columns
+        )
+        with batch_connection(bind) as conn:
+            preparer = conn.dialect.identifier_preparer
+            statement = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+                preparer.format_table(table),
+                ", ".join(preparer.quote(column) for column in columns),
+            )
+            with conn.connection.dbapi_connection.cursor() as cursor:  # type: ignore[union-attr]
+                cursor.copy_expert(statement, stream)
+
+        result.rows += stream.rows
+        result.batches += 1
+        BULK_ROWS_LOADED.inc(stream.rows, table=table.name, method="copy")
+        log_batch(result, start)
+
+    result.seconds = time.monotonic() - start
+    return result
+
+
+def insert_rows(
+    bind: Bind,
+    target: Target,
+    rows: Iterable[Row],
+    columns: Optional[Sequence[str]] = None,
+    batch_size: int = INSERT_BATCH_SIZE,
+    method: str = "executemany",
+) -> LoadResult:
+    """Load rows into target with batched INSERTs.
+
+    method is "executemany" (one INSERT with many parameter sets per batch) or "values" (one
+    INSERT ... VALUES (...), (...) statement per batch).
+    """
+    if method not in ("executemany", "values"):
+        raise ValueError("method must be executemany or values")
+
+    table = get_table(target)
+    iterator = iter(rows)
+    if columns is None:
+        columns, iterator = get_columns(table, iterator)
+
+    result = LoadResult(table=table.name, method=method)
+    start = time.monotonic()
+    for batch in batches(iterator, batch_size):
+        parameters = [dict(zip(columns, row_values(row, columns))) for row in batch]
+        with batch_connection(bind) as conn:
+            if method == "values":
+                conn.execute(insert(table).values(parameters))
+            else:
+                conn.execute(insert(table), parameters)
+
+        result.rows += len(batch)
+        result.batches += 1
+        BULK_ROWS_LOADED.inc(len(batch), table=table.name, method=method)
+        log_batch(result, start)
+
+    result.seconds = time.monotonic() - start
+    return result
@@ -0,0 +1,97 @@
+#
+# A cache tier in Postgres, shared by every worker (see focus_api.utils.cache).
+#
+# Entries live in the result_cache table, which is UNLOGGED: it skips the write-ahead log, so
+# writes are cheap, and its contents are lost after a crash, which is fine for a cache. The table
+# is created by the deploy step, focus_api.db.schema. Expired entries are ignored when read, and
+# deleted by whichever process next writes after purge_interval seconds.
+#
+# The cache is an optimization, so database errors are logged and treated as misses.
+#
+
+import json
+import time
+from typing import Any, Self
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from focus_api.db.warmup import register_hot_statement
+from focus_api.utils.cache import CACHE_LOOKUPS, MISSING
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+CREATE_TABLE = text("""
+    CREATE UNLOGGED TABLE IF NOT EXISTS result_cache (
+        cache TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value JSONB NOT NULL,
+        expires_at TIMESTAMPTZ NOT NULL,
+        PRIMARY KEY (cache, key)
+    )
+    """)
+
+SELECT_ENTRY = register_hot_statement(
+    text("""
+    SELECT value FROM result_cache
+    WHERE cache = :cache AND key = :key AND expires_at > now()
+    """),
+    ("cache", "key"),
+)
+
+UPSERT_ENTRY = register_hot_statement(
+    text("""
+    INSERT INTO result_cache (cache, key, value, expires_at)
+    VALUES (:cache, :key, CAST(:value AS JSONB), now() + make_interval(secs => :ttl))
+    ON CONFLICT (cache, key) DO UPDATE
+    SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+    """),
+    ("cache", "key", "ttl", "value"),
+)
+
+DELETE_EXPIRED = text("DELETE FROM result_cache WHERE cache = :cache AND expires_at <= now()")
+
+
+def create_schema(connection: Connection) -> None:
+    """Create the result_cache table (see focus_api.db.schema)."""
+    connection.execute(CREATE_TABLE)
+
+
+class PostgresCacheTier:
+    def __init__(
+        self: Self, name: str, engine: Engine, ttl: float = 300, purge_interval: float = 600
+    ) -> None:
+        self.name = name
+        self.engine = engine
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._purged_at = time.monotonic()
+
+    def get(self: Self, key: str) -> Any:
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(SELECT_ENTRY, {"cache": self.name, "key": key}).first()
+        except SQLAlchemyError:
+            logger.warning("Unable to read from result cache", extra={"cache": self.name})
+            row = None
+
+        CACHE_LOOKUPS.inc(cache=self.name, tier="postgres", result="miss" if row is None else "hit")
+        return MISSING if row is None else row.value
+
+    def set(self: Self, key: str, value: Any) -> None:
+        purge = time.monotonic() - self._purged_at >= self.purge_interval
+        if purge:
+            self._purged_at = time.monotonic()
+
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(
+                    UPSERT_ENTRY,
+                    {"cache": self.name, "key": key, "value": json.dumps(value), "ttl": self.ttl},
+                )
+                if purge:
+                    conn.execute(DELETE_EXPIRED, {"cache": self.name})
+        except SQLAlchemyError:
+            logger.warning("Unable to write to result cache", extra={"cache": self.name})
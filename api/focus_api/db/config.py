@@ -1,7 +1,9 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import List
 
-from opr_api.utils.logging import get_logger
+from focus_api.utils.env import get_bool_env, get_int_env
+from focus_api.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
@@ -17,6 +19,25 @@ class DbConfig:
     # The default here is set to 60 minutes and is specified in MS
     # 1000 * 60 * 60
     statement_timeout: int = 3600000
+    # Connection pool sizing, per process. Each gunicorn worker holds its own pool, so the total
+    # number of Postgres connections is up to workers * (pool_size + max_overflow).
+    pool_size: int = 5
+    max_overflow: int = 10
+    # Seconds to wait for a connection from a saturated pool before raising
+    pool_timeout: int = 30
+    # Seconds after which a pooled connection is replaced, to stay under server/proxy idle limits
+    pool_recycle: int = 1800
+    # Test connections with a lightweight ping on checkout, replacing them if they were dropped
+    pool_pre_ping: bool = True
+    # Read replicas used for read-only operations. When empty, all traffic goes to the primary.
+    replica_connection_strings: List[str] = field(default_factory=list)
+    # How a replica is picked for each statement: "round_robin" or "least_busy" (fewest
+    # connections checked out of its pool)
+    replica_selection: str = "round_robin"
+    # Replicas replaying WAL further behind the primary than this (in seconds) are skipped
+    replica_max_lag: int = 5
+    # How often (in seconds) each worker re-measures a replica's lag
+    replica_lag_check_interval: int = 10
 
 
 def get_config() -> DbConfig:
@@ -30,9 +51,47 @@ def get_config() -> DbConfig:
         schema=os.getenv("DB_SCHEMA", "public"),
     )
 
-    statement_timeout_override = os.getenv("DB_STATEMENT_TIMEOUT")
-    if statement_timeout_override is not None and statement_timeout_override.isdigit():
-        db_config.statement_timeout = int(statement_timeout_override)
+    statement_timeout_override = get_int_env("DB_STATEMENT_TIMEOUT")
+    if statement_timeout_override is not None:
+        db_config.statement_timeout = statement_timeout_override
+
+    pool_size_override = get_int_env("DB_POOL_SIZE")
+    if pool_size_override is not None:
+        db_config.pool_size = pool_size_override
+
+    max_overflow_override = get_int_env("DB_MAX_OVERFLOW")
+    if max_overflow_override is not None:
+        db_config.max_overflow = max_overflow_override
+
+    pool_timeout_override = get_int_env("DB_POOL_TIMEOUT")
+    if pool_timeout_override is not None:
+        db_config.pool_timeout = pool_timeout_override
+
+    pool_recycle_override = get_int_env("DB_POOL_RECYCLE")
+    if pool_recycle_override is not None:
+        db_config.pool_recycle = pool_recycle_override
+
+    pool_pre_ping_override = get_bool_env("DB_POOL_PRE_PING")
+    if pool_pre_ping_override is not None:
+        db_config.pool_pre_ping = pool_pre_ping_override
+
+    replicas_override = os.getenv("POSTGRES_REPLICA_CONNECTION_STRINGS")
+    if replicas_override:
+        db_config.replica_connection_strings = [
+            replica.strip() for replica in replicas_override.split(",") if replica.strip()
+        ]
+
+    replica_selection_override = os.getenv("DB_REPLICA_SELECTION")
+    if replica_selection_override in ("round_robin", "least_busy"):
+        db_config.replica_selection = replica_selection_override
+
+    replica_max_lag_override = get_int_env("DB_REPLICA_MAX_LAG")
+    if replica_max_lag_override is not None:
+        db_config.replica_max_lag = replica_max_lag_override
+
+    replica_lag_check_interval_override = get_int_env("DB_REPLICA_LAG_CHECK_INTERVAL")
+    if replica_lag_check_interval_override is not None:
+        db_config.replica_lag_check_interval = replica_lag_check_interval_override
 
     logger.info(
         "Constructed database configuration",
@@ -41,6 +100,14 @@ def get_config() -> DbConfig:
             "schema": db_config.schema,
             "hide_sql_parameter_logs": db_config.hide_sql_parameter_logs,
             "statement_timeout": db_config.statement_timeout,
+            "pool_size": db_config.pool_size,
+            "max_overflow": db_config.max_overflow,
+            "pool_timeout": db_config.pool_timeout,
+            "pool_recycle": db_config.pool_recycle,
+            "pool_pre_ping": db_config.pool_pre_ping,
+            "replica_count": len(db_config.replica_connection_strings),
+            "replica_selection": db_config.replica_selection,
+            "replica_max_lag": db_config.replica_max_lag,
         },
     )
 
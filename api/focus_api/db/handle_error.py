@@ -12,7 +12,7 @@ from typing import Any, Union
 import sqlalchemy
 from sqlalchemy.engine.base import Engine
 
-from opr_api.utils.logging import get_logger
+from focus_api.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
@@ -0,0 +1,244 @@
+#
+# Per-request SQL instrumentation: query counts, database time, repeated statements and slow
+# queries.
+#
+# When enabled (DB_QUERY_STATS=true), before_cursor_execute and after_cursor_execute listeners on
+# every Engine time each statement. While a request is being handled (see start() and finish(),
+# called around each Flask request in focus_api.app), they also record
+#
+# - the number of statements executed and the total time spent executing them;
+# - how many times each statement was executed. Statements are compared as SQL with placeholders
+#   for the parameters, so a statement run once per item of a list (the N+1 pattern, typically a
+#   lazy-loaded relationship in a loop) shows up as one statement with a high count.
+#
+# These are added to the access_log_end line as db_query_count, db_time_ms and
+# db_repeated_statements. Statements executed DB_REPEATED_STATEMENT_THRESHOLD times or more in a
+# request are logged as "Repeated SQL statement".
+#
+# Statements taking DB_SLOW_QUERY_MS or longer are logged as "Slow SQL statement", whether or not
+# they were run for a request. With DB_SLOW_QUERY_EXPLAIN=true, a slow SELECT is run again under
+# EXPLAIN (ANALYZE, BUFFERS) and its plan logged with it. That doubles the cost of the slow
+# statement, so enable it to investigate, not permanently.
+#
+# Parameter values are never logged; only the statement text with its placeholders.
+#
+# When disabled, no listeners are installed, and start() and finish() only return None.
+#
+
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Self
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from focus_api.db.statement_timeout import strip_timeout
+from focus_api.utils import metrics
+from focus_api.utils.env import get_bool_env, get_float_env, get_int_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+SLOW_QUERIES = metrics.counter("db_slow_queries_total", "SQL statements slower than the threshold")
+REPEATED_STATEMENTS = metrics.counter(
+    "db_repeated_statements_total",
+    "Statements executed more than the threshold number of times in one request",
+)
+
+# Statements are truncated to this many characters in logs
+MAX_STATEMENT_LENGTH = 1000
+
+# Attribute of the execution context holding the statement's start time
+START_TIME = "query_start_time"
+
+
+@dataclass
+class QueryStatsConfig:
+    enabled: bool = False
+    # Statements taking at least this many milliseconds are logged as slow
+    slow_query_ms: float = 500
+    # Log the plan of slow SELECTs, from EXPLAIN (ANALYZE, BUFFERS)
+    explain_slow_queries: bool = False
+    # Statements executed at least this many times in a request are logged as repeated
+    repeated_statement_threshold: int = 5
+
+
+def get_config() -> QueryStatsConfig:
+    query_stats_config = QueryStatsConfig()
+
+    enabled_override = get_bool_env("DB_QUERY_STATS")
+    if enabled_override is not None:
+        query_stats_config.enabled = enabled_override
+
+    slow_query_ms_override = get_float_env("DB_SLOW_QUERY_MS")
+    if slow_query_ms_override is not None:
+        query_stats_config.slow_query_ms = slow_query_ms_override
+
+    explain_override = get_bool_env("DB_SLOW_QUERY_EXPLAIN")
+    if explain_override is not None:
+        query_stats_config.explain_slow_queries = explain_override
+
+    repeated_threshold_override = get_int_env("DB_REPEATED_STATEMENT_THRESHOLD")
+    if repeated_threshold_override is not None:
+        query_stats_config.repeated_statement_threshold = repeated_threshold_override
+
+    logger.info(
+        "Constructed query stats configuration",
+        extra={
+            "enabled": query_stats_config.enabled,
+            "slow_query_ms": query_stats_config.slow_query_ms,
+            "explain_slow_queries": query_stats_config.explain_slow_queries,
+            "repeated_statement_threshold": query_stats_config.repeated_statement_threshold,
+        },
+    )
+
+    return query_stats_config
+
+
+@dataclass
+class QueryStats:
+    """The statements executed while handling one request."""
+
+    query_count: int = 0
+    seconds: float = 0
+    statements: Counter[str] = field(default_factory=Counter)
+
+    def record(self: Self, statement: str, seconds: float) -> None:
+        self.query_count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self: Self, threshold: int) -> Dict[str, int]:
+        """The statements executed at least threshold times, with their counts."""
+        return {
+            statement: count for statement, count in self.statements.items() if count >= threshold
+        }
+
+
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+_config: Optional[QueryStatsConfig] = None
+
+
+def install(config: QueryStatsConfig) -> None:
+    """Install the listeners on all engines, if enabled. Safe to call more than once."""
+    global _config
+
+    _config = config
+    if not config.enabled or event.contains(Engine, "after_cursor_execute", after_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+    logger.info("Installed SQL query instrumentation")
+
+
+def uninstall() -> None:
+    if event.contains(Engine, "after_cursor_execute", after_cursor_execute):
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", after_cursor_execute)
+
+
+def start() -> Optional[QueryStats]:
+    """Start recording the statements of the current request."""
+    if _config is None or not _config.enabled:
+        return None
+    stats = QueryStats()
+    current_stats.set(stats)
+    return stats
+
+
+def finish() -> Optional[Dict[str, Any]]:
+    """Stop recording, and return the current request's stats as access log fields."""
+    stats = current_stats.get()
+    if stats is None or _config is None:
+        return None
+    current_stats.set(None)
+
+    repeated = stats.repeated(_config.repeated_statement_threshold)
+    for statement, count in repeated.items():
+        REPEATED_STATEMENTS.inc()
+        logger.warning(
+            "Repeated SQL statement",
+            extra={"statement": statement[:MAX_STATEMENT_LENGTH], "count": count},
+        )
+
+    return {
+        "db_query_count": stats.query_count,
+        "db_time_ms": round(1000 * stats.seconds, 3),
+        "db_repeated_statements": len(repeated),
+    }
+
+
+def before_cursor_execute(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    # On the statement's own context, so nothing is left behind when the statement raises.
+    setattr(context, START_TIME, time.perf_counter())
+
+
+def after_cursor_execute(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    start_time: Optional[float] = getattr(context, START_TIME, None)
+    if start_time is None:
+        return
+    seconds = time.perf_counter() - start_time
+    statement = strip_timeout(statement)
+
+    stats = current_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+
+    if _config is not None and 1000 * seconds >= _config.slow_query_ms:
+        log_slow_query(conn, statement, parameters, seconds, executemany)
+
+
+def log_slow_query(
+    conn: Connection, statement: str, parameters: Any, seconds: float, executemany: bool
+) -> None:
+    SLOW_QUERIES.inc()
+    extra: Dict[str, Any] = {
+        "statement": statement[:MAX_STATEMENT_LENGTH],
+        "duration_ms": round(1000 * seconds, 3),
+    }
+    if _config is not None and _config.explain_slow_queries and not executemany:
+        plan = explain(conn, statement, parameters)
+        if plan is not None:
+            extra["plan"] = plan
+    logger.warning("Slow SQL statement", extra=extra)
+
+
+def explain(conn: Connection, statement: str, parameters: Any) -> Optional[str]:
+    """The plan of a SELECT statement, from EXPLAIN (ANALYZE, BUFFERS), or None.
+
+    Only SELECTs are explained, as ANALYZE executes the statement, and only on AUTOCOMMIT
+    connections (as the API's engines are), where a failing EXPLAIN can't abort the request's
+    transaction. The statement is run on the DBAPI connection directly, so it isn't recorded.
+    """
+    if not statement.lstrip()[:6].upper() == "SELECT":
+        return None
+    if conn.get_execution_options().get("isolation_level") != "AUTOCOMMIT":
+        return None
+
+    try:
+        cursor = conn.connection.dbapi_connection.cursor()  # type: ignore[union-attr]
+        try:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    except Exception:
+        logger.info("Could not explain slow SQL statement", exc_info=True)
+        return None
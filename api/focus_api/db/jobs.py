@@ -0,0 +1,270 @@
+#
+# A durable job queue in Postgres, for work too slow to do inside a request.
+#
+# A request enqueues a job (a kind, a JSON payload and optionally one binary attachment, e.g. a
+# photo) in the same database it already uses, and returns; a job worker (focus_api.worker) runs
+# it. Jobs are rows of the jobs table, created by the deploy step (focus_api.db.schema):
+#
+#   pending --dequeue--> running --complete--> succeeded
+#      ^                    |
+#      +------retry---------+--fail (attempts used up, or a PermanentJobError)--> failed
+#
+# Workers claim jobs in batches with one statement:
+#
+#   UPDATE jobs SET status = 'running', ... WHERE id IN (
+#       SELECT id FROM jobs WHERE <pending and due> ORDER BY run_at LIMIT n FOR UPDATE SKIP LOCKED
+#   ) RETURNING ...
+#
+# SKIP LOCKED lets any number of workers dequeue at once without waiting on each other's rows or
+# claiming the same job twice, so throughput scales by adding workers. A job is retried with
+# exponential backoff (run_at moves into the future) until it has been attempted max_attempts
+# times. A job left running for stale_after seconds (its worker died) is claimed again, unless
+# that was its last attempt: the same statement then marks it failed instead. A job claimed again
+# is marked reclaimed, as its last attempt may have done some of its work (e.g. sent a payment);
+# handlers whose work isn't safe to repeat check it.
+#
+# Functions take a Connection or Session, so that a request can enqueue within its own session:
+# from an async controller, through AsyncSession.run_sync.
+#
+
+import datetime
+import json
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.orm import Session
+
+from focus_api.utils import metrics
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+DEFAULT_QUEUE = "default"
+DEFAULT_MAX_ATTEMPTS = 5
+
+JOBS_ENQUEUED = metrics.counter("jobs_enqueued_total", "Jobs enqueued, by kind")
+
+CREATE_TABLE = text("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id UUID PRIMARY KEY,
+        queue TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        payload JSONB NOT NULL,
+        data BYTEA,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        locked_at TIMESTAMPTZ,
+        locked_by TEXT,
+        last_error TEXT,
+        result JSONB,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """)
+
+# Separate statements, as asyncpg only prepares one at a time
+CREATE_INDEXES = (
+    text("CREATE INDEX IF NOT EXISTS jobs_due ON jobs (queue, run_at) WHERE status = 'pending'"),
+    text("CREATE INDEX IF NOT EXISTS jobs_running ON jobs (locked_at) WHERE status = 'running'"),
+)
+
+INSERT_JOB = text("""
+    INSERT INTO jobs (id, queue, kind, payload, data, status, max_attempts)
+    VALUES (:id, :queue, :kind, CAST(:payload AS JSONB), :data, 'pending', :max_attempts)
+    """)
+
+# Stale jobs which have used up their attempts are failed rather than claimed, and returned with
+# the claimed jobs (with status 'failed').
+DEQUEUE_JOBS = text("""
+    WITH due AS (
+        SELECT id, status = 'running' AS reclaimed,
+            status = 'running' AND attempts >= max_attempts AS exhausted
+        FROM jobs
+        WHERE queue = :queue
+        AND (
+            (status = 'pending' AND run_at <= now())
+            OR (status = 'running' AND locked_at < now() - make_interval(secs => :stale_after))
+        )
+        ORDER BY run_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE jobs
+    SET status = CASE WHEN due.exhausted THEN 'failed' ELSE 'running' END,
+        attempts = CASE WHEN due.exhausted THEN attempts ELSE attempts + 1 END,
+        locked_at = CASE WHEN due.exhausted THEN NULL ELSE now() END,
+        locked_by = CASE WHEN due.exhausted THEN NULL ELSE :worker END,
+        last_error = CASE WHEN due.exhausted THEN :stale_error ELSE last_error END,
+        data = CASE WHEN due.exhausted THEN NULL ELSE data END,
+        updated_at = now()
+    FROM due
+    WHERE jobs.id = due.id
+    RETURNING jobs.id, queue, kind, payload, data, status, attempts, max_attempts, result,
+        created_at, updated_at, due.reclaimed
+    """)
+
+STALE_ERROR = "Worker stopped during the last attempt"
+
+# The updates below only apply while the job is still locked by the worker finishing it, so a
+# worker which was too slow (and whose job was claimed again as stale) can't overwrite the result.
+COMPLETE_JOB = text("""
+    UPDATE jobs
+    SET status = 'succeeded', result = CAST(:result AS JSONB), data = NULL, locked_at = NULL,
+        locked_by = NULL, updated_at = now()
+    WHERE id = :id AND status = 'running' AND locked_by = :worker
+    """)
+
+RETRY_JOB = text("""
+    UPDATE jobs
+    SET status = 'pending', run_at = now() + make_interval(secs => :delay), last_error = :error,
+        locked_at = NULL, locked_by = NULL, updated_at = now()
+    WHERE id = :id AND status = 'running' AND locked_by = :worker
+    """)
+
+FAIL_JOB = text("""
+    UPDATE jobs
+    SET status = 'failed', last_error = :error, data = NULL, locked_at = NULL, locked_by = NULL,
+        updated_at = now()
+    WHERE id = :id AND status = 'running' AND locked_by = :worker
+    """)
+
+SELECT_JOB = text("""
+    SELECT id, queue, kind, payload, NULL AS data, status, attempts, max_attempts, result,
+        created_at, updated_at
+    FROM jobs WHERE id = :id
+    """)
+
+Executor = Union[Connection, Session]
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler for a failure retrying won't fix; the job fails straight away."""
+
+
+@dataclass
+class Job:
+    id: uuid.UUID
+    queue: str
+    kind: str
+    payload: Dict[str, Any]
+    data: Optional[bytes]
+    status: str
+    attempts: int
+    max_attempts: int
+    result: Optional[Dict[str, Any]]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    # Claimed again after its worker stopped during an attempt (only set by dequeue)
+    reclaimed: bool = False
+
+    @classmethod
+    def from_row(cls, row: Row[Any]) -> "Job":
+        return cls(
+            id=row.id,
+            queue=row.queue,
+            kind=row.kind,
+            payload=row.payload,
+            data=bytes(row.data) if row.data is not None else None,
+            status=row.status,
+            attempts=row.attempts,
+            max_attempts=row.max_attempts,
+            result=row.result,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+            reclaimed=getattr(row, "reclaimed", False),
+        )
+
+
+def create_schema(connection: Connection) -> None:
+    """Create the jobs table and its indexes (see focus_api.db.schema)."""
+    connection.execute(CREATE_TABLE)
+    for create_index in CREATE_INDEXES:
+        connection.execute(create_index)
+
+
+def enqueue(
+    executor: Executor,
+    kind: str,
+    payload: Dict[str, Any],
+    data: Optional[Union[bytes, memoryview]] = None,
+    queue: str = DEFAULT_QUEUE,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> uuid.UUID:
+    """Add a job, to run as soon as a worker is free; returns its id."""
+    job_id = uuid.uuid4()
+    executor.execute(
+        INSERT_JOB,
+        {
+            "id": job_id,
+            "queue": queue,
+            "kind": kind,
+            "payload": json.dumps(payload),
+            "data": data,
+            "max_attempts": max_attempts,
+        },
+    )
+    JOBS_ENQUEUED.inc(kind=kind)
+    logger.info("Enqueued job", extra={"job_id": str(job_id), "kind": kind, "queue": queue})
+    return job_id
+
+
+def dequeue(
+    executor: Executor,
+    worker: str,
+    limit: int,
+    queue: str = DEFAULT_QUEUE,
+    stale_after: float = 300,
+) -> List[Job]:
+    """Claim up to limit due jobs for worker, marking them running.
+
+    Stale jobs on their last attempt are marked failed instead, so fewer may be claimed.
+    """
+    rows = executor.execute(
+        DEQUEUE_JOBS,
+        {
+            "worker": worker,
+            "queue": queue,
+            "limit": limit,
+            "stale_after": stale_after,
+            "stale_error": STALE_ERROR,
+        },
+    )
+    claimed = []
+    for job in map(Job.from_row, rows):
+        if job.status == RUNNING:
+            claimed.append(job)
+        else:
+            logger.warning(
+                "Failed stale job with no attempts left",
+                extra={"job_id": str(job.id), "kind": job.kind, "attempts": job.attempts},
+            )
+    return claimed
+
+
+def complete(executor: Executor, job: Job, worker: str, result: Dict[str, Any]) -> None:
+    executor.execute(COMPLETE_JOB, {"id": job.id, "worker": worker, "result": json.dumps(result)})
+
+
+def retry(executor: Executor, job: Job, worker: str, error: str, delay: float) -> None:
+    """Make a failed job pending again, to run after delay seconds."""
+    executor.execute(RETRY_JOB, {"id": job.id, "worker": worker, "error": error, "delay": delay})
+
+
+def fail(executor: Executor, job: Job, worker: str, error: str) -> None:
+    executor.execute(FAIL_JOB, {"id": job.id, "worker": worker, "error": error})
+
+
+def get_job(executor: Executor, job_id: uuid.UUID) -> Optional[Job]:
+    """The job with this id (without its data), or None."""
+    row = executor.execute(SELECT_JOB, {"id": job_id}).first()
+    return Job.from_row(row) if row is not None else None
@@ -0,0 +1,262 @@
+#
+# Keyset (cursor) pagination of model queries, with cheap total counts.
+#
+# Offset pagination reads and discards every row before the page, so page 1000 costs a thousand
+# pages, and an exact total means a COUNT(*) over the whole result on every page. Instead,
+# paginate() continues from the last row of the previous page:
+#
+#   SELECT ... WHERE (created_at, id) < (:last_created_at, :last_id)
+#   ORDER BY created_at DESC, id DESC LIMIT :page_size + 1
+#
+# With an index on the order_by columns, every page costs about the same as the first. The
+# model's primary key is appended to order_by so that the order is total and no row is skipped or
+# repeated when order_by values tie.
+#
+# Rows whose order_by value is NULL come last in either direction (NULLS LAST), and are paged by
+# an explicit IS NULL branch, since a comparison with NULL is never true. An index serving a
+# descending nullable column needs to be declared DESC NULLS LAST to match.
+#
+# The position is passed between pages as an opaque cursor (base64 encoded JSON of the last row's
+# order_by values), which clients send back unchanged to get the next page.
+#
+# Totals are optional, as they are often the most expensive part of a page:
+#
+# - COUNT_NONE: no total
+# - COUNT_ESTIMATE: the planner's estimate, from pg_class.reltuples for a whole table and from
+#   EXPLAIN otherwise; cheap, and usually close enough for "about 12,000 results"
+# - COUNT_EXACT: COUNT(*), for when it is needed
+#
+
+import base64
+import binascii
+import dataclasses
+import json
+import math
+from typing import Any, List, Optional, Sequence, Union, cast
+
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import to_json
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    Table,
+    and_,
+    false,
+    func,
+    inspect,
+    or_,
+    select,
+    text,
+    tuple_,
+)
+from sqlalchemy.orm import InstrumentedAttribute, Session
+from sqlalchemy.sql.elements import UnaryExpression
+from sqlalchemy.sql.operators import desc_op
+
+from focus_api.models.base import Base
+
+COUNT_NONE = "none"
+COUNT_ESTIMATE = "estimate"
+COUNT_EXACT = "exact"
+COUNT_MODES = (COUNT_NONE, COUNT_ESTIMATE, COUNT_EXACT)
+
+# A column to order by, e.g. Application.created_at or Application.created_at.desc()
+OrderBy = Union[InstrumentedAttribute[Any], UnaryExpression[Any]]
+
+
+class InvalidCursorError(ValueError):
+    """The cursor is malformed, or was issued for a different order."""
+
+
+@dataclasses.dataclass
+class Page:
+    items: List[Any]
+    page_size: int
+    order_by: str
+    order_direction: str
+    # The cursor this page was fetched with, and the one for the page after it (None if this is
+    # the last page)
+    cursor: Optional[str]
+    next_cursor: Optional[str]
+    total_records: Optional[int] = None
+    total_is_estimate: bool = False
+
+    @property
+    def total_pages(self: "Page") -> Optional[int]:
+        if self.total_records is None:
+            return None
+        return math.ceil(self.total_records / self.page_size)
+
+
+@dataclasses.dataclass
+class SortKey:
+    # A mapped attribute, or the column of one
+    attribute: Any
+    descending: bool
+    nullable: bool = False
+
+    @property
+    def name(self: "SortKey") -> str:
+        return self.attribute.key
+
+    def after(self: "SortKey", value: Any) -> ColumnElement[bool]:
+        if value is None:
+            # NULLs come last, so nothing is after one but another NULL, which isn't after it
+            return false()
+        after = self.attribute < value if self.descending else self.attribute > value
+        return or_(after, self.attribute.is_(None)) if self.nullable else after
+
+    def equals(self: "SortKey", value: Any) -> ColumnElement[bool]:
+        return self.attribute.is_(None) if value is None else self.attribute == value
+
+    def order(self: "SortKey") -> UnaryExpression[Any]:
+        order = self.attribute.desc() if self.descending else self.attribute.asc()
+        return order.nulls_last() if self.nullable else order
+
+
+def get_sort_keys(model: type[Base], order_by: Sequence[OrderBy]) -> List[SortKey]:
+    """The sort keys for order_by, with the model's primary key appended as a tie breaker."""
+    keys = []
+    for column in order_by:
+        attribute: Any
+        if isinstance(column, UnaryExpression):
+            attribute, descending = column.element, column.modifier is desc_op
+        else:
+            attribute, descending = column, False
+        nullable = bool(getattr(getattr(attribute, "expression", attribute), "nullable", False))
+        keys.append(SortKey(attribute, descending, nullable))
+
+    names = {key.name for key in keys}
+    descending = keys[-1].descending if keys else False
+    for primary_key in inspect(model).primary_key:
+        if primary_key.key not in names:
+            keys.append(SortKey(getattr(model, str(primary_key.key)), descending))
+    return keys
+
+
+def encode_cursor(keys: Sequence[SortKey], item: Base) -> str:
+    payload = {
+        "o": [f"{'-' if key.descending else ''}{key.name}" for key in keys],
+        "v": [getattr(item, key.name) for key in keys],
+    }
+    return base64.urlsafe_b64encode(to_json(payload)).decode().rstrip("=")
+
+
+def decode_cursor(keys: Sequence[SortKey], cursor: str) -> List[Any]:
+    """The order_by values encoded in cursor, as the columns' Python types."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        order, values = payload["o"], payload["v"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+    if order != [f"{'-' if key.descending else ''}{key.name}" for key in keys] or len(
+        values
+    ) != len(keys):
+        raise InvalidCursorError("Cursor is for a different order")
+
+    try:
+        return [parse_value(key, value) for key, value in zip(keys, values)]
+    except ValidationError as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+
+def parse_value(key: SortKey, value: Any) -> Any:
+    try:
+        python_type = key.attribute.type.python_type
+    except NotImplementedError:
+        return value
+    return TypeAdapter(python_type).validate_python(value) if value is not None else None
+
+
+def keyset_filter(keys: Sequence[SortKey], values: Sequence[Any]) -> ColumnElement[bool]:
+    """Rows after values, in the order of keys."""
+    if not any(key.nullable for key in keys) and all(
+        key.descending == keys[0].descending for key in keys
+    ):
+        # A row value comparison, which Postgres can answer with a single index range scan
+        row = tuple_(*(key.attribute for key in keys))
+        after = tuple_(*values)
+        return row < after if keys[0].descending else row > after
+
+    # Mixed directions or nullable columns: (a after va) OR (a = va AND b after vb) OR ...
+    return or_(
+        *(
+            and_(
+                *(key.equals(value) for key, value in zip(keys[:index], values[:index])),
+                keys[index].after(values[index]),
+            )
+            for index in range(len(keys))
+        )
+    )
+
+
+def count_exact(session: Session, query: Select[Any]) -> int:
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+    return int(session.execute(count_query).scalar_one())
+
+
+def count_estimate(session: Session, model: type[Base], query: Select[Any]) -> int:
+    """The planner's estimate of the number of rows query returns."""
+    if query.whereclause is None:
+        table = cast(Table, inspect(model).local_table)
+        reltuples = session.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": table.fullname},
+        ).scalar()
+        # reltuples is -1 for a table that hasn't been vacuumed or analyzed yet.
+        if reltuples is not None and reltuples >= 0:
+            return int(reltuples)
+
+    connection = session.connection()
+    compiled = query.order_by(None).compile(connection)
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar_one()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def paginate(
+    session: Session,
+    query: Select[Any],
+    order_by: Sequence[OrderBy],
+    page_size: int = 25,
+    cursor: Optional[str] = None,
+    count: str = COUNT_NONE,
+) -> Page:
+    """Fetch the page of query's results after cursor (or the first page, without one).
+
+    query selects one model class, e.g. select(Application).where(...), and shouldn't have an
+    ORDER BY or LIMIT of its own. Raises InvalidCursorError for a cursor this query didn't issue.
+    """
+    if count not in COUNT_MODES:
+        raise ValueError(f"count must be one of {', '.join(COUNT_MODES)}")
+
+    model = query.column_descriptions[0]["entity"]
+    keys = get_sort_keys(model, order_by)
+
+    page_query = query
+    if cursor is not None:
+        page_query = page_query.where(keyset_filter(keys, decode_cursor(keys, cursor)))
+    page_query = page_query.order_by(*(key.order() for key in keys)).limit(page_size + 1)
+
+    items = list(session.scalars(page_query))
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(keys, items[-1])
+
+    page = Page(
+        items=items,
+        page_size=page_size,
+        order_by=",".join(key.name for key in keys[: len(order_by) or len(keys)]),
+        order_direction="desc" if keys[0].descending else "asc",
+        cursor=cursor,
+        next_cursor=next_cursor,
+    )
+    if count == COUNT_EXACT:
+        page.total_records = count_exact(session, query)
+    elif count == COUNT_ESTIMATE:
+        page.total_records = count_estimate(session, model, query)
+        page.total_is_estimate = True
+    return page
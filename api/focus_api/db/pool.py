@@ -0,0 +1,158 @@
+#
+# Connection pool instrumentation and fork safety.
+#
+# Every engine created by focus_api.db.create_engine (or focus_api.db.aio.create_async_engine) uses
+# a MeteredQueuePool, which records how long callers wait for a connection and how often the pool
+# has to overflow or time out. Pool events count connections being opened and closed (churn).
+# Together these are the numbers needed to size gunicorn workers against the Postgres
+# max_connections limit.
+#
+# Pooled connections must never be shared between processes. Engines are registered here so that
+# a forked child (e.g. a gunicorn worker forked from a preloaded master) drops the connections it
+# inherited, without closing them out from under the parent.
+#
+
+import os
+import time
+import weakref
+from typing import Any, Dict, Optional, Self
+
+import sqlalchemy
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, QueuePool
+
+from focus_api.utils import metrics
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+POOL_CHECKOUTS = metrics.counter("db_pool_checkouts_total", "Connections checked out of the pool")
+POOL_CHECKOUT_WAIT = metrics.counter(
+    "db_pool_checkout_wait_seconds_total", "Time spent waiting to check out a connection"
+)
+POOL_CHECKOUT_TIMEOUTS = metrics.counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up after pool_timeout"
+)
+POOL_OVERFLOW_CHECKOUTS = metrics.counter(
+    "db_pool_overflow_checkouts_total", "Checkouts served beyond pool_size (pool saturated)"
+)
+POOL_CONNECTIONS_OPENED = metrics.counter(
+    "db_pool_connections_opened_total", "New database connections opened by the pool"
+)
+POOL_CONNECTIONS_CLOSED = metrics.counter(
+    "db_pool_connections_closed_total", "Database connections closed by the pool"
+)
+POOL_CONNECTIONS_INVALIDATED = metrics.counter(
+    "db_pool_connections_invalidated_total", "Database connections invalidated (e.g. failed ping)"
+)
+
+_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def pool_name(pool: sqlalchemy.Pool) -> str:
+    return pool.logging_name or "default"
+
+
+class MeteredQueuePool(QueuePool):
+    """A QueuePool which records checkout wait time, timeouts and overflow."""
+
+    def _do_get(self: Self) -> Any:
+        name = pool_name(self)
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sqlalchemy.exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(pool=name)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.inc(time.perf_counter() - start, pool=name)
+
+        POOL_CHECKOUTS.inc(pool=name)
+        if self.overflow() > 0:
+            POOL_OVERFLOW_CHECKOUTS.inc(pool=name)
+        return connection
+
+
+class MeteredAsyncAdaptedQueuePool(MeteredQueuePool, AsyncAdaptedQueuePool):
+    """The asyncio equivalent of MeteredQueuePool, used by focus_api.db.aio engines."""
+
+
+def register_engine(engine: Engine) -> None:
+    """Track an engine for pool stats and fork safety, and attach connection churn counters."""
+    name = pool_name(engine.pool)
+
+    @sqlalchemy.event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection: Any, connection_record: ConnectionPoolEntry) -> None:
+        POOL_CONNECTIONS_OPENED.inc(pool=name)
+
+    @sqlalchemy.event.listens_for(engine, "close")
+    def on_close(dbapi_connection: Any, connection_record: ConnectionPoolEntry) -> None:
+        POOL_CONNECTIONS_CLOSED.inc(pool=name)
+
+    @sqlalchemy.event.listens_for(engine, "invalidate")
+    def on_invalidate(
+        dbapi_connection: Any, connection_record: ConnectionPoolEntry, exception: Any
+    ) -> None:
+        POOL_CONNECTIONS_INVALIDATED.inc(pool=name)
+
+    _engines.add(engine)
+
+
+def get_engine(name: str) -> Optional[Engine]:
+    """The registered engine whose pool has this name, e.g. "primary"."""
+    for engine in list(_engines):
+        if pool_name(engine.pool) == name:
+            return engine
+    return None
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Current occupancy of each registered pool, keyed by pool name."""
+    stats = {}
+    for engine in list(_engines):
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        stats[pool_name(pool)] = {
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": checked_out,
+            "overflow": max(pool.overflow(), 0),
+            "saturation": checked_out / capacity if capacity else 0.0,
+        }
+    return stats
+
+
+def _pool_gauge(field: str) -> Any:
+    return lambda: {
+        metrics.label_key({"pool": name}): float(stats[field])
+        for name, stats in get_pool_stats().items()
+    }
+
+
+metrics.gauge(
+    "db_pool_checked_out", "Connections currently checked out", _pool_gauge("checked_out")
+)
+metrics.gauge("db_pool_checked_in", "Idle connections held by the pool", _pool_gauge("checked_in"))
+metrics.gauge("db_pool_overflow", "Connections open beyond pool_size", _pool_gauge("overflow"))
+metrics.gauge(
+    "db_pool_saturation",
+    "Checked out connections as a fraction of pool_size + max_overflow",
+    _pool_gauge("saturation"),
+)
+
+
+def dispose_engines_after_fork() -> None:
+    """Drop pooled connections inherited from the parent process.
+
+    close=False leaves the parent's sockets open; the child simply forgets them and opens its own.
+    """
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
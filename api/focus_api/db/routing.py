@@ -0,0 +1,146 @@
+#
+# Read replica routing.
+#
+# RoutingSession sends SELECTs issued by read-only operations to a read replica, and everything
+# else (writes, flushes, session_scope transactions) to the primary. An operation is read-only when
+# its OpenAPI operation has `x-read-only: true`, or when its controller is wrapped with
+# focus_api.app.read_only; either way the flag is stored in Session.info for the current request.
+#
+# Only tag operations which read the database and can tolerate a replica's lag. None does yet: the
+# only one which reads, GET /v1/jobs/{jobId}, must see a job just after it was queued.
+#
+# Replicas which fall too far behind the primary are skipped. If no replica is usable, reads fall
+# back to the primary.
+#
+
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Self, Tuple
+
+from sqlalchemy import Select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from focus_api.utils import metrics
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Session.info keys
+READ_ONLY = "read_only"
+USE_PRIMARY = "use_primary"
+
+ROUTED_STATEMENTS = metrics.counter(
+    "db_routed_statements_total", "Statements routed to the primary or a replica"
+)
+REPLICA_FALLBACKS = metrics.counter(
+    "db_replica_fallbacks_total",
+    "Read-only statements sent to the primary as no replica was usable",
+)
+
+# Seconds the replica is behind the primary. A replica which has replayed everything it received
+# is not lagging, even if the primary has been idle since the last replayed transaction.
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaSet:
+    """A group of replica engines, with lag tracking and round robin or least busy selection."""
+
+    def __init__(
+        self: Self,
+        engines: List[Engine],
+        selection: str = "round_robin",
+        max_lag: float = 5,
+        lag_check_interval: float = 10,
+    ) -> None:
+        self.engines = engines
+        self.selection = selection
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._next = itertools.count()
+        # engine index => (monotonic time checked, lag in seconds)
+        self._lag: Dict[int, Tuple[float, float]] = {}
+        self._lag_lock = threading.Lock()
+
+    def select(self: Self) -> Optional[Engine]:
+        """Pick a replica whose lag is within bounds, or None if there isn't one."""
+        if not self.engines:
+            return None
+
+        if self.selection == "least_busy":
+            candidates = sorted(
+                range(len(self.engines)),
+                key=lambda i: self.engines[i].pool.checkedout(),  # type: ignore[attr-defined]
+            )
+        else:
+            start = next(self._next) % len(self.engines)
+            candidates = [(start + i) % len(self.engines) for i in range(len(self.engines))]
+
+        for index in candidates:
+            if self.lag(index) <= self.max_lag:
+                return self.engines[index]
+        return None
+
+    def lag(self: Self, index: int) -> float:
+        """Replication lag of a replica in seconds, re-measured at most every lag_check_interval."""
+        now = time.monotonic()
+        # A replica never measured counts as too far behind, like one that can't be measured.
+        checked_at, lag = self._lag.get(index, (None, float("inf")))
+        if checked_at is not None and now - checked_at < self.lag_check_interval:
+            return lag
+
+        # Only one thread measures; others use the previous value in the meantime.
+        if not self._lag_lock.acquire(blocking=False):
+            return lag
+        try:
+            lag = self.measure_lag(self.engines[index])
+            self._lag[index] = (now, lag)
+        finally:
+            self._lag_lock.release()
+        if lag > self.max_lag:
+            logger.warning("replica lag exceeds limit", extra={"replica": index, "lag": lag})
+        return lag
+
+    @staticmethod
+    def measure_lag(engine: Engine) -> float:
+        try:
+            with engine.connect() as conn:
+                return float(conn.execute(REPLICA_LAG_SQL).scalar_one())
+        except Exception:
+            logger.exception("unable to measure replica lag")
+            return float("inf")
+
+
+class RoutingSession(Session):
+    """A Session which routes read-only queries to a replica."""
+
+    def __init__(self: Self, *args: Any, replicas: ReplicaSet, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(
+        self: Self,
+        mapper: Any = None,
+        clause: Any = None,
+        **kwargs: Any,
+    ) -> Engine | Connection:
+        if self._flushing:
+            # Once this session has written, keep reading from the primary so it sees its writes.
+            self.info[USE_PRIMARY] = True
+        elif (
+            self.info.get(READ_ONLY)
+            and not self.info.get(USE_PRIMARY)
+            and isinstance(clause, Select)
+        ):
+            replica = self.replicas.select()
+            if replica is not None:
+                ROUTED_STATEMENTS.inc(target="replica")
+                return replica
+            REPLICA_FALLBACKS.inc()
+
+        ROUTED_STATEMENTS.inc(target="primary")
+        return super().get_bind(mapper, clause=clause, **kwargs)
@@ -0,0 +1,51 @@
+#
+# Creates the tables used outside of the models: the shared result cache (focus_api.db.cache) and
+# the job queue (focus_api.db.jobs).
+#
+# Run it once per deploy, before the API and job workers start, as a role allowed to create
+# tables:
+#
+#   python -m focus_api.db.schema
+#
+# The API and workers never create tables, so their role needs no DDL rights, and no request waits
+# on (or fails at) a CREATE TABLE. The statements are idempotent, and run in one transaction under an
+# advisory lock, so that concurrent runs don't race each other on the system catalogs.
+#
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from focus_api.db import cache, create_engine, jobs
+from focus_api.db.config import get_config
+from focus_api.utils import logging
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Arbitrary, but fixed: the advisory lock held while creating tables
+SCHEMA_LOCK_ID = 4_717_265
+
+LOCK_SCHEMA = text("SELECT pg_advisory_xact_lock(:lock_id)")
+
+
+def create_schema(engine: Engine) -> None:
+    """Create the tables which don't exist yet."""
+    with engine.connect().execution_options(isolation_level="READ COMMITTED") as connection:
+        with connection.begin():
+            connection.execute(LOCK_SCHEMA, {"lock_id": SCHEMA_LOCK_ID})
+            cache.create_schema(connection)
+            jobs.create_schema(connection)
+    logger.info("Created schema")
+
+
+def main() -> None:
+    logging.init("focus_api.db.schema")
+    engine = create_engine(get_config(), name="schema")
+    try:
+        create_schema(engine)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
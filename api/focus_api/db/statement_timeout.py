@@ -0,0 +1,56 @@
+#
+# Cut SQL statements off at the request's deadline.
+#
+# DbConfig.statement_timeout applies to every connection, and is long (an hour by default), as
+# migrations and bulk loads share it. For a request with a deadline (see focus_api.utils.deadline),
+# each statement is instead limited to the time remaining, by prefixing it with
+#
+#   SET LOCAL statement_timeout = <ms remaining>;
+#
+# Both are sent in one query, which Postgres runs as one transaction (or within the current one),
+# so the setting costs no extra round trip and ends with the transaction rather than staying on
+# the pooled connection. A statement cancelled at the deadline raises
+# sqlalchemy.exc.OperationalError, as any statement timeout does.
+#
+# Only psycopg2 connections are prefixed: asyncpg sends parameterized statements with the extended
+# protocol, which doesn't allow several statements in one query. Server-side cursors and
+# executemany() calls aren't prefixed either.
+#
+
+import re
+from typing import Any, Tuple
+
+import sqlalchemy
+from sqlalchemy.engine import Connection, Engine
+
+from focus_api.utils import deadline
+
+PREFIX = re.compile(r"^SET LOCAL statement_timeout = \d+; ")
+
+
+def strip_timeout(statement: str) -> str:
+    """The statement without a statement_timeout prefix added here."""
+    return PREFIX.sub("", statement, count=1)
+
+
+@sqlalchemy.event.listens_for(Engine, "before_cursor_execute", retval=True)
+def set_statement_timeout(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> Tuple[str, Any]:
+    remaining = deadline.remaining()
+    if (
+        remaining is None
+        or executemany
+        or conn.dialect.driver != "psycopg2"
+        or getattr(context, "_is_server_side", False)
+    ):
+        return statement, parameters
+
+    # A timeout of 0 disables it, so a passed deadline gets the shortest timeout instead.
+    timeout_ms = max(1, int(1000 * remaining))
+    return f"SET LOCAL statement_timeout = {timeout_ms}; {statement}", parameters
@@ -0,0 +1,153 @@
+#
+# Warm-up of a new process before it takes requests.
+#
+# The first requests handled by a new worker are slower than the rest: SQLAlchemy configures the
+# mappers on first use, compiles each statement the first time it's executed (later executions hit
+# the engine's compiled cache), and the pool opens a connection for each concurrent request. With
+# DB_WARMUP=true, create_app() does this work up front instead:
+#
+# - configures the mappers of every model on focus_api.models.base.Base;
+# - compiles the statements registered with register_hot_statement() into the engine's compiled
+#   cache, exactly as executing them would, but without executing them;
+# - opens DB_WARMUP_CONNECTIONS pooled connections (by default the pool's size), so that many
+#   concurrent requests are served without a connect.
+#
+# With gunicorn's preload_app, the mappers and compiled cache are inherited by the workers, but
+# pooled connections are not (see focus_api.db.pool), so workers should call open_connections()
+# after fork.
+#
+# The number of statements compiled and already cached are logged with the compiled cache's size.
+#
+# Compiling without executing relies on SQLAlchemy internals (ClauseElement._compile_w_cache and the
+# engine's _compiled_cache), which may change in any release. If they fail, the failure is logged,
+# the statements are left to be compiled when first executed, and the rest of the warm-up goes on.
+#
+
+import threading
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.sql import compiler
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement
+
+from focus_api.utils.env import get_bool_env, get_int_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class WarmupConfig:
+    enabled: bool = False
+    # Pooled connections to open; None for the pool's size
+    connections: Optional[int] = None
+
+
+def get_config() -> WarmupConfig:
+    warmup_config = WarmupConfig()
+
+    enabled_override = get_bool_env("DB_WARMUP")
+    if enabled_override is not None:
+        warmup_config.enabled = enabled_override
+
+    connections_override = get_int_env("DB_WARMUP_CONNECTIONS")
+    if connections_override is not None:
+        warmup_config.connections = connections_override
+
+    logger.info(
+        "Constructed warm-up configuration",
+        extra={"enabled": warmup_config.enabled, "connections": warmup_config.connections},
+    )
+
+    return warmup_config
+
+
+# (statement, names of the parameters it's executed with)
+_hot_statements: List[Tuple[Executable, Tuple[str, ...]]] = []
+_hot_statements_lock = threading.Lock()
+
+
+def register_hot_statement(statement: Executable, parameters: Sequence[str] = ()) -> Executable:
+    """Register a statement to compile during warm-up, and return it.
+
+    parameters are the names of the parameters passed when executing it, as they're part of the
+    compiled cache's key, e.g. ("cache", "key") for conn.execute(SELECT_ENTRY, {"cache": ...,
+    "key": ...}).
+    """
+    with _hot_statements_lock:
+        _hot_statements.append((statement, tuple(sorted(parameters))))
+    return statement
+
+
+def get_hot_statements() -> List[Tuple[Executable, Tuple[str, ...]]]:
+    with _hot_statements_lock:
+        return list(_hot_statements)
+
+
+def compile_statement(conn: Connection, statement: ClauseElement, parameters: Sequence[str]) -> Any:
+    """Compile a statement into the engine's compiled cache, as Connection.execute() would.
+
+    Returns the CacheStats of the lookup: CACHE_MISS when it was compiled, CACHE_HIT when it was
+    already cached.
+    """
+    _compiled, _extracted, _params, cache_stats = statement._compile_w_cache(
+        dialect=conn.dialect,
+        compiled_cache=conn.get_execution_options().get(
+            "compiled_cache", conn.engine._compiled_cache
+        ),
+        column_keys=list(parameters),
+        for_executemany=False,
+        schema_translate_map=None,
+        linting=conn.dialect.compiler_linting | compiler.WARN_LINTING,
+    )
+    return cache_stats
+
+
+def open_connections(engine: Engine, count: Optional[int] = None) -> int:
+    """Open up to count connections (by default the pool's size) and return them to the pool.
+
+    They're checked out all at once, so that each is a separate connection.
+    """
+    pool_size: int = engine.pool.size()  # type: ignore[attr-defined]
+    count = pool_size if count is None else min(count, pool_size)
+    with ExitStack() as stack:
+        for _ in range(count):
+            stack.enter_context(engine.connect())
+    return count
+
+
+def warm_up(engine: Engine, config: WarmupConfig) -> Dict[str, Any]:
+    """Configure mappers, compile hot statements and fill the pool; returns what was done."""
+    start = time.perf_counter()
+    configure_mappers()
+
+    results = {CacheStats.CACHE_MISS: 0, CacheStats.CACHE_HIT: 0}
+    with engine.connect() as conn:
+        try:
+            for statement, parameters in get_hot_statements():
+                if not isinstance(statement, ClauseElement):
+                    continue
+                cache_stats = compile_statement(conn, statement, parameters)
+                results[cache_stats] = results.get(cache_stats, 0) + 1
+        except Exception:
+            logger.warning("Unable to compile hot statements", exc_info=True)
+
+    connections = open_connections(engine, config.connections)
+
+    compiled_cache = getattr(engine, "_compiled_cache", None)
+    summary = {
+        "statements_compiled": results[CacheStats.CACHE_MISS],
+        "statements_cached": results[CacheStats.CACHE_HIT],
+        "compiled_cache_size": len(compiled_cache) if compiled_cache is not None else 0,
+        "compiled_cache_capacity": getattr(compiled_cache, "capacity", None),
+        "connections_opened": connections,
+        "duration_ms": round(1000 * (time.perf_counter() - start), 1),
+    }
+    logger.info("Warmed up database", extra=summary)
+    return summary
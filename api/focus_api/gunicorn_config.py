@@ -0,0 +1,113 @@
+#
+# gunicorn configuration for the API:
+#
+#   gunicorn -c python:focus_api.gunicorn_config focus_api.__main__:app
+#
+# Workers, threads and recycling are sized by focus_api.utils.workers, from the usable CPUs and
+# the Postgres connection budget (DB_MAX_CONNECTIONS).
+#
+# The app is preloaded: the master imports focus_api and creates the app lazily (the parsed spec
+# and connexion's middleware stack with every controller imported) before forking the workers,
+# which then share that memory copy-on-write rather than each building their own. The master
+# holds no database connections and runs no background threads: its pool is emptied after any
+# warm-up, and the health prober and metrics writer are started by post_fork in each worker. The
+# process state that doesn't survive fork is reset in each worker by os.register_at_fork hooks,
+# wherever that state is kept:
+#
+# - pooled database connections are dropped (focus_api.db.pool), so no socket is shared with the
+#   master or another worker;
+# - queued log handlers get a new writer thread (focus_api.utils.logging.batching);
+# - the metrics are reset and their writer restarted (focus_api.utils.metrics and .prometheus);
+# - the health prober is restarted (focus_api.utils.health).
+#
+# post_fork then starts the worker's metrics writer and (unless APP_LAZY_STARTUP is set) its
+# health prober, refills its pool when DB_WARMUP is set, and starts its RssMonitor.
+#
+# BIND (default 0.0.0.0:8000) and GUNICORN_PRELOAD=false override the defaults here; gunicorn's
+# own command line options override everything.
+#
+
+import functools
+import os
+import signal
+import time
+from typing import Any
+
+from focus_api.db import warmup
+from focus_api.db.config import get_config as get_db_config
+from focus_api.db.pool import get_engine
+from focus_api.utils import health, logging, prometheus
+from focus_api.utils.env import get_bool_env
+from focus_api.utils.logging import get_logger
+from focus_api.utils.workers import RssMonitor
+from focus_api.utils.workers import get_config as get_worker_config
+
+logger = get_logger(__name__)
+
+worker_config = get_worker_config(get_db_config())
+
+# The Flask thread pool of each worker is sized by APP_THREADS, read by create_app().
+os.environ.setdefault("APP_THREADS", str(worker_config.threads))
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = worker_config.workers
+threads = worker_config.threads
+preload_app = get_bool_env("GUNICORN_PRELOAD") is not False
+max_requests = worker_config.max_requests
+max_requests_jitter = worker_config.max_requests_jitter
+# Logs go to stdout as JSON lines, from focus_api.utils.logging; gunicorn's access log would
+# duplicate the API's own.
+accesslog = None
+
+
+def on_starting(server: Any) -> None:
+    logging.init("focus_api")
+    # Metrics files of the previous server's workers (see focus_api.utils.prometheus).
+    prometheus.clear_metrics_dir()
+
+
+def when_ready(server: Any) -> None:
+    """Create the app in the master before the workers are forked, when preloading."""
+    if not server.cfg.preload_app:
+        return
+
+    from focus_api.__main__ import app as lazy_app
+    from focus_api.app import build_middleware_stack, create_app
+
+    start = time.perf_counter()
+    # Lazily, so that the master doesn't connect to the database or start background threads,
+    # which it would keep for as long as it runs.
+    lazy_app.factory = functools.partial(create_app, lazy=True)
+    build_middleware_stack(lazy_app.get())
+    engine = get_engine("primary")
+    if engine is not None:
+        # Close any connections the warm-up opened; each worker opens its own.
+        engine.dispose()
+    logger.info(
+        "Preloaded app",
+        extra={"duration_ms": round(1000 * (time.perf_counter() - start), 1)},
+    )
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    from focus_api.app import get_lazy_startup
+
+    prometheus.start_writer()
+    if not get_lazy_startup():
+        # As create_app() does, had the app not been preloaded
+        health.get_prober()
+
+    warmup_config = warmup.get_config()
+    engine = get_engine("primary")
+    if warmup_config.enabled and engine is not None:
+        # The master's connections were dropped at fork; open the worker's own.
+        warmup.open_connections(engine, warmup_config.connections)
+
+    if worker_config.max_rss_mb is not None:
+
+        def restart(rss_bytes: int) -> None:
+            # A graceful shutdown; the master then starts a new worker.
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        RssMonitor(worker_config.max_rss_mb, worker_config.rss_check_interval, restart).start()
@@ -0,0 +1,3 @@
+from .async_controllers import AsyncControllerMiddleware  # noqa: F401
+from .request_metrics import RequestMetricsMiddleware  # noqa: F401
+from .response_validation import SampledResponseValidationMiddleware  # noqa: F401
@@ -0,0 +1,142 @@
+#
+# Run `async def` controllers natively on the event loop.
+#
+# connexion's FlaskApp runs every controller inside Flask on a worker thread; a coroutine
+# controller there is driven by async_to_sync, which still holds the thread for the whole request.
+# This middleware sits just before connexion's ContextMiddleware. For operations whose controller
+# is a coroutine function it calls the controller directly, the same way connexion's AsyncApp does,
+# and never enters Flask. All other operations pass through to Flask unchanged, so sync and async
+# controllers can coexist while routes are migrated.
+#
+# Async controllers get their database session from focus_api.app.async_db_session rather than
+# Flask's `g`, which doesn't exist outside Flask. Their deadline (see focus_api.utils.deadline) is
+# set here too, and applies to their calls to external services; asyncpg statements aren't limited
+# to it.
+#
+
+import asyncio
+import time
+from typing import Any, Callable, Optional, Self
+
+from connexion.apps.asynchronous import AsyncOperation  # type: ignore
+from connexion.context import _context, _operation, _receive, _scope  # type: ignore
+from connexion.jsonifier import Jsonifier  # type: ignore
+from connexion.middleware.abstract import RoutedAPI, RoutedMiddleware  # type: ignore
+from connexion.operations import AbstractOperation  # type: ignore
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from focus_api.db.aio import current_session
+from focus_api.utils import deadline
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncControllerOperation:
+    def __init__(
+        self: Self,
+        next_app: ASGIApp,
+        *,
+        operation: AbstractOperation,
+        async_operation: AsyncOperation,
+        session_factory: Callable[[], AsyncSession],
+    ) -> None:
+        self.next_app = next_app
+        self.operation = operation
+        self.async_operation = async_operation
+        self.session_factory = session_factory
+
+    async def __call__(self: Self, scope: Scope, receive: Receive, send: Send) -> None:
+        # ContextMiddleware comes after this middleware, so expose the connexion context here.
+        _context.set(scope.get("extensions", {}).get("connexion_context", {}))
+        _operation.set(self.operation)
+        _receive.set(receive)
+        _scope.set(scope)
+
+        start_time = time.monotonic()
+        response_start: dict[str, Any] = {"status": 500, "headers": []}
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+            await send(message)
+
+        session = self.session_factory()
+        token = current_session.set(session)
+        deadline_token = deadline.start(self.operation.operation_id)
+        try:
+            await self.async_operation(scope, receive, send_with_status)
+        finally:
+            try:
+                logger.debug("Closing async DB session")
+                await session.close()
+            except Exception:
+                logger.exception("Exception while closing async DB session")
+            current_session.reset(token)
+            deadline.finish(deadline_token)
+            log_access(scope, response_start, 1000 * (time.monotonic() - start_time))
+
+
+def log_access(scope: Scope, response_start: dict[str, Any], response_time_ms: float) -> None:
+    """Access log line matching the one logged by Flask for sync controllers."""
+    headers = {key.decode(): value.decode() for key, value in response_start["headers"]}
+    query_string = scope.get("query_string", b"").decode()
+    full_path = scope["path"] + "?" + query_string
+    client = scope.get("client")
+    content_length = headers.get("content-length")
+    logger.info(
+        "%s %s %s",
+        response_start["status"],
+        scope["method"],
+        full_path,
+        extra={
+            "remote_addr": client[0] if client else None,
+            "response_length": int(content_length) if content_length else None,
+            "response_type": headers.get("content-type"),
+            "status_code": response_start["status"],
+            "response_time_ms": response_time_ms,
+        },
+    )
+
+
+class AsyncControllerAPI(RoutedAPI[ASGIApp]):
+    def __init__(
+        self: Self,
+        *args: Any,
+        session_factory: Callable[[], AsyncSession],
+        pythonic_params: bool = False,
+        jsonifier: Optional[Jsonifier] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.session_factory = session_factory
+        self.pythonic_params = pythonic_params
+        self.jsonifier = jsonifier or Jsonifier()
+        self.add_paths()
+
+    def make_operation(self: Self, operation: AbstractOperation) -> ASGIApp:
+        if not asyncio.iscoroutinefunction(operation.function):
+            return self.next_app
+
+        return AsyncControllerOperation(
+            self.next_app,
+            operation=operation,
+            async_operation=AsyncOperation.from_operation(
+                operation, pythonic_params=self.pythonic_params, jsonifier=self.jsonifier
+            ),
+            session_factory=self.session_factory,
+        )
+
+
+class AsyncControllerMiddleware(RoutedMiddleware[AsyncControllerAPI]):
+    """Middleware which calls `async def` controllers directly on the event loop."""
+
+    api_cls = AsyncControllerAPI
+
+    def __init__(self: Self, app: ASGIApp, session_factory: Callable[[], AsyncSession]) -> None:
+        super().__init__(app)
+        self.session_factory = session_factory
+
+    def add_api(self: Self, *args: Any, **kwargs: Any) -> AsyncControllerAPI:
+        return super().add_api(*args, session_factory=self.session_factory, **kwargs)
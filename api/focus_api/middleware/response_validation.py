@@ -0,0 +1,270 @@
+#
+# Sampled response validation.
+#
+# connexion validates every response against the OpenAPI spec and turns any mismatch into a 500.
+# That is what we want in tests, but in production it costs a parse of every response body and
+# turns a documentation drift into an outage.
+#
+# SampledResponseValidationMiddleware replaces connexion's ResponseValidationMiddleware. It
+# validates a configurable fraction of responses, optionally set per operationId, and either
+# enforces the contract (as connexion does) or only reports violations: they are logged and counted
+# in the response_validation_checks_total metric, and the response is sent unchanged.
+#
+# By default 1% of responses are validated, or all of them when ENVIRONMENT=local. Configuration
+# (see get_config):
+#
+#   RESPONSE_VALIDATION_SAMPLE_RATE=0.05
+#   RESPONSE_VALIDATION_OPERATION_SAMPLE_RATES=focus_api.controllers.eligibility=1,...
+#   RESPONSE_VALIDATION_ENFORCE=false
+#
+
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, MutableMapping, Optional, Self
+
+from connexion import utils  # type: ignore
+from connexion.exceptions import NonConformingResponse  # type: ignore
+from connexion.middleware.response_validation import (  # type: ignore
+    ResponseValidationAPI,
+    ResponseValidationMiddleware,
+    ResponseValidationOperation,
+)
+from connexion.operations import AbstractOperation  # type: ignore
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from focus_api.utils import metrics
+from focus_api.utils.env import get_bool_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+RESPONSE_VALIDATION_CHECKS = metrics.counter(
+    "response_validation_checks_total",
+    "Responses checked against the OpenAPI spec (result: valid, invalid or skipped)",
+)
+
+
+# Sample rates when RESPONSE_VALIDATION_SAMPLE_RATE isn't set
+DEFAULT_SAMPLE_RATE = 0.01
+LOCAL_SAMPLE_RATE = 1.0
+
+
+@dataclass
+class ResponseValidationConfig:
+    # Fraction of responses validated, from 0 (none) to 1 (all)
+    sample_rate: float = DEFAULT_SAMPLE_RATE
+    # Sample rates for individual operations, keyed by operationId, overriding sample_rate
+    operation_sample_rates: Dict[str, float] = field(default_factory=dict)
+    # When true a non-conforming response is replaced by a 500, as connexion does. Otherwise the
+    # violation is logged and counted, and the response is sent as is.
+    enforce: bool = False
+
+    def sample_rate_for(self: Self, operation_id: Optional[str]) -> float:
+        if operation_id is not None and operation_id in self.operation_sample_rates:
+            return self.operation_sample_rates[operation_id]
+        return self.sample_rate
+
+
+def get_config() -> ResponseValidationConfig:
+    config = ResponseValidationConfig()
+    if os.getenv("ENVIRONMENT") == "local":
+        config.sample_rate = LOCAL_SAMPLE_RATE
+
+    sample_rate_override = get_rate_env("RESPONSE_VALIDATION_SAMPLE_RATE")
+    if sample_rate_override is not None:
+        config.sample_rate = sample_rate_override
+
+    # Comma separated operationId=rate pairs
+    operation_sample_rates = os.getenv("RESPONSE_VALIDATION_OPERATION_SAMPLE_RATES", "")
+    for pair in operation_sample_rates.split(","):
+        operation_id, _, rate = pair.partition("=")
+        parsed_rate = parse_rate(rate)
+        if operation_id.strip() and parsed_rate is not None:
+            config.operation_sample_rates[operation_id.strip()] = parsed_rate
+
+    enforce_override = get_bool_env("RESPONSE_VALIDATION_ENFORCE")
+    if enforce_override is not None:
+        config.enforce = enforce_override
+
+    logger.info(
+        "Constructed response validation configuration",
+        extra={
+            "sample_rate": config.sample_rate,
+            "operation_sample_rates": config.operation_sample_rates,
+            "enforce": config.enforce,
+        },
+    )
+
+    return config
+
+
+def parse_rate(value: str) -> Optional[float]:
+    """Parse a sample rate, ignoring malformed values and clamping to [0, 1]."""
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except ValueError:
+        return None
+
+
+def get_rate_env(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return parse_rate(value) if value is not None else None
+
+
+class SampledResponseValidationOperation(ResponseValidationOperation):
+    """Validates a sample of an operation's responses, enforcing or reporting violations."""
+
+    def __init__(
+        self: Self,
+        next_app: ASGIApp,
+        *,
+        operation: AbstractOperation,
+        validator_map: Optional[dict] = None,
+        sample_rate: float = 1.0,
+        enforce: bool = False,
+    ) -> None:
+        super().__init__(next_app, operation=operation, validator_map=validator_map)
+        self.sample_rate = sample_rate
+        self.enforce = enforce
+
+    @property
+    def operation_id(self: Self) -> str:
+        return self._operation.operation_id or "unknown"
+
+    def sampled(self: Self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    async def __call__(self: Self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.sampled():
+            RESPONSE_VALIDATION_CHECKS.inc(operation=self.operation_id, result="skipped")
+            await self.next_app(scope, receive, send)
+        elif self.enforce:
+            try:
+                await super().__call__(scope, receive, send)
+            except NonConformingResponse as exception:
+                self.report(scope, exception)
+                raise
+            RESPONSE_VALIDATION_CHECKS.inc(operation=self.operation_id, result="valid")
+        else:
+            await self.next_app(scope, receive, self.reporting_send(scope, send))
+
+    def reporting_send(self: Self, scope: Scope, send: Send) -> Send:
+        """Wrap send to validate the response without changing it.
+
+        Body messages are only held back when the response has a body validator, until the last
+        one arrives; the whole response is then validated and sent on.
+        """
+        validator: Any = None
+        messages: List[MutableMapping[str, Any]] = []
+
+        async def send_(message: MutableMapping[str, Any]) -> None:
+            nonlocal validator
+
+            if message["type"] == "http.response.start":
+                try:
+                    validator = self.start_validation(scope, message)
+                except NonConformingResponse as exception:
+                    self.report(scope, exception)
+                if validator is None:
+                    return await send(message)
+                messages.append(message)
+                return
+
+            if validator is None:
+                return await send(message)
+
+            messages.append(message)
+            if message.get("more_body", False):
+                return
+
+            try:
+                body = validator._parse(m.get("body", b"") for m in messages[1:])
+                if not (body is None and validator._nullable):
+                    validator._validate(body)
+            except NonConformingResponse as exception:
+                self.report(scope, exception)
+            else:
+                RESPONSE_VALIDATION_CHECKS.inc(operation=self.operation_id, result="valid")
+
+            validator = None
+            while messages:
+                await send(messages.pop(0))
+
+        return send_
+
+    def start_validation(self: Self, scope: Scope, message: MutableMapping[str, Any]) -> Any:
+        """Validate the status line and headers, returning a body validator if there is one."""
+        headers = message["headers"]
+        mime_type, encoding = self.extract_content_type(headers)
+        if message["status"] < 400:
+            self.validate_mime_type(mime_type)
+
+        status = str(message["status"])
+        response_definition = self._operation.response_definition(status, mime_type)
+        self.validate_required_headers(headers, response_definition)
+
+        try:
+            body_validator = self._validator_map["response"][mime_type]
+        except KeyError:
+            RESPONSE_VALIDATION_CHECKS.inc(operation=self.operation_id, result="valid")
+            return None
+
+        return body_validator(
+            scope,
+            schema=self._operation.response_schema(status, mime_type),
+            nullable=utils.is_nullable(response_definition),
+            encoding=encoding,
+        )
+
+    def report(self: Self, scope: Scope, exception: NonConformingResponse) -> None:
+        RESPONSE_VALIDATION_CHECKS.inc(operation=self.operation_id, result="invalid")
+        logger.warning(
+            "response does not conform to the OpenAPI spec",
+            extra={
+                "operation_id": self.operation_id,
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "detail": exception.detail,
+                "enforced": self.enforce,
+            },
+        )
+
+
+class SampledResponseValidationAPI(ResponseValidationAPI):
+    def __init__(
+        self: Self,
+        *args: Any,
+        response_validation_config: Optional[ResponseValidationConfig] = None,
+        **kwargs: Any,
+    ) -> None:
+        # Set before super().__init__, which creates the operations.
+        self.config = response_validation_config or ResponseValidationConfig()
+        super().__init__(*args, **kwargs)
+
+    def make_operation(self: Self, operation: AbstractOperation) -> Any:
+        if not self.validate_responses:
+            return self.next_app
+
+        return SampledResponseValidationOperation(
+            self.next_app,
+            operation=operation,
+            validator_map=self.validator_map,
+            sample_rate=self.config.sample_rate_for(operation.operation_id),
+            enforce=self.config.enforce,
+        )
+
+
+class SampledResponseValidationMiddleware(ResponseValidationMiddleware):
+    """Drop-in replacement for connexion's ResponseValidationMiddleware."""
+
+    api_cls = SampledResponseValidationAPI
+
+    def __init__(
+        self: Self, app: ASGIApp, config: Optional[ResponseValidationConfig] = None
+    ) -> None:
+        super().__init__(app)
+        self.config = config
+
+    def add_api(self: Self, *args: Any, **kwargs: Any) -> SampledResponseValidationAPI:
+        return super().add_api(*args, response_validation_config=self.config, **kwargs)
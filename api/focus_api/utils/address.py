@@ -0,0 +1,94 @@
+#
+# Normalization of postal addresses.
+#
+# Two spellings of the same address ("123 Main Street, apt. 4" and "123 MAIN ST APT 4") normalize
+# to the same fields: upper case, without punctuation or repeated whitespace, and with the street
+# suffixes, directions and unit designators USPS abbreviates (Publication 28) abbreviated. ZIP codes
+# are reduced to their first five digits.
+#
+# The result is used to key caches and compare addresses, not to display them.
+#
+
+import hashlib
+import re
+from typing import Any, Dict, Mapping
+
+ADDRESS_FIELDS = ("address1", "address2", "city", "state", "zip", "country")
+
+ABBREVIATIONS = {
+    # Street suffixes
+    "ALLEY": "ALY",
+    "AVENUE": "AVE",
+    "BOULEVARD": "BLVD",
+    "CIRCLE": "CIR",
+    "COURT": "CT",
+    "CROSSING": "XING",
+    "DRIVE": "DR",
+    "EXPRESSWAY": "EXPY",
+    "FREEWAY": "FWY",
+    "HEIGHTS": "HTS",
+    "HIGHWAY": "HWY",
+    "LANE": "LN",
+    "MOUNT": "MT",
+    "PARKWAY": "PKWY",
+    "PLACE": "PL",
+    "PLAZA": "PLZ",
+    "POINT": "PT",
+    "ROAD": "RD",
+    "ROUTE": "RTE",
+    "SQUARE": "SQ",
+    "STREET": "ST",
+    "TERRACE": "TER",
+    "TRAIL": "TRL",
+    "TURNPIKE": "TPKE",
+    # Directions
+    "NORTH": "N",
+    "SOUTH": "S",
+    "EAST": "E",
+    "WEST": "W",
+    "NORTHEAST": "NE",
+    "NORTHWEST": "NW",
+    "SOUTHEAST": "SE",
+    "SOUTHWEST": "SW",
+    # Unit designators
+    "APARTMENT": "APT",
+    "BUILDING": "BLDG",
+    "DEPARTMENT": "DEPT",
+    "FLOOR": "FL",
+    "ROOM": "RM",
+    "SUITE": "STE",
+    "#": "APT",
+}
+
+PUNCTUATION = re.compile(r"[.,;:'\"]")
+# "#4" => "# 4", so the designator is a separate word
+UNIT_NUMBER = re.compile(r"#(?=\S)")
+
+
+def normalize_text(value: Any) -> str:
+    words = UNIT_NUMBER.sub("# ", PUNCTUATION.sub(" ", str(value or "").upper())).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def normalize_zip(value: Any) -> str:
+    return re.sub(r"\D", "", str(value or ""))[:5]
+
+
+def normalize_address(address: Mapping[str, Any]) -> Dict[str, str]:
+    """The Address schema fields of address, normalized."""
+    return {
+        field: (
+            normalize_zip(address.get(field))
+            if field == "zip"
+            else normalize_text(address.get(field))
+        )
+        for field in ADDRESS_FIELDS
+    }
+
+
+def address_key(address: Mapping[str, Any]) -> str:
+    """A cache key which is the same for every spelling of an address."""
+    normalized = normalize_address(address)
+    return hashlib.sha256(
+        "\x1f".join(normalized[field] for field in ADDRESS_FIELDS).encode()
+    ).hexdigest()
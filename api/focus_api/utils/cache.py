@@ -0,0 +1,153 @@
+#
+# Caches for the results of slow or metered operations (mostly calls to external services).
+#
+# TTLCache is an in-process cache with a time to live and least-recently-used eviction. Each
+# gunicorn worker has its own, so on its own a result is cached once per worker.
+#
+# TieredCache puts a TTLCache in front of an optional shared tier (see focus_api.db.cache for one
+# backed by Postgres), which all workers read and write. A hit in the shared tier is copied into
+# the in-process tier.
+#
+# Lookups are counted in cache_lookups_total by cache, tier and result (hit or miss). Only
+# JSON-serializable values may be cached when a shared tier is used.
+#
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Protocol, Self, Tuple
+
+from focus_api.utils import metrics
+from focus_api.utils.env import get_bool_env, get_float_env, get_int_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_LOOKUPS = metrics.counter(
+    "cache_lookups_total", "Result cache lookups, by cache, tier and result (hit or miss)"
+)
+
+MISSING = object()
+
+
+@dataclass
+class CacheConfig:
+    # Entries kept in each process; the least recently used is evicted beyond this
+    maxsize: int = 1024
+    # Seconds an entry is used for, in every tier
+    ttl: float = 300
+    # Also cache in Postgres, shared by every worker
+    postgres: bool = False
+
+
+def get_config(name: str, defaults: Optional[CacheConfig] = None) -> CacheConfig:
+    """Configuration for a cache, from environment variables prefixed with its name.
+
+    e.g. ADDRESS_CACHE_SIZE, ADDRESS_CACHE_TTL and ADDRESS_CACHE_POSTGRES for the "address" cache.
+    """
+    prefix = f"{name.upper()}_CACHE"
+    cache_config = CacheConfig(**defaults.__dict__) if defaults is not None else CacheConfig()
+
+    maxsize_override = get_int_env(f"{prefix}_SIZE")
+    if maxsize_override is not None:
+        cache_config.maxsize = maxsize_override
+
+    ttl_override = get_float_env(f"{prefix}_TTL")
+    if ttl_override is not None:
+        cache_config.ttl = ttl_override
+
+    postgres_override = get_bool_env(f"{prefix}_POSTGRES")
+    if postgres_override is not None:
+        cache_config.postgres = postgres_override
+
+    logger.info(
+        "Constructed cache configuration",
+        extra={
+            "cache": name,
+            "maxsize": cache_config.maxsize,
+            "ttl": cache_config.ttl,
+            "postgres": cache_config.postgres,
+        },
+    )
+
+    return cache_config
+
+
+class CacheTier(Protocol):
+    """A cache shared by processes. get() returns MISSING when there is no fresh entry."""
+
+    def get(self: Self, key: str) -> Any:
+        """The cached value for key, or MISSING."""
+
+    def set(self: Self, key: str, value: Any) -> None:
+        """Cache value for key, for the cache's ttl."""
+
+
+class TTLCache:
+    """An in-process cache of up to maxsize entries, each used for ttl seconds."""
+
+    def __init__(self: Self, name: str, maxsize: int = 1024, ttl: float = 300) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key => (monotonic expiry time, value), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self: Self, key: str) -> Any:
+        """The cached value for key, or MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        CACHE_LOOKUPS.inc(cache=self.name, tier="memory", result="miss" if entry is None else "hit")
+        return MISSING if entry is None else entry[1]
+
+    def set(self: Self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self: Self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self: Self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self: Self) -> int:
+        return len(self._entries)
+
+
+class TieredCache:
+    """An in-process TTLCache in front of an optional shared tier."""
+
+    def __init__(self: Self, memory: TTLCache, shared: Optional[CacheTier] = None) -> None:
+        self.memory = memory
+        self.shared = shared
+
+    @property
+    def name(self: Self) -> str:
+        return self.memory.name
+
+    def get(self: Self, key: str) -> Any:
+        """The cached value for key, or MISSING."""
+        value = self.memory.get(key)
+        if value is MISSING and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not MISSING:
+                self.memory.set(key, value)
+        return value
+
+    def set(self: Self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
@@ -0,0 +1,112 @@
+#
+# Request deadlines, from per-operation latency budgets.
+#
+# Each operation can have a latency budget: the time within which it should answer, or give up.
+# When a request for it starts, its budget becomes the request's deadline, and the work the
+# request does is cut off at the deadline instead of holding a worker and its connections:
+#
+# - SQL statements run with SET LOCAL statement_timeout set to the time remaining (see
+#   focus_api.db.statement_timeout), so Postgres cancels them at the deadline;
+# - calls to external services (focus_api.clients) have their connect and read timeouts
+#   shortened to the time remaining.
+#
+# Budgets are set, in milliseconds, with `x-budget-ms` on the OpenAPI operation, or in the
+# environment, which takes precedence:
+#
+#   REQUEST_BUDGETS="focus_api.controllers.address=2000,focus_api.controllers.eligibility=3000"
+#   REQUEST_DEFAULT_BUDGET_MS=10000  (for operations without a budget; unset for no deadline)
+#
+
+import os
+import time
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Self
+
+from focus_api.utils.env import get_int_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+BUDGET_EXTENSION = "x-budget-ms"
+
+
+@dataclass
+class DeadlineConfig:
+    # operationId => budget in milliseconds
+    budgets: Dict[str, int] = field(default_factory=dict)
+    # Budget of operations without one, or None for no deadline
+    default_budget_ms: Optional[int] = None
+
+
+def get_config() -> DeadlineConfig:
+    deadline_config = DeadlineConfig()
+
+    for budget in os.getenv("REQUEST_BUDGETS", "").split(","):
+        operation_id, _separator, budget_ms = budget.strip().partition("=")
+        if operation_id and budget_ms.isdigit():
+            deadline_config.budgets[operation_id] = int(budget_ms)
+
+    default_budget_override = get_int_env("REQUEST_DEFAULT_BUDGET_MS")
+    if default_budget_override is not None:
+        deadline_config.default_budget_ms = default_budget_override
+
+    logger.info(
+        "Constructed request deadline configuration",
+        extra={
+            "budgets": deadline_config.budgets,
+            "default_budget_ms": deadline_config.default_budget_ms,
+        },
+    )
+
+    return deadline_config
+
+
+def get_budgets(specification: Any, config: DeadlineConfig) -> Dict[str, int]:
+    """The budget of each operationId, from `x-budget-ms` in the spec and from config."""
+    budgets = {
+        operation["operationId"]: int(operation[BUDGET_EXTENSION])
+        for path in specification["paths"].values()
+        for operation in path.values()
+        if isinstance(operation, dict) and BUDGET_EXTENSION in operation
+    }
+    return {**budgets, **config.budgets}
+
+
+class Deadline:
+    def __init__(self: Self, budget_ms: int) -> None:
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    def remaining(self: Self) -> float:
+        """Seconds until the deadline, or 0 once it has passed."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+_budgets: Dict[str, int] = {}
+_default_budget_ms: Optional[int] = None
+
+
+def configure(specification: Any, config: DeadlineConfig) -> None:
+    global _budgets, _default_budget_ms
+
+    _budgets = get_budgets(specification, config)
+    _default_budget_ms = config.default_budget_ms
+
+
+def start(operation_id: str) -> Token[Optional[Deadline]]:
+    """Set the deadline of a request for operation_id, if it has a budget."""
+    budget_ms = _budgets.get(operation_id, _default_budget_ms)
+    return current_deadline.set(Deadline(budget_ms) if budget_ms is not None else None)
+
+
+def finish(token: Token[Optional[Deadline]]) -> None:
+    current_deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current request's deadline, or None without one."""
+    deadline = current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
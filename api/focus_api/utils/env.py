@@ -0,0 +1,38 @@
+#
+# Settings overridden by environment variables.
+#
+# Each reader returns None when the variable is unset or its value is malformed, so that a bad
+# override leaves the default in place instead of failing startup.
+#
+
+import math
+import os
+from typing import Optional
+
+
+def get_int_env(name: str) -> Optional[int]:
+    """Read a non-negative integer from the environment, ignoring unset or malformed values."""
+    value = os.getenv(name)
+    if value is not None and value.isdigit():
+        return int(value)
+    return None
+
+
+def get_float_env(name: str) -> Optional[float]:
+    """Read a non-negative number from the environment, ignoring unset or malformed values."""
+    value = os.getenv(name)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) and number >= 0 else None
+
+
+def get_bool_env(name: str) -> Optional[bool]:
+    """Read a flag from the environment: true for 1, true or yes; None when unset."""
+    value = os.getenv(name)
+    if value is None:
+        return None
+    return value.strip().lower() in ("1", "true", "yes")
@@ -0,0 +1,245 @@
+#
+# Background health checks for /health/deep.
+#
+# Load balancers probe /health/deep often, from many targets. Rather than querying the database
+# (and external services) on every probe, a prober thread in each worker checks every component
+# each HEALTH_CHECK_INTERVAL seconds and keeps the latest result; the endpoint only reports them.
+#
+# The prober has its own connections, so it never takes one from the request path: a one
+# connection database pool (reported as the "health" pool in the metrics) and new connections to
+# each external service that is configured.
+#
+# A component is reported:
+#
+# - "up" or "down", with the latency and time of its last check;
+# - "degraded" when its last check is older than HEALTH_CHECK_STALE_AFTER seconds (the prober is
+#   stuck or the check is hanging), or it hasn't been checked yet.
+#
+# The overall status is "down" if the database is down, "degraded" if any other component isn't
+# up, and "up" otherwise.
+#
+
+import dataclasses
+import datetime
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Self
+
+import requests
+from sqlalchemy import text
+
+from focus_api.clients import ELIGIBILITY, PAYMENT, PHOTO, USPS
+from focus_api.clients.config import get_config as get_service_config
+from focus_api.db import create_engine
+from focus_api.db.config import get_config as get_db_config
+from focus_api.utils.env import get_float_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+UP = "up"
+DOWN = "down"
+DEGRADED = "degraded"
+
+# Components whose failure means the API can't serve requests
+CRITICAL_COMPONENTS = ("db",)
+
+
+@dataclass
+class HealthCheckConfig:
+    # Seconds between checks of each component
+    interval: float = 10
+    # Results older than this many seconds are reported as degraded
+    stale_after: float = 30
+    # Seconds each check may take
+    timeout: float = 2
+
+
+def get_config() -> HealthCheckConfig:
+    health_check_config = HealthCheckConfig()
+
+    interval_override = get_float_env("HEALTH_CHECK_INTERVAL")
+    if interval_override is not None:
+        health_check_config.interval = interval_override
+        health_check_config.stale_after = 3 * health_check_config.interval
+
+    stale_after_override = get_float_env("HEALTH_CHECK_STALE_AFTER")
+    if stale_after_override is not None:
+        health_check_config.stale_after = stale_after_override
+
+    timeout_override = get_float_env("HEALTH_CHECK_TIMEOUT")
+    if timeout_override is not None:
+        health_check_config.timeout = timeout_override
+
+    logger.info(
+        "Constructed health check configuration",
+        extra={
+            "interval": health_check_config.interval,
+            "stale_after": health_check_config.stale_after,
+            "timeout": health_check_config.timeout,
+        },
+    )
+
+    return health_check_config
+
+
+@dataclass
+class ComponentHealth:
+    status: str
+    latency_ms: float
+    # Wall clock time, for reporting; staleness is measured with the monotonic clock.
+    last_checked: datetime.datetime
+    checked_at: float
+    error: Optional[str] = None
+
+
+class HealthProber:
+    def __init__(
+        self: Self, checks: Dict[str, Callable[[], None]], config: HealthCheckConfig
+    ) -> None:
+        self.checks = checks
+        self.config = config
+        self.results: Dict[str, ComponentHealth] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def check(self: Self, name: str) -> None:
+        start = time.monotonic()
+        try:
+            self.checks[name]()
+            status, error = UP, None
+        except Exception as e:
+            status, error = DOWN, type(e).__name__
+            logger.warning("Health check failed", extra={"component": name, "error": error})
+
+        self.results[name] = ComponentHealth(
+            status=status,
+            latency_ms=round(1000 * (time.monotonic() - start), 3),
+            last_checked=datetime.datetime.now(datetime.UTC),
+            checked_at=time.monotonic(),
+            error=error,
+        )
+
+    def check_all(self: Self) -> None:
+        for name in self.checks:
+            self.check(name)
+
+    def run(self: Self) -> None:
+        while not self._stopping.is_set():
+            self.check_all()
+            self._stopping.wait(self.config.interval)
+
+    def start(self: Self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self.run, name="health-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self: Self) -> None:
+        self._stopping.set()
+
+    def component_status(self: Self, name: str) -> Dict[str, Any]:
+        result = self.results.get(name)
+        if result is None:
+            return {"status": DEGRADED, "error": "not checked yet"}
+
+        component: Dict[str, Any] = {
+            "status": result.status,
+            "latencyMs": result.latency_ms,
+            "lastChecked": result.last_checked,
+        }
+        if time.monotonic() - result.checked_at > self.config.stale_after:
+            component["status"] = DEGRADED
+            component["error"] = "stale"
+        elif result.error is not None:
+            component["error"] = result.error
+        return component
+
+    def status(self: Self) -> Dict[str, Any]:
+        """The overall status, and the status of each component."""
+        components = {name: self.component_status(name) for name in self.checks}
+        if any(
+            components[name]["status"] == DOWN for name in CRITICAL_COMPONENTS if name in components
+        ):
+            status = DOWN
+        elif any(component["status"] != UP for component in components.values()):
+            status = DEGRADED
+        else:
+            status = UP
+        return {"status": status, "components": components}
+
+
+def create_db_check(config: HealthCheckConfig) -> Callable[[], None]:
+    """Check the database over a dedicated one connection pool."""
+    db_config = get_db_config()
+    engine = create_engine(
+        dataclasses.replace(
+            db_config,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=int(config.timeout) or 1,
+            statement_timeout=int(1000 * config.timeout),
+        ),
+        name="health",
+    )
+
+    def check() -> None:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1")).one()
+
+    return check
+
+
+def create_service_check(base_url: str, config: HealthCheckConfig) -> Callable[[], None]:
+    """Check that a service answers HTTP requests without a server error.
+
+    Each check opens a new connection, so it also exercises DNS and the TCP and TLS handshakes.
+    """
+
+    def check() -> None:
+        response = requests.head(base_url, timeout=config.timeout, allow_redirects=False)
+        if response.status_code >= 500:
+            raise requests.HTTPError(f"{response.status_code} from service", response=response)
+
+    return check
+
+
+def create_checks(config: HealthCheckConfig) -> Dict[str, Callable[[], None]]:
+    checks = {"db": create_db_check(config)}
+
+    for name in (USPS, ELIGIBILITY, PHOTO, PAYMENT):
+        base_url = get_service_config(name).base_url
+        if base_url is not None:
+            checks[name] = create_service_check(base_url, config)
+    return checks
+
+
+_prober: Optional[HealthProber] = None
+_prober_lock = threading.Lock()
+
+
+def get_prober() -> HealthProber:
+    """The process's health prober, created and started on first use."""
+    global _prober
+
+    if _prober is None:
+        with _prober_lock:
+            if _prober is None:
+                config = get_config()
+                _prober = HealthProber(create_checks(config), config)
+                _prober.start()
+    return _prober
+
+
+def restart_prober_after_fork() -> None:
+    """The prober thread doesn't survive fork; start another for the child's results."""
+    if _prober is not None:
+        _prober.results.clear()
+        _prober.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_prober_after_fork)
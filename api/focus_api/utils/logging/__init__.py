@@ -13,7 +13,9 @@ import time
 from logging import CRITICAL, DEBUG, ERROR, INFO, WARNING  # noqa: B1 F401
 from typing import Any, Dict, cast
 
-from . import formatters, network
+from focus_api.utils.env import get_bool_env, get_float_env, get_int_env
+
+from . import batching, formatters, network
 
 start_time = time.monotonic()
 
@@ -36,6 +38,8 @@ def init(program_name: str, develop: bool = False) -> None:
     """Initialize the logging system."""
     if develop:
         LOGGING["handlers"]["console"]["formatter"] = "develop"
+    if get_bool_env("LOG_QUEUE"):
+        LOGGING["handlers"]["console"] = get_queue_handler_config(LOGGING["handlers"]["console"])
     logging.config.dictConfig(LOGGING)
     logger.info(
         "start %s: %s %s %s, hostname %s, pid %i, user %i(%s)",
@@ -72,6 +76,31 @@ def init(program_name: str, develop: bool = False) -> None:
     network.init()
 
 
+def get_queue_handler_config(handler: Dict[str, Any]) -> Dict[str, Any]:
+    """Swap a StreamHandler config for a batching.BatchingStreamHandler.
+
+    Records are then formatted and written on a background thread, off the request path.
+
+    The queue is configured with these environment variables:
+
+      LOG_QUEUE_SIZE: maximum number of queued records (default 10000)
+      LOG_QUEUE_OVERFLOW: what happens to DEBUG/INFO records when the queue is full: "block",
+        "drop" or "sample" (default "block")
+      LOG_QUEUE_SAMPLE_RATE: fraction of DEBUG/INFO records kept by "sample" (default 0.1)
+      LOG_BATCH_SIZE: maximum records written at once (default 256)
+    """
+    config = {
+        "class": f"{batching.__name__}.BatchingStreamHandler",
+        "formatter": handler.get("formatter"),
+        # Unset or malformed values are left out, for the handler's defaults.
+        "queue_size": get_int_env("LOG_QUEUE_SIZE"),
+        "overflow": os.environ.get("LOG_QUEUE_OVERFLOW", "block"),
+        "sample_rate": get_float_env("LOG_QUEUE_SAMPLE_RATE"),
+        "batch_size": get_int_env("LOG_BATCH_SIZE"),
+    }
+    return {key: value for key, value in config.items() if value is not None}
+
+
 def override_logging_levels() -> None:
     """Override default logging levels using settings in LOGGING_LEVEL environment variable.
 
@@ -0,0 +1,158 @@
+#
+# Non-blocking, batched log output.
+#
+# BatchingStreamHandler takes formatting and writing off the thread that logs. emit() only puts the
+# record on a bounded queue; a background writer thread formats queued records and writes them to
+# the stream in batches, with one write and flush per batch.
+#
+# When the queue is full (the writer can't keep up with the stream), the overflow policy decides
+# what happens to a DEBUG or INFO record:
+#
+# - "block": wait for space, as a synchronous handler would
+# - "drop": discard it
+# - "sample": once the queue is half full, keep only a fraction (sample_rate) of them; discard
+#   them when it is full
+#
+# WARNING and above always wait for space. Discarded records are counted in the
+# log_records_dropped_total metric.
+#
+# Records are formatted on the writer thread, so objects passed as log arguments or extras must
+# not be modified after logging.
+#
+
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import weakref
+from typing import IO, List, Optional, Self
+
+from focus_api.utils import metrics
+
+RECORDS_DROPPED = metrics.counter(
+    "log_records_dropped_total", "Log records discarded because the log queue was full"
+)
+
+OVERFLOW_POLICIES = ("block", "drop", "sample")
+
+_handlers: "weakref.WeakSet[BatchingStreamHandler]" = weakref.WeakSet()
+
+
+class BatchingStreamHandler(logging.Handler):
+    """A stream handler which formats and writes records in batches on a background thread."""
+
+    def __init__(
+        self: Self,
+        stream: Optional[IO[str]] = None,
+        queue_size: int = 10000,
+        overflow: str = "block",
+        sample_rate: float = 0.1,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+    ) -> None:
+        super().__init__()
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}")
+
+        self.stream = stream if stream is not None else sys.stderr
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue[Optional[logging.LogRecord]]" = queue.Queue(queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self.start()
+        _handlers.add(self)
+
+    def start(self: Self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self: Self, record: logging.LogRecord) -> None:
+        if record.levelno >= logging.WARNING or self.overflow == "block":
+            self.queue.put(record)
+            return
+
+        if self.overflow == "sample" and self.queue.qsize() >= self.queue_size // 2:
+            if random.random() >= self.sample_rate:
+                RECORDS_DROPPED.inc(level=record.levelname)
+                return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            RECORDS_DROPPED.inc(level=record.levelname)
+
+    def _run(self: Self) -> None:
+        stopping = False
+        while not stopping:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # Take whatever else is already queued, up to batch_size.
+            taken = 1
+            batch: List[logging.LogRecord] = []
+            while record is not None:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+            stopping = record is None
+
+            self.write(batch)
+            for _ in range(taken):
+                self.queue.task_done()
+
+    def write(self: Self, batch: List[logging.LogRecord]) -> None:
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+
+        if not lines:
+            return
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception:
+            self.handleError(batch[-1])
+
+    def flush(self: Self) -> None:
+        """Wait until every record queued so far has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.join()
+
+    def close(self: Self) -> None:
+        """Write out the remaining records and stop the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout=5)
+        self._thread = None
+        super().close()
+
+    def reinit_after_fork(self: Self) -> None:
+        """Replace the writer thread, which doesn't survive fork, and any records it inherited."""
+        if self._thread is None:
+            return
+        self.queue = queue.Queue(self.queue_size)
+        self.start()
+
+
+def reinit_handlers_after_fork() -> None:
+    for handler in list(_handlers):
+        handler.reinit_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reinit_handlers_after_fork)
@@ -4,27 +4,104 @@
 # For outgoing connections, log these:
 #
 # - Before connecting, the IP addresses that the host name resolves to (names often resolve to a
-#   different IP within AWS due to different DNS servers, geolocation, or VPC endpoints).
+#   different IP within AWS due to different DNS servers, geolocation, or VPC endpoints). Each
+#   distinct result is logged once, when it is first seen.
 #
 # - After successful connection:
 #   - The actual IP address used.
 #   - SSL certificate details (for security auditing or troubleshooting).
 #
+# Host names are resolved through a cache with a TTL (DNS_CACHE_TTL seconds, default 60). The
+# addresses looked up for the logging are the ones connected to, so a new connection makes one
+# lookup in the cache, and no DNS query while the cached result is fresh. Hits and misses are
+# counted in dns_cache_lookups_total.
+#
 
 import socket
-from typing import Any
+import threading
+import time
+from typing import Any, Dict, List, Optional, Self, Tuple
 
 from urllib3 import connection
+from urllib3.util import connection as connection_util
+
+import focus_api.utils.logging
+from focus_api.utils import metrics
+from focus_api.utils.env import get_float_env
+
+DNS_CACHE_LOOKUPS = metrics.counter(
+    "dns_cache_lookups_total", "Host name resolutions by the DNS cache (result: hit or miss)"
+)
+
+AddrInfo = Tuple[Any, ...]
+
+
+class DnsCache:
+    """getaddrinfo results for outbound connections, cached for ttl seconds."""
+
+    def __init__(self: Self, ttl: float = 60) -> None:
+        self.ttl = ttl
+        # (host, port) => (monotonic expiry time, getaddrinfo result)
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[AddrInfo]]] = {}
+        # (host, port) => addresses last logged
+        self._logged: Dict[Tuple[str, int], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def getaddrinfo(self: Self, host: str, port: int) -> List[AddrInfo]:
+        key = (host, port)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            DNS_CACHE_LOOKUPS.inc(result="hit")
+            return entry[1]
+
+        DNS_CACHE_LOOKUPS.inc(result="miss")
+        addrs = socket.getaddrinfo(
+            host, port, connection_util.allowed_gai_family(), socket.SOCK_STREAM
+        )
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addrs)
+        return addrs
+
+    def invalidate(self: Self, host: str, port: int) -> None:
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def is_new_result(self: Self, host: str, port: int, addresses: List[Any]) -> bool:
+        """True the first time a result is seen for host:port, or when it has changed."""
+        with self._lock:
+            if self._logged.get((host, port)) == addresses:
+                return False
+            self._logged[(host, port)] = addresses
+            return True
 
-import opr_api.utils.logging
+
+dns_cache = DnsCache()
+
+# The addresses connect_log looked up, for create_connection in the same thread to use:
+# ((host, port), getaddrinfo result)
+_resolved = threading.local()
+
+_patched = False
+_patch_lock = threading.Lock()
 
 
 def init() -> None:
-    """Initialize network logging by patching calls."""
-    (connection.VerifiedHTTPSConnection.connect) = (  # type: ignore[method-assign]
+    """Initialize network logging by patching calls, once."""
+    global _patched
+
+    ttl_override = get_float_env("DNS_CACHE_TTL")
+    if ttl_override is not None:
+        dns_cache.ttl = ttl_override
+    with _patch_lock:
+        if _patched:
+            return
+        _patched = True
+    connection_util.create_connection = patch_create_connection(connection_util.create_connection)
+    connection.VerifiedHTTPSConnection.connect = (  # type: ignore[method-assign]
         patch_connect(connection.VerifiedHTTPSConnection.connect)
     )
-    (connection.HTTPConnection.connect) = patch_connect(  # type: ignore[method-assign]
+    connection.HTTPConnection.connect = patch_connect(  # type: ignore[method-assign]
         connection.HTTPConnection.connect
     )
 
@@ -35,14 +112,20 @@ def patch_connect(
     """Patch a connect method with additional logging."""
 
     def connect_log(self: Any) -> None:
-        logger = opr_api.utils.logging.get_logger(__name__)
+        logger = focus_api.utils.logging.get_logger(__name__)
 
-        # Before connect: log IP addresses for the host name.
-        addrs = socket.getaddrinfo(host=self.host, port=self.port, proto=socket.IPPROTO_TCP)
-        logger.info("getaddrinfo %s:%s => %s", self.host, self.port, [addr[4] for addr in addrs])
+        # Before connect: log IP addresses for the host name, if they haven't been logged.
+        addrs = dns_cache.getaddrinfo(self._dns_host, self.port)
+        addresses = [addr[4] for addr in addrs]
+        if dns_cache.is_new_result(self._dns_host, self.port, addresses):
+            logger.info("getaddrinfo %s:%s => %s", self.host, self.port, addresses)
 
-        # Wrapped method call.
-        original_connect(self)
+        # Wrapped method call, connecting to the same addresses.
+        _resolved.entry = ((self._dns_host, self.port), addrs)
+        try:
+            original_connect(self)
+        finally:
+            _resolved.entry = None
 
         # After successful connect: log actual peer address and SSL certificate, if there is one.
         extra = {}
@@ -56,3 +139,31 @@ def patch_connect(
         logger.info("connected %s:%s", self.host, self.port, extra=extra)
 
     return connect_log
+
+
+def patch_create_connection(
+    original_create_connection: Any,
+) -> Any:
+    """Patch urllib3's create_connection to connect to the cached addresses of the host."""
+
+    def create_connection(address: Tuple[str, int], *args: Any, **kwargs: Any) -> socket.socket:
+        host, port = address
+        entry = getattr(_resolved, "entry", None)
+        if entry is not None and entry[0] == (host, port):
+            addrs = entry[1]
+        else:
+            addrs = dns_cache.getaddrinfo(host.strip("[]"), port)
+
+        error: Optional[OSError] = None
+        for addr in addrs:
+            # A numeric address is passed on, so no further lookup is made.
+            try:
+                return original_create_connection((addr[4][0], port), *args, **kwargs)
+            except OSError as e:
+                error = e
+
+        # The host may have moved; resolve it again next time.
+        dns_cache.invalidate(host.strip("[]"), port)
+        raise error if error is not None else OSError("getaddrinfo returns an empty list")
+
+    return create_connection
@@ -0,0 +1,222 @@
+#
+# In-process metrics.
+#
+# Subsystems (the database pool, caches, outbound clients) record activity in named counters,
+# gauges and histograms held in a process-wide registry. The registry only aggregates values; how
+# they are exported is left to the caller (see focus_api.utils.prometheus).
+#
+# collect() flattens a metric into samples named the way Prometheus names them, e.g. a histogram
+# produces NAME_bucket (with an "le" label), NAME_sum and NAME_count samples.
+#
+
+import bisect
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Self, Sequence, Tuple, Union
+
+LabelKey = Tuple[Tuple[str, str], ...]
+# (sample name, labels, value)
+Sample = Tuple[str, LabelKey, float]
+
+# Request latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+class Counter:
+    """A monotonically increasing value, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self: Self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self: Self, amount: float = 1, **labels: str) -> None:
+        key = label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self: Self, **labels: str) -> float:
+        return self._values.get(label_key(labels), 0)
+
+    def samples(self: Self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self: Self) -> List[Sample]:
+        return [(self.name, key, value) for key, value in self.samples().items()]
+
+    def reset(self: Self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge:
+    """A value that can go up and down.
+
+    A gauge is either set directly, or computed on read by a callback returning the samples."""
+
+    kind = "gauge"
+
+    def __init__(
+        self: Self,
+        name: str,
+        description: str,
+        callback: Optional[Callable[[], Dict[LabelKey, float]]] = None,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self: Self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[label_key(labels)] = value
+
+    def inc(self: Self, amount: float = 1, **labels: str) -> None:
+        key = label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self: Self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def get(self: Self, **labels: str) -> float:
+        return self.samples().get(label_key(labels), 0)
+
+    def samples(self: Self) -> Dict[LabelKey, float]:
+        if self.callback is not None:
+            return self.callback()
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self: Self) -> List[Sample]:
+        return [(self.name, key, value) for key, value in self.samples().items()]
+
+    def reset(self: Self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Counts of observed values (e.g. latencies) in buckets, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(
+        self: Self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # labels => observations per bucket (not cumulative), the last being +Inf
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self: Self, value: float, **labels: str) -> None:
+        key = label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0) + value
+
+    def get_count(self: Self, **labels: str) -> int:
+        with self._lock:
+            return sum(self._counts.get(label_key(labels), []))
+
+    def collect(self: Self) -> List[Sample]:
+        with self._lock:
+            values = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+
+        samples: List[Sample] = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*map(str, self.buckets), "+Inf"), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", (*key, ("le", bound)), cumulative))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+    def reset(self: Self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+_registry: Dict[str, Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, description: str) -> Counter:
+    """Get or create the counter with the given name."""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Counter(name, description)
+    if not isinstance(metric, Counter):
+        raise TypeError(f"metric {name} is already registered as a {metric.kind}")
+    return metric
+
+
+def gauge(
+    name: str,
+    description: str,
+    callback: Optional[Callable[[], Dict[LabelKey, float]]] = None,
+) -> Gauge:
+    """Get or create the gauge with the given name."""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Gauge(name, description, callback)
+    if not isinstance(metric, Gauge):
+        raise TypeError(f"metric {name} is already registered as a {metric.kind}")
+    return metric
+
+
+def histogram(name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create the histogram with the given name."""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Histogram(name, description, buckets)
+    if not isinstance(metric, Histogram):
+        raise TypeError(f"metric {name} is already registered as a {metric.kind}")
+    return metric
+
+
+def get_metrics() -> List[Metric]:
+    with _registry_lock:
+        return list(_registry.values())
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """Flatten all registered metrics to {name: {"label=value,...": value}}, e.g. for logging."""
+    flattened: Dict[str, Dict[str, float]] = {}
+    for metric in get_metrics():
+        for name, key, value in metric.collect():
+            flattened.setdefault(name, {})[",".join(f"{k}={v}" for k, v in key)] = value
+    return flattened
+
+
+def reset_after_fork() -> None:
+    """Start a forked child from zero, so values recorded by the parent aren't counted twice."""
+    for metric in get_metrics():
+        metric.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
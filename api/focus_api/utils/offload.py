@@ -0,0 +1,357 @@
+#
+# Offloading CPU-bound work to a pool of processes.
+#
+# Work like decoding and inspecting uploaded photos holds the GIL, so run on the event loop or a
+# Flask thread it stalls every other request of the worker. An OffloadPool runs such functions in
+# separate processes instead, and the request awaits the result.
+#
+# The pool is bounded: it has OFFLOAD_WORKERS processes, and at most OFFLOAD_MAX_QUEUE tasks wait
+# for one. Beyond that, submitting raises PoolFull, for the request to be answered with a 503 and
+# a Retry-After of OFFLOAD_RETRY_AFTER seconds, rather than queueing work it can't finish in time.
+#
+# Each task is limited to OFFLOAD_TIMEOUT seconds. The process running it raises TaskTimeout
+# (from a SIGALRM) when the time is up, so that a runaway task frees its process; the caller
+# gives up and raises TaskTimeout itself shortly after, in case the task is stuck where the signal
+# can't interrupt it.
+#
+# Large inputs (photos) are handed over in shared memory rather than pickled through the pool's
+# pipe: the request copies the data once into a SharedBuffer, passes its name, and the task reads
+# it in place with attach().
+# On Linux shared memory is allocated in /dev/shm, which containers limit (64MB by default in
+# Docker); allow for (OFFLOAD_WORKERS + OFFLOAD_MAX_QUEUE) requests' photos in each server worker.
+#
+# If a pool process dies (e.g. killed for running out of memory), the pool is broken: its tasks,
+# and any submitted to it, raise BrokenProcessPool. The broken pool is then dropped, and the next
+# task starts a new one.
+#
+# Processes are started with forkserver, as forking a process with threads (e.g. a server worker)
+# isn't safe, and on first use, so servers which never offload anything don't start any. Each
+# server worker has its own pool; a forked child never uses its parent's.
+#
+# Metrics, by pool: tasks by result, task run time, and the tasks running and waiting (see
+# offload_pool_utilization for the fraction of processes busy).
+#
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from types import FrameType
+from typing import IO, Any, Callable, Dict, Generator, Optional, Self, Tuple, TypeVar
+
+from focus_api.utils import metrics
+from focus_api.utils.env import get_float_env, get_int_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+TASKS = metrics.counter("offload_tasks_total", "Offloaded tasks, by pool and result")
+TASK_SECONDS = metrics.histogram(
+    "offload_task_seconds", "Time offloaded tasks spent running in a pool process"
+)
+
+# Seconds the caller waits beyond the task's own timeout
+TIMEOUT_GRACE = 1.0
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class PoolFull(Exception):
+    """The pool's queue is full; try again after retry_after seconds."""
+
+    def __init__(self: Self, pool: str, retry_after: int) -> None:
+        super().__init__(f"Offload pool {pool} is full")
+        self.retry_after = retry_after
+
+
+class TaskTimeout(Exception):
+    pass
+
+
+@dataclass
+class OffloadConfig:
+    # Processes in the pool
+    workers: int = 2
+    # Tasks which may wait for a process; more are rejected with PoolFull
+    max_queue: int = 8
+    # Seconds a task may run
+    timeout: float = 10.0
+    # Seconds clients are asked to wait when the pool is full
+    retry_after: int = 1
+
+
+def get_config() -> OffloadConfig:
+    offload_config = OffloadConfig()
+
+    workers_override = get_int_env("OFFLOAD_WORKERS")
+    if workers_override is not None:
+        offload_config.workers = max(1, workers_override)
+
+    max_queue_override = get_int_env("OFFLOAD_MAX_QUEUE")
+    if max_queue_override is not None:
+        offload_config.max_queue = max_queue_override
+
+    timeout_override = get_float_env("OFFLOAD_TIMEOUT")
+    if timeout_override is not None:
+        offload_config.timeout = timeout_override
+
+    retry_after_override = get_int_env("OFFLOAD_RETRY_AFTER")
+    if retry_after_override is not None:
+        offload_config.retry_after = retry_after_override
+
+    logger.info(
+        "Constructed offload configuration",
+        extra={
+            "workers": offload_config.workers,
+            "max_queue": offload_config.max_queue,
+            "timeout": offload_config.timeout,
+            "retry_after": offload_config.retry_after,
+        },
+    )
+
+    return offload_config
+
+
+class SharedBuffer:
+    """Bytes in shared memory, for a pool process to read in place; close() frees them."""
+
+    def __init__(self: Self, size: int) -> None:
+        # Shared memory can't be empty
+        self.shared_memory = SharedMemory(create=True, size=max(size, 1))
+        self.size = size
+
+    @property
+    def name(self: Self) -> str:
+        return self.shared_memory.name
+
+    @property
+    def buffer(self: Self) -> memoryview:
+        assert self.shared_memory.buf is not None
+        return self.shared_memory.buf
+
+    @classmethod
+    def from_file(cls, file: IO[bytes], size: int) -> "SharedBuffer":
+        """Copy size bytes from a file, from its current position."""
+        shared = cls(size)
+        try:
+            offset = 0
+            while offset < size:
+                chunk = shared.buffer[offset : min(offset + COPY_CHUNK_SIZE, size)]
+                count = file.readinto(chunk)  # type: ignore[attr-defined]
+                if not count:
+                    raise ValueError(f"File ended after {offset} of {size} bytes")
+                offset += count
+        except Exception:
+            shared.close()
+            raise
+        return shared
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SharedBuffer":
+        shared = cls(len(data))
+        shared.buffer[: len(data)] = data
+        return shared
+
+    def close(self: Self) -> None:
+        self.shared_memory.close()
+        try:
+            self.shared_memory.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self: Self) -> Self:
+        return self
+
+    def __exit__(self: Self, *args: Any) -> None:
+        self.close()
+
+
+@contextmanager
+def attach(name: str, size: int) -> Generator[memoryview, None, None]:
+    """Read a SharedBuffer, by name, in place; for use in a pool process."""
+    shared_memory = SharedMemory(name=name)
+    assert shared_memory.buf is not None
+    view = shared_memory.buf[:size]
+    try:
+        yield view
+    finally:
+        # The view must be released before the shared memory can be closed.
+        view.release()
+        shared_memory.close()
+
+
+def raise_timeout(signum: int, frame: Optional[FrameType]) -> None:
+    raise TaskTimeout()
+
+
+def run_task(timeout: float, function: Callable[..., T], *args: Any) -> Tuple[float, T]:
+    """Run function in a pool process, raising TaskTimeout after timeout seconds.
+
+    Returns the seconds it took, with its result.
+    """
+    start = time.perf_counter()
+    previous = signal.signal(signal.SIGALRM, raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = function(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+    return time.perf_counter() - start, result
+
+
+class OffloadPool:
+    def __init__(self: Self, name: str, config: OffloadConfig) -> None:
+        self.name = name
+        self.config = config
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self: Self) -> int:
+        """Tasks running or waiting for a process."""
+        return self._in_flight
+
+    def stats(self: Self) -> Dict[str, float]:
+        running = min(self._in_flight, self.config.workers)
+        return {
+            "running": running,
+            "queued": self._in_flight - running,
+            "utilization": running / self.config.workers,
+        }
+
+    def get_executor(self: Self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            method = (
+                "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            )
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.config.workers, mp_context=multiprocessing.get_context(method)
+            )
+            logger.info(
+                "Started offload pool",
+                extra={"pool": self.name, "workers": self.config.workers, "start_method": method},
+            )
+        return self._executor
+
+    def submit(self: Self, function: Callable[..., T], *args: Any) -> "Future[Tuple[float, T]]":
+        """Run function(*args) in a pool process; raises PoolFull when the queue is full.
+
+        function and its arguments must be picklable: a module-level function, and small
+        arguments (put large ones in a SharedBuffer).
+        """
+        with self._lock:
+            if self._in_flight >= self.config.workers + self.config.max_queue:
+                TASKS.inc(pool=self.name, result="rejected")
+                raise PoolFull(self.name, self.config.retry_after)
+            self._in_flight += 1
+            executor = self.get_executor()
+            try:
+                future = executor.submit(run_task, self.config.timeout, function, *args)
+            except Exception as exception:
+                self._in_flight -= 1
+                if isinstance(exception, BrokenProcessPool):
+                    TASKS.inc(pool=self.name, result="broken")
+                    self._discard_executor(executor)
+                raise
+        future.add_done_callback(functools.partial(self._task_done, executor))
+        return future
+
+    def _discard_executor(self: Self, executor: ProcessPoolExecutor) -> None:
+        """Drop a broken executor, for the next task to start a new one. Call with _lock held."""
+        if self._executor is executor:
+            self._executor = None
+            logger.warning("Offload pool is broken; replacing it", extra={"pool": self.name})
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _task_done(
+        self: Self, executor: ProcessPoolExecutor, future: "Future[Tuple[float, Any]]"
+    ) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                self._discard_executor(executor)
+        if future.cancelled():
+            TASKS.inc(pool=self.name, result="cancelled")
+            return
+        exception = future.exception()
+        if isinstance(exception, TaskTimeout):
+            TASKS.inc(pool=self.name, result="timeout")
+        elif isinstance(exception, BrokenProcessPool):
+            TASKS.inc(pool=self.name, result="broken")
+        elif exception is not None:
+            TASKS.inc(pool=self.name, result="error")
+        else:
+            seconds, _result = future.result()
+            TASKS.inc(pool=self.name, result="ok")
+            TASK_SECONDS.observe(seconds, pool=self.name)
+
+    async def run(self: Self, function: Callable[..., T], *args: Any) -> T:
+        """Run function(*args) in a pool process and wait for its result.
+
+        Raises PoolFull when the queue is full, TaskTimeout when it takes too long,
+        BrokenProcessPool when a pool process died, and whatever function raised.
+        """
+        future = self.submit(function, *args)
+        try:
+            _seconds, result = await asyncio.wait_for(
+                asyncio.wrap_future(future), self.config.timeout + TIMEOUT_GRACE
+            )
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise TaskTimeout()
+        return result
+
+    def shutdown(self: Self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+_pools: Dict[str, OffloadPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: str = "cpu") -> OffloadPool:
+    """The process's pool with this name, created on first use (processes start on first task)."""
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = OffloadPool(name, get_config())
+    return pool
+
+
+def _pool_gauge(field: str) -> Any:
+    return lambda: {
+        metrics.label_key({"pool": name}): pool.stats()[field] for name, pool in _pools.items()
+    }
+
+
+metrics.gauge("offload_pool_running", "Offloaded tasks running", _pool_gauge("running"))
+metrics.gauge("offload_pool_queued", "Offloaded tasks waiting for a process", _pool_gauge("queued"))
+metrics.gauge(
+    "offload_pool_utilization",
+    "Fraction of the pool's processes running a task",
+    _pool_gauge("utilization"),
+)
+
+
+def forget_pools_after_fork() -> None:
+    """A forked child can't use its parent's pool processes; it starts its own when needed."""
+    _pools.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=forget_pools_after_fork)
@@ -0,0 +1,101 @@
+#
+# Local checks of uploaded photos, run in the offload pool (see focus_api.utils.offload).
+#
+# Photos are read from shared memory in place. Those sent base64 encoded by older clients are
+# decoded here too, off the request's worker, as decoding a photo is as CPU-heavy as checking it.
+#
+# The checks are a first pass before the external Photo Quality Service: a photo is valid when it
+# is a JPEG or PNG image. Its dimensions (when its header has them) and SHA-256 digest are
+# returned for logging.
+#
+
+import base64
+import binascii
+import hashlib
+import struct
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from focus_api.utils.offload import attach
+
+# As in focus_api.utils.uploads, which isn't imported so that pool processes don't import connexion
+MAGIC_NUMBERS = {
+    "image/jpeg": b"\xff\xd8\xff",
+    "image/png": b"\x89PNG\r\n\x1a\n",
+}
+
+# JPEG start-of-frame markers, which hold the image's dimensions
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class SharedPhoto(NamedTuple):
+    """A photo in a SharedBuffer, as passed to the pool."""
+
+    name: str
+    buffer_name: str
+    size: int
+    # Sent as base64 text, to be decoded before checking
+    base64_encoded: bool = False
+
+
+def get_content_type(data: bytes | memoryview) -> Optional[str]:
+    for content_type, magic in MAGIC_NUMBERS.items():
+        if bytes(data[: len(magic)]) == magic:
+            return content_type
+    return None
+
+
+def get_png_dimensions(data: bytes | memoryview) -> Optional[Tuple[int, int]]:
+    # The IHDR chunk comes first: length, type, then width and height.
+    if len(data) < 24 or bytes(data[12:16]) != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", data[16:24])
+    return width, height
+
+
+def get_jpeg_dimensions(data: bytes | memoryview) -> Optional[Tuple[int, int]]:
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        (length,) = struct.unpack(">H", data[offset + 2 : offset + 4])
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[offset + 5 : offset + 9])
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def check_photo(data: bytes | memoryview) -> Dict[str, Any]:
+    content_type = get_content_type(data)
+    dimensions = None
+    if content_type == "image/png":
+        dimensions = get_png_dimensions(data)
+    elif content_type == "image/jpeg":
+        dimensions = get_jpeg_dimensions(data)
+
+    return {
+        "isValid": content_type is not None,
+        "contentType": content_type,
+        "width": dimensions[0] if dimensions else None,
+        "height": dimensions[1] if dimensions else None,
+        "size": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+
+
+def check_photos(photos: List[SharedPhoto]) -> Dict[str, Dict[str, Any]]:
+    """Check each photo; a base64 photo which doesn't decode gets an "error" instead."""
+    results = {}
+    for photo in photos:
+        with attach(photo.buffer_name, photo.size) as data:
+            if not photo.base64_encoded:
+                results[photo.name] = check_photo(data)
+                continue
+            try:
+                decoded = base64.b64decode(data, validate=True)
+            except binascii.Error:
+                results[photo.name] = {"error": "invalid_base64"}
+                continue
+        results[photo.name] = check_photo(decoded)
+    return results
@@ -0,0 +1,279 @@
+#
+# Opt-in profiling of individual requests.
+#
+# To find where a slow route spends its time under real traffic, requests can be profiled and the
+# profiles written to PROFILE_DIR, one file per request, named after the operationId and request
+# id (the X-Request-ID header, or a generated one):
+#
+#   20260101T120000-focus_api.controllers.address-6ddcf443d1bf4acd.collapsed
+#
+# A request is profiled when
+#
+# - it has an X-Profile-Token header matching PROFILE_TOKEN, to profile a request on demand; or
+# - it is picked at random, for a PROFILE_SAMPLE_RATE fraction of requests.
+#
+# PROFILE_FORMAT selects the profiler:
+#
+# - "collapsed" (the default): a sampling profiler. A thread records the request thread's stack
+#   every PROFILE_INTERVAL_MS milliseconds, and the file has one line per distinct stack with the
+#   number of samples ("module:function;module:function 12"), ready for flamegraph.pl or
+#   speedscope. The overhead is small and doesn't depend on how many calls the request makes.
+# - "pstats": cProfile, for exact call counts, loadable with pstats.Stats. It slows the request
+#   down considerably, and from Python 3.12 only one cProfile can run in a process at a time (and
+#   it sees every thread), so requests arriving while one runs aren't profiled.
+#
+# At most PROFILE_MAX_CONCURRENT requests are profiled at once, and none once the files in
+# PROFILE_DIR add up to PROFILE_MAX_DISK_MB; delete old profiles to make room.
+#
+# Only requests handled by Flask (sync controllers) are profiled.
+#
+
+import cProfile
+import datetime
+import hmac
+import os
+import random
+import sys
+import threading
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from types import FrameType
+from typing import Any, Mapping, Optional, Self, Union
+
+from werkzeug.datastructures import Headers
+
+from focus_api.utils import metrics
+from focus_api.utils.env import get_float_env, get_int_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+PROFILES = metrics.counter(
+    "request_profiles_total", "Requests profiled, or skipped at a limit, by result"
+)
+
+COLLAPSED = "collapsed"
+PSTATS = "pstats"
+
+TOKEN_HEADER = "X-Profile-Token"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+@dataclass
+class ProfilingConfig:
+    # Where profiles are written; profiling is off without one
+    directory: Optional[str] = None
+    # Fraction of requests profiled at random
+    sample_rate: float = 0.0
+    # Requests with this in the X-Profile-Token header are profiled; None to disable the header
+    token: Optional[str] = None
+    format: str = COLLAPSED
+    # Milliseconds between stack samples, for the collapsed format
+    interval_ms: float = 5
+    max_concurrent: int = 1
+    max_disk_mb: float = 100
+
+    @property
+    def enabled(self: Self) -> bool:
+        return self.directory is not None and (self.sample_rate > 0 or self.token is not None)
+
+
+def get_config() -> ProfilingConfig:
+    profiling_config = ProfilingConfig(
+        directory=os.getenv("PROFILE_DIR") or None, token=os.getenv("PROFILE_TOKEN") or None
+    )
+
+    sample_rate_override = get_float_env("PROFILE_SAMPLE_RATE")
+    if sample_rate_override is not None:
+        profiling_config.sample_rate = sample_rate_override
+
+    format_override = os.getenv("PROFILE_FORMAT")
+    if format_override in (COLLAPSED, PSTATS):
+        profiling_config.format = format_override
+
+    interval_override = get_float_env("PROFILE_INTERVAL_MS")
+    if interval_override is not None:
+        profiling_config.interval_ms = interval_override
+
+    max_concurrent_override = get_int_env("PROFILE_MAX_CONCURRENT")
+    if max_concurrent_override is not None:
+        profiling_config.max_concurrent = max_concurrent_override
+
+    max_disk_override = get_float_env("PROFILE_MAX_DISK_MB")
+    if max_disk_override is not None:
+        profiling_config.max_disk_mb = max_disk_override
+
+    logger.info(
+        "Constructed profiling configuration",
+        extra={
+            "directory": profiling_config.directory,
+            "sample_rate": profiling_config.sample_rate,
+            "token_set": profiling_config.token is not None,
+            "format": profiling_config.format,
+            "max_concurrent": profiling_config.max_concurrent,
+            "max_disk_mb": profiling_config.max_disk_mb,
+        },
+    )
+
+    return profiling_config
+
+
+def frame_name(frame: FrameType) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class StackSampler:
+    """Samples a thread's stack at an interval, counting each distinct stack."""
+
+    def __init__(self: Self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="request-profiler", daemon=True)
+
+    def sample(self: Self) -> None:
+        frame: Optional[FrameType] = sys._current_frames().get(self.thread_id)
+        names = []
+        while frame is not None:
+            names.append(frame_name(frame))
+            frame = frame.f_back
+        if names:
+            self.stacks[";".join(reversed(names))] += 1
+
+    def run(self: Self) -> None:
+        while not self._stopping.wait(self.interval):
+            self.sample()
+
+    def start(self: Self) -> None:
+        self._thread.start()
+
+    def stop(self: Self) -> None:
+        self._stopping.set()
+        self._thread.join()
+
+    def write(self: Self, path: str) -> None:
+        with open(path, "w") as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f"{stack} {count}\n")
+
+
+class Profile:
+    """A request being profiled."""
+
+    def __init__(
+        self: Self, config: ProfilingConfig, operation_id: str, request_id: str, reason: str
+    ) -> None:
+        self.operation_id = operation_id
+        self.request_id = request_id
+        self.reason = reason
+        self.format = config.format
+        self.profiler: Any = None
+        if config.format == PSTATS:
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = StackSampler(threading.get_ident(), config.interval_ms / 1000)
+
+    def start(self: Self) -> None:
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self: Self) -> None:
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+
+    def filename(self: Self) -> str:
+        timestamp = datetime.datetime.now(datetime.UTC).strftime("%Y%m%dT%H%M%S")
+        request_id = "".join(c for c in self.request_id if c.isalnum() or c in "-_")[:64]
+        return f"{timestamp}-{self.operation_id}-{request_id}.{self.format}"
+
+    def write(self: Self, directory: str) -> str:
+        path = os.path.join(directory, self.filename())
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.dump_stats(path)
+        else:
+            self.profiler.write(path)
+        return path
+
+
+class RequestProfiler:
+    def __init__(self: Self, config: ProfilingConfig) -> None:
+        assert config.directory is not None
+        self.config = config
+        self.directory = config.directory
+        self._slots = threading.BoundedSemaphore(config.max_concurrent)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def should_profile(self: Self, headers: Union[Headers, Mapping[str, str]]) -> Optional[str]:
+        """Why a request with these headers is to be profiled ("header" or "sampled"), or None."""
+        token = headers.get(TOKEN_HEADER)
+        if (
+            token is not None
+            and self.config.token is not None
+            and hmac.compare_digest(token.encode(), self.config.token.encode())
+        ):
+            return "header"
+        if self.config.sample_rate > 0 and random.random() < self.config.sample_rate:
+            return "sampled"
+        return None
+
+    def disk_usage(self: Self) -> int:
+        with os.scandir(self.directory) as entries:
+            return sum(entry.stat().st_size for entry in entries if entry.is_file())
+
+    def start(
+        self: Self, operation_id: str, headers: Union[Headers, Mapping[str, str]]
+    ) -> Optional[Profile]:
+        """Start profiling the current request, if it's picked and the limits allow."""
+        reason = self.should_profile(headers)
+        if reason is None:
+            return None
+
+        if not self._slots.acquire(blocking=False):
+            PROFILES.inc(result="skipped_concurrency")
+            return None
+        if self.disk_usage() >= self.config.max_disk_mb * 1024 * 1024:
+            self._slots.release()
+            PROFILES.inc(result="skipped_disk")
+            logger.warning("Profile directory is full", extra={"directory": self.directory})
+            return None
+
+        request_id = headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        profile = Profile(self.config, operation_id, request_id, reason)
+        try:
+            profile.start()
+        except ValueError:
+            # Another cProfile is already running in this process.
+            self._slots.release()
+            PROFILES.inc(result="skipped_concurrency")
+            return None
+        return profile
+
+    def finish(self: Self, profile: Profile) -> None:
+        try:
+            profile.stop()
+            path = profile.write(self.directory)
+            PROFILES.inc(result=profile.reason)
+            logger.info(
+                "Wrote request profile",
+                extra={
+                    "operation_id": profile.operation_id,
+                    "request_id": profile.request_id,
+                    "reason": profile.reason,
+                    "path": path,
+                },
+            )
+        except Exception:
+            logger.exception("Unable to write request profile")
+        finally:
+            self._slots.release()
+
+
+def create_profiler(config: ProfilingConfig) -> Optional[RequestProfiler]:
+    """A RequestProfiler, or None when profiling isn't enabled."""
+    return RequestProfiler(config) if config.enabled else None
@@ -0,0 +1,287 @@
+#
+# Prometheus text exposition of focus_api.utils.metrics, across gunicorn workers.
+#
+# Each worker process has its own metrics registry, and a scrape of /metrics is served by whichever
+# worker accepts it. So that a scrape covers every worker, set METRICS_DIR to a directory shared by
+# the workers of one server (and emptied when the server starts). Each process then writes its
+# samples to METRICS_DIR/metrics-<pid>-<random id>.json every METRICS_WRITE_INTERVAL seconds, and
+# /metrics adds up the files:
+#
+# - counters and histograms include every file, so totals don't go backwards when a worker is
+#   recycled;
+# - gauges (in-flight requests, pool occupancy) only include processes that are still running.
+#
+# So that the directory doesn't grow with every recycled worker, a scrape folds the counters and
+# histograms of exited processes into METRICS_DIR/metrics-retired.json and removes their files.
+# The random id keeps a new process which reuses a PID from overwriting an exited one's file.
+#
+# Without METRICS_DIR only the serving process's own metrics are exposed.
+#
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from focus_api.utils import metrics
+from focus_api.utils.env import get_float_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# (kind, description, {(sample name, labels): value})
+MetricFamily = Tuple[str, str, Dict[Tuple[str, metrics.LabelKey], float]]
+
+RETIRED_FILENAME = "metrics-retired.json"
+LOCK_FILENAME = "metrics.lock"
+
+_writer_lock = threading.Lock()
+_writer_pid: Optional[int] = None
+# This process's metrics file, named on first write
+_filename: Optional[str] = None
+
+
+def get_metrics_dir() -> Optional[str]:
+    return os.getenv("METRICS_DIR") or None
+
+
+def get_write_interval() -> float:
+    interval = get_float_env("METRICS_WRITE_INTERVAL")
+    return interval if interval is not None else 5
+
+
+def collect_local() -> Dict[str, Any]:
+    """This process's metrics, in the form written to METRICS_DIR."""
+    return {
+        "pid": os.getpid(),
+        "metrics": [
+            {
+                "name": metric.name,
+                "kind": metric.kind,
+                "description": metric.description,
+                "samples": [[name, list(key), value] for name, key, value in metric.collect()],
+            }
+            for metric in metrics.get_metrics()
+        ],
+    }
+
+
+def get_filename() -> str:
+    global _filename
+
+    if _filename is None:
+        _filename = f"metrics-{os.getpid()}-{uuid.uuid4().hex[:12]}.json"
+    return _filename
+
+
+def write_file(path: str, data: Dict[str, Any]) -> None:
+    # Write to a temporary file and rename, so readers never see a partly written file.
+    with tempfile.NamedTemporaryFile(
+        "w", dir=os.path.dirname(path), delete=False
+    ) as temporary_file:
+        json.dump(data, temporary_file, separators=(",", ":"))
+    os.replace(temporary_file.name, path)
+
+
+def write_local(metrics_dir: str) -> None:
+    write_file(os.path.join(metrics_dir, get_filename()), collect_local())
+
+
+def is_metrics_file(filename: str) -> bool:
+    return filename.startswith("metrics-") and filename.endswith(".json")
+
+
+def read_file(metrics_dir: str, filename: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(metrics_dir, filename)) as metrics_file:
+            data: Dict[str, Any] = json.load(metrics_file)
+        return data
+    except (OSError, ValueError):
+        logger.warning("Skipping unreadable metrics file", extra={"filename": filename})
+        return None
+
+
+def merge_totals(retired: Dict[str, Any], process: Dict[str, Any]) -> None:
+    """Add a process's counters and histograms to the retired totals; gauges are dropped."""
+    retired_metrics = {metric["name"]: metric for metric in retired["metrics"]}
+    for metric in process["metrics"]:
+        if metric["kind"] == "gauge":
+            continue
+        retired_metric = retired_metrics.get(metric["name"])
+        if retired_metric is None:
+            retired_metric = retired_metrics[metric["name"]] = {**metric, "samples": []}
+            retired["metrics"].append(retired_metric)
+        totals = {(name, json.dumps(key)): value for name, key, value in retired_metric["samples"]}
+        for name, key, value in metric["samples"]:
+            sample_key = (name, json.dumps(key))
+            totals[sample_key] = totals.get(sample_key, 0) + value
+        retired_metric["samples"] = [
+            [name, json.loads(key), value] for (name, key), value in totals.items()
+        ]
+
+
+def retire_exited(metrics_dir: str) -> None:
+    """Fold the files of processes which have exited into the retired file, and remove them."""
+    with open(os.path.join(metrics_dir, LOCK_FILENAME), "a") as lock_file:
+        # One process at a time, so that no file is folded in twice.
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        retired_path = os.path.join(metrics_dir, RETIRED_FILENAME)
+        retired = read_file(metrics_dir, RETIRED_FILENAME) if os.path.exists(retired_path) else None
+        if retired is None:
+            retired = {"pid": None, "metrics": [], "merged": []}
+
+        filenames = set(os.listdir(metrics_dir))
+        # Files already folded in, but not removed before the process doing it died
+        merged = set(retired["merged"]) & filenames
+        exited = {}
+        for filename in filenames - merged:
+            if not is_metrics_file(filename) or filename in (RETIRED_FILENAME, get_filename()):
+                continue
+            data = read_file(metrics_dir, filename)
+            if data is not None and not is_running(data["pid"]):
+                exited[filename] = data
+        if not exited and not merged:
+            return
+
+        for data in exited.values():
+            merge_totals(retired, data)
+        retired["merged"] = sorted(merged | exited.keys())
+        write_file(retired_path, retired)
+        for filename in retired["merged"]:
+            try:
+                os.remove(os.path.join(metrics_dir, filename))
+            except FileNotFoundError:
+                pass
+
+
+def read_all(metrics_dir: str) -> List[Dict[str, Any]]:
+    """Metrics written by every process, with this process's read fresh."""
+    write_local(metrics_dir)
+    retire_exited(metrics_dir)
+    collected = []
+    for filename in os.listdir(metrics_dir):
+        if is_metrics_file(filename):
+            data = read_file(metrics_dir, filename)
+            if data is not None:
+                collected.append(data)
+    return collected
+
+
+def clear_metrics_dir() -> None:
+    """Remove the metrics files in METRICS_DIR, if set; call when the server starts."""
+    metrics_dir = get_metrics_dir()
+    if metrics_dir is None or not os.path.isdir(metrics_dir):
+        return
+    for filename in os.listdir(metrics_dir):
+        if is_metrics_file(filename) or filename == LOCK_FILENAME:
+            try:
+                os.remove(os.path.join(metrics_dir, filename))
+            except FileNotFoundError:
+                pass
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def aggregate(collected: List[Dict[str, Any]]) -> Dict[str, MetricFamily]:
+    """Add up the samples of each metric across processes."""
+    families: Dict[str, MetricFamily] = {}
+    for process in collected:
+        pid = process["pid"]
+        running = pid is not None and (pid == os.getpid() or is_running(pid))
+        for metric in process["metrics"]:
+            if metric["kind"] == "gauge" and not running:
+                continue
+            _kind, _description, samples = families.setdefault(
+                metric["name"], (metric["kind"], metric["description"], {})
+            )
+            for name, key, value in metric["samples"]:
+                sample_key = (name, tuple((k, v) for k, v in key))
+                samples[sample_key] = samples.get(sample_key, 0) + value
+    return families
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(families: Dict[str, MetricFamily]) -> str:
+    lines = []
+    for family_name in sorted(families):
+        kind, description, samples = families[family_name]
+        lines.append(f"# HELP {family_name} {escape(description)}")
+        lines.append(f"# TYPE {family_name} {kind}")
+        for (name, key), value in samples.items():
+            labels = ",".join(f'{k}="{escape(v)}"' for k, v in key)
+            sample = f"{name}{{{labels}}}" if labels else name
+            lines.append(f"{sample} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_latest() -> str:
+    """Render the metrics of this process, or of every worker when METRICS_DIR is set."""
+    metrics_dir = get_metrics_dir()
+    if metrics_dir is None:
+        return render(aggregate([collect_local()]))
+    return render(aggregate(read_all(metrics_dir)))
+
+
+def start_writer() -> None:
+    """Periodically write this process's metrics to METRICS_DIR, if it is set.
+
+    Safe to call more than once; a forked child starts its own writer when called again.
+    """
+    global _writer_pid
+
+    metrics_dir = get_metrics_dir()
+    if metrics_dir is None:
+        return
+
+    with _writer_lock:
+        if _writer_pid == os.getpid():
+            return
+        _writer_pid = os.getpid()
+
+    os.makedirs(metrics_dir, exist_ok=True)
+    interval = get_write_interval()
+
+    def run() -> None:
+        while True:
+            try:
+                write_local(metrics_dir)
+            except OSError:
+                logger.exception("Unable to write metrics", extra={"metrics_dir": metrics_dir})
+            time.sleep(interval)
+
+    threading.Thread(target=run, name="metrics-writer", daemon=True).start()
+
+
+def restart_writer_after_fork() -> None:
+    global _writer_pid, _filename
+
+    # The child writes its own file.
+    _filename = None
+    if _writer_pid is not None:
+        _writer_pid = None
+        start_writer()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_writer_after_fork)
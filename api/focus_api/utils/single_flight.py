@@ -0,0 +1,129 @@
+#
+# Coalescing of concurrent identical calls ("single flight").
+#
+# When several requests in a worker need the same result at the same moment (a double-clicked
+# button, a client retrying), SingleFlight runs the call once: the first caller for a key runs
+# it, and callers arriving while it is in flight wait for and share its result, or its exception.
+# A thread waits no longer than its own request's deadline (see focus_api.utils.deadline), then
+# raises TimeoutError.
+#
+# do() is for threads and do_async() for coroutines; each keeps its own set of in-flight calls, so
+# a thread and a coroutine asking for the same key at once each make a call.
+#
+# With a cache (a TTLCache from focus_api.utils.cache), successful results are also kept for the
+# cache's ttl, so identical calls arriving just after are answered without a call. Keep the ttl
+# short: a few seconds is enough to absorb retries.
+#
+# Calls are counted in single_flight_calls_total by name and result: "call" when made, "shared"
+# when another caller's call was waited for, and "cached".
+#
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Self, TypeVar
+
+from focus_api.utils import deadline, metrics
+from focus_api.utils.cache import MISSING, TTLCache
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = metrics.counter(
+    "single_flight_calls_total",
+    "Coalesced calls, by name and result (call, shared or cached)",
+)
+
+
+class Call:
+    """A call in flight, which callers for the same key wait on."""
+
+    def __init__(self: Self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.exception: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self: Self, name: str, cache: Optional[TTLCache] = None) -> None:
+        self.name = name
+        self.cache = cache
+        self._calls: Dict[str, Call] = {}
+        self._lock = threading.Lock()
+        # Futures belong to an event loop, so coroutines' calls are kept per loop.
+        self._async_calls: Dict[asyncio.AbstractEventLoop, Dict[str, "asyncio.Future[Any]"]] = {}
+
+    def cached(self: Self, key: str) -> Any:
+        if self.cache is None:
+            return MISSING
+        result = self.cache.get(key)
+        if result is not MISSING:
+            SINGLE_FLIGHT_CALLS.inc(name=self.name, result="cached")
+        return result
+
+    def do(self: Self, key: str, function: Callable[[], T]) -> T:
+        """Return function(), sharing one call between concurrent callers with the same key."""
+        result = self.cached(key)
+        if result is not MISSING:
+            return result
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = Call()
+
+        if not leader:
+            SINGLE_FLIGHT_CALLS.inc(name=self.name, result="shared")
+            if not call.done.wait(deadline.remaining()):
+                raise TimeoutError(f"Request deadline passed waiting for {self.name}")
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        SINGLE_FLIGHT_CALLS.inc(name=self.name, result="call")
+        try:
+            call.result = function()
+            if self.cache is not None:
+                self.cache.set(key, call.result)
+            return call.result
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self: Self, key: str, function: Callable[[], Awaitable[T]]) -> T:
+        """Return await function(), sharing one call between concurrent coroutines with a key."""
+        result = self.cached(key)
+        if result is not MISSING:
+            return result
+
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.setdefault(loop, {})
+        future = calls.get(key)
+        if future is not None:
+            SINGLE_FLIGHT_CALLS.inc(name=self.name, result="shared")
+            # shield, so a waiter being cancelled doesn't cancel the call for everyone else
+            return await asyncio.shield(future)
+
+        SINGLE_FLIGHT_CALLS.inc(name=self.name, result="call")
+        future = calls[key] = loop.create_future()
+        try:
+            result = await function()
+            if self.cache is not None:
+                self.cache.set(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved, in case no one else was waiting.
+            future.exception()
+            raise
+        finally:
+            del calls[key]
+            if not calls:
+                self._async_calls.pop(loop, None)
@@ -0,0 +1,145 @@
+#
+# Precompiled OpenAPI specification cache.
+#
+# Loading openapi.yaml is the most expensive part of create_app(): the YAML is parsed with the
+# pure-Python loader, the whole document is validated against the OpenAPI schema and then every
+# $ref is resolved. Every gunicorn worker (and every create_app() in the tests) used to repeat this.
+#
+# load_specification() does it once per version of the file and pickles the resulting connexion
+# Specification, keyed by a hash of openapi.yaml and the connexion version. Later loads unpickle it
+# without parsing YAML or re-validating. The cache can be built ahead of time, e.g. in the image:
+#
+#   OPENAPI_CACHE_DIR=/app/.openapi_cache python -m focus_api.utils.spec_cache
+#
+# or is written on first boot, by default to focus_api/.openapi_cache. A cache that can't be read
+# or written is ignored.
+#
+# Unpickling runs code, so anyone able to write the cache could run code in the API: it is never
+# kept in a shared temporary directory, and is only loaded when both the cache directory and file
+# are owned by the user running the API and writable by no one else.
+#
+# connexion only accepts a path, URL or dict in add_api, all of which are re-loaded, so add_api()
+# here registers an already loaded Specification instead.
+#
+
+import dataclasses
+import hashlib
+import os
+import pickle
+import stat
+import sys
+import tempfile
+from importlib.metadata import version
+from typing import Any, Optional
+
+import connexion  # type: ignore
+from connexion.middleware.main import API  # type: ignore
+from connexion.spec import Specification  # type: ignore
+
+from focus_api.utils import metrics
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+SPEC_CACHE_LOADS = metrics.counter(
+    "openapi_spec_cache_loads_total", "OpenAPI spec loads (result: hit or miss)"
+)
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".openapi_cache"
+)
+
+
+def get_cache_dir() -> str:
+    return os.getenv("OPENAPI_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def is_private(status: os.stat_result) -> bool:
+    """Whether a file or directory is owned by this process's user, and writable only by it."""
+    return status.st_uid == os.getuid() and not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def read_cache(cache_dir: str, cache_path: str) -> Optional[Specification]:
+    """Unpickle a cached Specification; None when there is none, or it can't be trusted."""
+    try:
+        if not is_private(os.stat(cache_dir)):
+            logger.warning("Ignoring OpenAPI spec cache directory writable by others")
+            return None
+        # Checked on the opened file, so that it can't be swapped after the check.
+        cache_fd = os.open(cache_path, os.O_RDONLY | os.O_NOFOLLOW)
+    except FileNotFoundError:
+        return None
+    with os.fdopen(cache_fd, "rb") as cache_file:
+        if not is_private(os.fstat(cache_fd)):
+            logger.warning(
+                "Ignoring OpenAPI spec cache writable by others", extra={"path": cache_path}
+            )
+            return None
+        specification: Specification = pickle.load(cache_file)
+    return specification
+
+
+def spec_cache_key(specification_path: str) -> str:
+    """Hash of the spec file, and of the connexion version which produced the pickled object."""
+    digest = hashlib.sha256()
+    with open(specification_path, "rb") as specification_file:
+        digest.update(specification_file.read())
+    digest.update(version("connexion").encode())
+    return digest.hexdigest()
+
+
+def load_specification(specification_path: str, cache_dir: Optional[str] = None) -> Specification:
+    """Load a resolved and validated Specification, from the cache if possible."""
+    cache_dir = cache_dir if cache_dir is not None else get_cache_dir()
+    cache_path = os.path.join(cache_dir, f"openapi-{spec_cache_key(specification_path)}.pickle")
+
+    try:
+        cached = read_cache(cache_dir, cache_path)
+        if cached is not None:
+            SPEC_CACHE_LOADS.inc(result="hit")
+            return cached
+    except Exception:
+        logger.warning("Ignoring unreadable OpenAPI spec cache", extra={"path": cache_path})
+
+    SPEC_CACHE_LOADS.inc(result="miss")
+    specification = Specification.load(specification_path)
+
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        # Write to a temporary file and rename, so concurrently booting workers never read a
+        # partly written cache.
+        with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as temporary_file:
+            pickle.dump(specification, temporary_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_file.name, cache_path)
+        logger.info("Wrote OpenAPI spec cache", extra={"path": cache_path})
+    except OSError:
+        logger.warning("Unable to write OpenAPI spec cache", extra={"path": cache_path})
+
+    return specification
+
+
+def add_api(app: connexion.FlaskApp, specification: Specification, **kwargs: Any) -> None:
+    """Register an already loaded Specification, as app.add_api does for a spec file."""
+    middleware = app.middleware
+    if middleware.middleware_stack is not None:
+        raise RuntimeError("Cannot add api after an application has started")
+
+    option_names = {option.name for option in dataclasses.fields(middleware.options) if option.init}
+    options = middleware.options.replace(
+        **{name: value for name, value in kwargs.items() if name in option_names}
+    )
+    extra_kwargs = {name: value for name, value in kwargs.items() if name not in option_names}
+    base_path = extra_kwargs.pop("base_path", None)
+
+    middleware.apis.append(
+        API(specification, base_path=base_path, **options.__dict__, **extra_kwargs)
+    )
+
+
+if __name__ == "__main__":
+    # Build the cache for the given spec files, or the API's own spec.
+    from focus_api.app import get_specification_path
+
+    for path in sys.argv[1:] or [get_specification_path()]:
+        load_specification(path)
@@ -0,0 +1,38 @@
+#
+# Startup timing.
+#
+# StartupTimer records how long each phase of create_app() takes and logs them as a single line,
+# so slow worker boots can be traced to the phase responsible.
+#
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Generator, Self
+
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class StartupTimer:
+    def __init__(self: Self) -> None:
+        self.start = time.perf_counter()
+        # phase name => milliseconds, in the order the phases ran
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self: Self, name: str) -> Generator[None, None, None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = 1000 * (time.perf_counter() - start)
+
+    def report(self: Self) -> Dict[str, float]:
+        """Log the duration of each phase and the total, in milliseconds."""
+        timings = {**self.phases, "total": 1000 * (time.perf_counter() - self.start)}
+        logger.info(
+            "Startup timing",
+            extra={f"{name}_ms": round(duration, 1) for name, duration in timings.items()},
+        )
+        return timings
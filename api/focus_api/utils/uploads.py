@@ -0,0 +1,251 @@
+#
+# Streaming multipart/form-data uploads.
+#
+# connexion's own multipart validator keeps every message of the request body in memory so it can
+# replay the body to the application, which then parses it a second time. For large uploads (e.g.
+# photos) that means several copies of the file in memory per request.
+#
+# StreamingMultiPartValidator instead parses the body as it arrives. Each file part is written to
+# a SpooledTemporaryFile (in memory up to SPOOL_MAX_SIZE, then on disk), and is validated chunk by
+# chunk against its schema:
+#
+# - `maxLength` caps the size of the part in bytes; the request is rejected with a 413 as soon as
+#   the cap is passed, without reading the rest of the body.
+# - `x-content-types` lists the allowed media types; both the part's Content-Type header and the
+#   leading "magic" bytes of the data are checked.
+#
+# Once validated, the parts are available to the controller via get_uploads(). The body itself is
+# not replayed downstream.
+#
+
+from dataclasses import dataclass
+from tempfile import SpooledTemporaryFile
+from typing import IO, Any, Dict, List, Optional, Self, Tuple
+
+from connexion import context  # type: ignore
+from connexion.exceptions import BadRequestProblem, ProblemException  # type: ignore
+from connexion.validators import MultiPartFormDataValidator  # type: ignore
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import Receive, Scope
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header  # type: ignore
+
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Parts are held in memory up to this size, then rolled over to a temporary file on disk.
+SPOOL_MAX_SIZE = 1024 * 1024
+# Maximum size of a non-file form field.
+MAX_FIELD_SIZE = 64 * 1024
+# Key in the ASGI scope "extensions" where validated uploads are stored for the controller.
+UPLOADS_EXTENSION = "focus_api_uploads"
+
+# Leading bytes identifying common media types, used to check that file data matches its
+# declared Content-Type.
+MAGIC_NUMBERS: Dict[str, Tuple[bytes, ...]] = {
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+}
+MAGIC_LENGTH = 8
+
+
+@dataclass
+class Upload:
+    """A file received in a request, spooled to memory or disk."""
+
+    name: str
+    filename: Optional[str]
+    content_type: Optional[str]
+    size: int
+    file: IO[bytes]
+
+    def close(self: Self) -> None:
+        self.file.close()
+
+
+def is_file_schema(schema: Dict[str, Any]) -> bool:
+    return schema.get("type") == "string" and schema.get("format") in ("binary", "base64")
+
+
+def check_magic(content_type: str, data: bytes) -> bool:
+    """Check that data starts with the magic number of content_type, when one is known."""
+    magic_numbers = MAGIC_NUMBERS.get(content_type)
+    return magic_numbers is None or data.startswith(magic_numbers)
+
+
+def payload_too_large(detail: str) -> ProblemException:
+    return ProblemException(status=413, title="Payload Too Large", detail=detail)
+
+
+class MultipartReader:
+    """Callbacks for MultipartParser which spool and validate each part as it is parsed."""
+
+    def __init__(self: Self, schema: Dict[str, Any], strict_validation: bool) -> None:
+        self.properties: Dict[str, Any] = schema.get("properties", {})
+        self.strict_validation = strict_validation
+        self.uploads: Dict[str, Upload] = {}
+        self.fields: Dict[str, str] = {}
+
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._name = ""
+        self._filename: Optional[str] = None
+        self._content_type: Optional[str] = None
+        self._max_size = MAX_FIELD_SIZE
+        self._allowed_types: List[str] = []
+        self._size = 0
+        self._head = b""
+        self._file: Optional[IO[bytes]] = None
+        self._field_data = bytearray()
+
+    def callbacks(self: Self) -> Any:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self: Self) -> None:
+        self._headers = {}
+        self._size = 0
+        self._head = b""
+        self._file = None
+        self._field_data = bytearray()
+
+    def on_header_field(self: Self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self: Self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self: Self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self: Self) -> None:
+        _disposition, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name")
+        if name is None:
+            raise BadRequestProblem(detail="Multipart part without a name")
+        self._name = name.decode("latin-1")
+        filename = options.get(b"filename")
+        self._filename = filename.decode("latin-1") if filename is not None else None
+        content_type = self._headers.get(b"content-type")
+        self._content_type = content_type.decode("latin-1") if content_type else None
+
+        if self._name in self.uploads or self._name in self.fields:
+            raise BadRequestProblem(detail=f"Duplicate part '{self._name}'")
+
+        schema = self.properties.get(self._name)
+        if schema is None:
+            if self.strict_validation:
+                raise BadRequestProblem(detail=f"Extra formData parameter '{self._name}'")
+            schema = {}
+
+        if is_file_schema(schema):
+            self._max_size = schema.get("maxLength", SPOOL_MAX_SIZE)
+            self._allowed_types = schema.get("x-content-types", [])
+            if self._allowed_types and self._content_type not in self._allowed_types:
+                raise BadRequestProblem(
+                    detail=f"'{self._name}' must be one of {', '.join(self._allowed_types)}"
+                )
+            self._file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        else:
+            self._max_size = MAX_FIELD_SIZE
+            self._allowed_types = []
+
+    def on_part_data(self: Self, data: bytes, start: int, end: int) -> None:
+        chunk = data[start:end]
+        self._size += len(chunk)
+        if self._size > self._max_size:
+            raise payload_too_large(f"'{self._name}' exceeds {self._max_size} bytes")
+
+        if self._file is None:
+            self._field_data += chunk
+            return
+
+        if len(self._head) < MAGIC_LENGTH:
+            self._head += chunk[: MAGIC_LENGTH - len(self._head)]
+            if len(self._head) == MAGIC_LENGTH:
+                self.check_content()
+        self._file.write(chunk)
+
+    def on_part_end(self: Self) -> None:
+        if self._file is None:
+            self.fields[self._name] = self._field_data.decode("utf-8", errors="replace")
+            return
+
+        if len(self._head) < MAGIC_LENGTH:
+            self.check_content()
+        self._file.seek(0)
+        self.uploads[self._name] = Upload(
+            name=self._name,
+            filename=self._filename,
+            content_type=self._content_type,
+            size=self._size,
+            file=self._file,
+        )
+
+    def check_content(self: Self) -> None:
+        if self._allowed_types and not check_magic(self._content_type or "", self._head):
+            raise BadRequestProblem(
+                detail=f"'{self._name}' content does not match type {self._content_type}"
+            )
+
+    def close(self: Self) -> None:
+        if self._file is not None and self._name not in self.uploads:
+            self._file.close()
+        for upload in self.uploads.values():
+            upload.close()
+
+
+class StreamingMultiPartValidator(MultiPartFormDataValidator):
+    """Request body validator which streams multipart/form-data parts to spooled files."""
+
+    async def wrap_receive(self: Self, receive: Receive, *, scope: Scope) -> Tuple[Receive, Scope]:
+        headers = Headers(scope=scope)
+        _content_type, options = parse_options_header(headers.get("content-type", ""))
+        boundary = options.get(b"boundary")
+        if not boundary:
+            raise BadRequestProblem(detail="Missing multipart boundary")
+
+        reader = MultipartReader(self._schema, self._strict_validation)
+        parser = MultipartParser(boundary, reader.callbacks())
+        try:
+            more_body = True
+            while more_body:
+                message = await receive()
+                more_body = message.get("more_body", False)
+                parser.write(message.get("body", b""))
+            parser.finalize()
+
+            # Validate required fields and field values against the schema. File contents have
+            # already been checked, so are represented by a placeholder.
+            self._validate({**reader.fields, **{name: "" for name in reader.uploads}})
+        except Exception:
+            reader.close()
+            raise
+
+        scope.setdefault("extensions", {})[UPLOADS_EXTENSION] = reader.uploads
+
+        # The body has been consumed; the application receives an empty one.
+        MutableHeaders(scope=scope)["content-length"] = "0"
+        receive = self._insert_messages(
+            receive, messages=[{"type": "http.request", "body": b"", "more_body": False}]
+        )
+        return receive, scope
+
+
+def get_uploads() -> Optional[Dict[str, Upload]]:
+    """Get the files uploaded with the current multipart request, or None for other requests."""
+    return context.scope.get("extensions", {}).get(UPLOADS_EXTENSION)
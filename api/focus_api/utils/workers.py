@@ -0,0 +1,212 @@
+#
+# Sizing and recycling of server worker processes, for focus_api.gunicorn_config.
+#
+# Workers: one per usable CPU, since each worker runs an event loop and its Flask threads spend
+# most of their time waiting on Postgres and external services. "Usable" is what the process may
+# actually run on: the CPUs in its affinity mask, capped by a cgroup CPU quota (a container limit
+# of 1.5 CPUs is 2 workers, not one per CPU of the host).
+#
+# Each worker holds its own connection pools (see focus_api.db.config), so with DB_MAX_CONNECTIONS
+# set to the Postgres connections this server may use, the workers are capped so that
+#
+#   workers * connections_per_worker(db_config) <= DB_MAX_CONNECTIONS
+#
+# Threads: connexion runs Flask controllers on a thread pool in each worker. More threads than
+# the worker's sync pool has connections (pool_size + max_overflow) would only wait for a
+# connection, so that's the default.
+#
+# Recycling: a worker is restarted after max_requests requests (plus up to max_requests_jitter,
+# so that workers don't all restart at once), and, with max_rss_mb, when its resident memory goes
+# over that many megabytes, as checked every rss_check_interval seconds by an RssMonitor.
+#
+# Environment variable overrides: WEB_CONCURRENCY (workers), APP_THREADS, DB_MAX_CONNECTIONS,
+# WORKER_MAX_REQUESTS, WORKER_MAX_REQUESTS_JITTER, WORKER_MAX_RSS_MB and
+# WORKER_RSS_CHECK_INTERVAL.
+#
+
+import math
+import os
+import resource
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Self, cast
+
+from focus_api.db.config import DbConfig
+from focus_api.utils import metrics
+from focus_api.utils.env import get_float_env, get_int_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+RSS_RESTARTS = metrics.counter(
+    "worker_rss_restarts_total", "Workers restarted for going over the resident memory limit"
+)
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+@dataclass
+class WorkerConfig:
+    workers: int
+    # Threads running Flask controllers in each worker
+    threads: int
+    # Requests after which a worker is restarted; 0 to never restart
+    max_requests: int = 10000
+    max_requests_jitter: int = 1000
+    # Resident memory, in megabytes, over which a worker is restarted; None for no limit
+    max_rss_mb: Optional[float] = None
+    rss_check_interval: float = 10
+
+
+def read_cgroup_cpu_limit() -> Optional[float]:
+    """The CPUs allowed by the cgroup's quota, or None without a quota."""
+    try:
+        with open(CGROUP_V2_CPU_MAX) as cpu_max:
+            quota, period = cpu_max.read().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open(CGROUP_V1_CPU_QUOTA) as quota_file, open(CGROUP_V1_CPU_PERIOD) as period_file:
+            quota_us = int(quota_file.read())
+            period_us = int(period_file.read())
+        return quota_us / period_us if quota_us > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def usable_cpus() -> int:
+    """CPUs this process may run on: its affinity mask, capped by the cgroup CPU quota."""
+    # See focus_api.utils.logging.init for the cast.
+    if "sched_getaffinity" in dir(os):
+        cpus = len(cast(Any, os).sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    cgroup_limit = read_cgroup_cpu_limit()
+    if cgroup_limit is not None:
+        cpus = min(cpus, math.ceil(cgroup_limit))
+    return max(1, cpus)
+
+
+def connections_per_worker(db_config: DbConfig) -> int:
+    """Postgres connections one worker may hold at most.
+
+    The sync and async engines each have a pool of pool_size + max_overflow, and the health
+    prober has one connection of its own.
+    """
+    return 2 * (db_config.pool_size + db_config.max_overflow) + 1
+
+
+def size_workers(cpus: int, db_config: DbConfig, max_connections: Optional[int] = None) -> int:
+    workers = cpus
+    if max_connections is not None:
+        workers = min(workers, max_connections // connections_per_worker(db_config))
+        if workers < 1:
+            logger.warning(
+                "DB_MAX_CONNECTIONS is too small for one worker",
+                extra={
+                    "max_connections": max_connections,
+                    "connections_per_worker": connections_per_worker(db_config),
+                },
+            )
+    return max(1, workers)
+
+
+def get_config(db_config: DbConfig) -> WorkerConfig:
+    cpus = usable_cpus()
+    max_connections = get_int_env("DB_MAX_CONNECTIONS")
+
+    worker_config = WorkerConfig(
+        workers=get_int_env("WEB_CONCURRENCY") or size_workers(cpus, db_config, max_connections),
+        threads=get_int_env("APP_THREADS") or db_config.pool_size + db_config.max_overflow,
+    )
+
+    max_requests_override = get_int_env("WORKER_MAX_REQUESTS")
+    if max_requests_override is not None:
+        worker_config.max_requests = max_requests_override
+
+    max_requests_jitter_override = get_int_env("WORKER_MAX_REQUESTS_JITTER")
+    if max_requests_jitter_override is not None:
+        worker_config.max_requests_jitter = max_requests_jitter_override
+
+    max_rss_override = get_float_env("WORKER_MAX_RSS_MB")
+    if max_rss_override is not None:
+        worker_config.max_rss_mb = max_rss_override
+
+    rss_check_interval_override = get_float_env("WORKER_RSS_CHECK_INTERVAL")
+    if rss_check_interval_override is not None:
+        worker_config.rss_check_interval = rss_check_interval_override
+
+    logger.info(
+        "Constructed worker configuration",
+        extra={
+            "usable_cpus": cpus,
+            "max_connections": max_connections,
+            "connections_per_worker": connections_per_worker(db_config),
+            "workers": worker_config.workers,
+            "threads": worker_config.threads,
+            "max_requests": worker_config.max_requests,
+            "max_requests_jitter": worker_config.max_requests_jitter,
+            "max_rss_mb": worker_config.max_rss_mb,
+        },
+    )
+
+    return worker_config
+
+
+def get_rss_bytes() -> int:
+    """This process's current resident memory, or its peak where that isn't available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssMonitor:
+    """Calls on_exceeded, once, when the process's resident memory goes over a limit."""
+
+    def __init__(
+        self: Self, max_rss_mb: float, interval: float, on_exceeded: Callable[[int], None]
+    ) -> None:
+        self.max_rss_bytes = int(max_rss_mb * 1024 * 1024)
+        self.interval = interval
+        self.on_exceeded = on_exceeded
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="rss-monitor", daemon=True)
+
+    def check(self: Self) -> bool:
+        """Whether the limit was exceeded; on_exceeded has then been called."""
+        rss_bytes = get_rss_bytes()
+        if rss_bytes <= self.max_rss_bytes:
+            return False
+
+        RSS_RESTARTS.inc()
+        logger.warning(
+            "Worker resident memory over limit, restarting",
+            extra={
+                "pid": os.getpid(),
+                "rss_mb": round(rss_bytes / 1024 / 1024, 1),
+                "max_rss_mb": round(self.max_rss_bytes / 1024 / 1024, 1),
+            },
+        )
+        self.on_exceeded(rss_bytes)
+        return True
+
+    def run(self: Self) -> None:
+        while not self._stopping.wait(self.interval):
+            if self.check():
+                return
+
+    def start(self: Self) -> None:
+        self._thread.start()
+
+    def stop(self: Self) -> None:
+        self._stopping.set()
@@ -0,0 +1,254 @@
+#
+# The job worker, which runs the jobs queued by the API (see focus_api.db.jobs):
+#
+#   python -m focus_api.worker
+#
+# Run it alongside the API, as its own process or container, on the same database. Each worker
+# runs up to JOB_CONCURRENCY jobs at once in threads (jobs mostly wait on external services), and
+# claims at most JOB_BATCH_SIZE at a time, only as many as it has threads free. When the queue is
+# empty it polls every JOB_POLL_INTERVAL seconds. Throughput scales with the number of workers
+# rather than API workers: add worker processes (each a connection pool of JOB_CONCURRENCY + 1)
+# until the external services or the database are the limit.
+#
+# A job whose handler raises is retried after JOB_RETRY_BASE_SECONDS, doubling with each attempt
+# up to JOB_RETRY_MAX_SECONDS (with jitter, so that jobs failed by the same outage don't all retry
+# together), until it has been attempted max_attempts times; a PermanentJobError fails it straight
+# away. Jobs left running longer than JOB_STALE_AFTER seconds, by a worker that died, are claimed
+# again, so a job's handler must be safe to run more than once.
+#
+# SIGTERM or SIGINT stops claiming jobs, and exits once those running have finished.
+#
+# Metrics (exported with the API's when METRICS_DIR is shared, see focus_api.utils.prometheus):
+# jobs finished by kind and result, and their run time.
+#
+
+import dataclasses
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import FrameType
+from typing import Any, Callable, Dict, Optional, Self
+
+from sqlalchemy.engine import Engine
+
+from focus_api.db import create_engine, jobs
+from focus_api.db.config import get_config as get_db_config
+from focus_api.db.jobs import DEFAULT_QUEUE, Job, PermanentJobError
+from focus_api.utils import logging, metrics, prometheus
+from focus_api.utils.env import get_float_env, get_int_env
+from focus_api.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+Handler = Callable[[Job], Dict[str, Any]]
+
+JOBS_FINISHED = metrics.counter("jobs_finished_total", "Job attempts finished, by kind and result")
+JOB_SECONDS = metrics.histogram("job_seconds", "Time job attempts took, by kind")
+
+
+@dataclass
+class JobWorkerConfig:
+    queue: str = DEFAULT_QUEUE
+    # Jobs run at once
+    concurrency: int = 4
+    # Most jobs claimed by one query
+    batch_size: int = 10
+    # Seconds between polls of an empty queue
+    poll_interval: float = 1.0
+    # Seconds before the first retry of a failed job, doubling for each further attempt
+    retry_base_seconds: float = 5.0
+    retry_max_seconds: float = 600.0
+    # Seconds after which a running job is assumed abandoned and claimed again
+    stale_after: float = 300.0
+
+
+def get_config() -> JobWorkerConfig:
+    worker_config = JobWorkerConfig(queue=os.getenv("JOB_QUEUE", DEFAULT_QUEUE))
+
+    concurrency_override = get_int_env("JOB_CONCURRENCY")
+    if concurrency_override is not None:
+        worker_config.concurrency = max(1, concurrency_override)
+
+    batch_size_override = get_int_env("JOB_BATCH_SIZE")
+    if batch_size_override is not None:
+        worker_config.batch_size = max(1, batch_size_override)
+
+    poll_interval_override = get_float_env("JOB_POLL_INTERVAL")
+    if poll_interval_override is not None:
+        worker_config.poll_interval = poll_interval_override
+
+    retry_base_override = get_float_env("JOB_RETRY_BASE_SECONDS")
+    if retry_base_override is not None:
+        worker_config.retry_base_seconds = retry_base_override
+
+    retry_max_override = get_float_env("JOB_RETRY_MAX_SECONDS")
+    if retry_max_override is not None:
+        worker_config.retry_max_seconds = retry_max_override
+
+    stale_after_override = get_float_env("JOB_STALE_AFTER")
+    if stale_after_override is not None:
+        worker_config.stale_after = stale_after_override
+
+    logger.info("Constructed job worker configuration", extra=dataclasses.asdict(worker_config))
+
+    return worker_config
+
+
+def retry_delay(attempts: int, base: float, maximum: float) -> float:
+    """Seconds to wait before the next attempt of a job attempted this many times."""
+    delay = min(maximum, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def get_handlers() -> Dict[str, Handler]:
+    """The handler of each kind of job."""
+    # Imported here, as the controllers import the app and its dependencies.
+    from focus_api.controllers.application import submit_photo
+    from focus_api.controllers.payment import process_payment
+
+    return {"payment": process_payment, "photo": submit_photo}
+
+
+class JobWorker:
+    def __init__(
+        self: Self,
+        engine: Engine,
+        handlers: Dict[str, Handler],
+        config: JobWorkerConfig,
+        name: Optional[str] = None,
+    ) -> None:
+        self.engine = engine
+        self.handlers = handlers
+        self.config = config
+        # Recorded on the jobs it claims
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = ThreadPoolExecutor(config.concurrency, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._running = 0
+        # Set to stop waiting for the next poll: on stopping, or when a thread is freed
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    @property
+    def running(self: Self) -> int:
+        return self._running
+
+    def run_once(self: Self) -> int:
+        """Claim as many due jobs as there are threads free, up to a batch, and start them.
+
+        Returns the number of jobs claimed.
+        """
+        free = self.config.concurrency - self._running
+        if free <= 0:
+            return 0
+        with self.engine.connect() as connection:
+            claimed = jobs.dequeue(
+                connection,
+                self.name,
+                min(free, self.config.batch_size),
+                queue=self.config.queue,
+                stale_after=self.config.stale_after,
+            )
+        for job in claimed:
+            with self._lock:
+                self._running += 1
+            self._executor.submit(self.process, job)
+        return len(claimed)
+
+    def process(self: Self, job: Job) -> None:
+        """Run a claimed job's handler, and record its result or schedule its retry."""
+        start = time.perf_counter()
+        extra = {"job_id": str(job.id), "kind": job.kind, "attempts": job.attempts}
+        try:
+            handler = self.handlers.get(job.kind)
+            if handler is None:
+                raise PermanentJobError(f"No handler for jobs of kind {job.kind}")
+            result = handler(job)
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}"
+            if isinstance(exception, PermanentJobError) or job.attempts >= job.max_attempts:
+                logger.warning("Job failed", extra=extra, exc_info=True)
+                self.record(
+                    job, "failed", lambda connection: jobs.fail(connection, job, self.name, error)
+                )
+            else:
+                delay = retry_delay(
+                    job.attempts, self.config.retry_base_seconds, self.config.retry_max_seconds
+                )
+                logger.info("Job will be retried", extra={**extra, "delay": delay}, exc_info=True)
+                self.record(
+                    job,
+                    "retried",
+                    lambda connection: jobs.retry(connection, job, self.name, error, delay),
+                )
+        else:
+            logger.info("Job succeeded", extra=extra)
+            self.record(
+                job,
+                "succeeded",
+                lambda connection: jobs.complete(connection, job, self.name, result),
+            )
+        finally:
+            JOB_SECONDS.observe(time.perf_counter() - start, kind=job.kind)
+            with self._lock:
+                self._running -= 1
+            self._wake.set()
+
+    def record(self: Self, job: Job, result: str, update: Callable[[Any], None]) -> None:
+        JOBS_FINISHED.inc(kind=job.kind, result=result)
+        try:
+            with self.engine.connect() as connection:
+                update(connection)
+        except Exception:
+            # The job stays running, and is claimed again once stale.
+            logger.exception("Failed to record job result", extra={"job_id": str(job.id)})
+
+    def run(self: Self) -> None:
+        """Run jobs until stop() is called, then wait for those running to finish."""
+        logger.info(
+            "Job worker started",
+            extra={"worker": self.name, "queue": self.config.queue},
+        )
+        while not self._stopping.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception:
+                logger.exception("Failed to dequeue jobs")
+                claimed = 0
+            # A full batch suggests more are due; otherwise wait for the next poll, or a free
+            # thread.
+            if claimed < self.config.batch_size:
+                self._wake.wait(self.config.poll_interval)
+                self._wake.clear()
+        self._executor.shutdown(wait=True)
+        logger.info("Job worker stopped", extra={"worker": self.name})
+
+    def stop(self: Self) -> None:
+        self._stopping.set()
+        self._wake.set()
+
+
+def main() -> None:
+    logging.init("focus_api.worker")
+    config = get_config()
+    db_config = get_db_config()
+    # One connection per job thread, and one for claiming jobs
+    engine = create_engine(
+        dataclasses.replace(db_config, pool_size=max(db_config.pool_size, config.concurrency + 1)),
+        name="jobs",
+    )
+    worker = JobWorker(engine, get_handlers(), config)
+
+    def stop(signum: int, frame: Optional[FrameType]) -> None:
+        logger.info("Stopping job worker", extra={"signal": signal.Signals(signum).name})
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    prometheus.start_writer()
+    worker.run()
@@ -0,0 +1,3 @@
+from focus_api.worker import main
+
+main()
@@ -0,0 +1,205 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Self
+
+import pytest
+import requests
+from focus_api.clients import CircuitOpenError, get_session
+from focus_api.clients.config import ServiceConfig, get_config
+from focus_api.clients.session import OUTBOUND_REQUEST_ERRORS, ServiceSession
+from focus_api.utils.deadline import Deadline, current_deadline
+
+
+class Service(ThreadingHTTPServer):
+    """A local service answering with the queued statuses, then 200, each after delay seconds."""
+
+    def __init__(self: Self) -> None:
+        super().__init__(("127.0.0.1", 0), ServiceHandler)
+        self.statuses: List[int] = []
+        self.delay = 0.0
+        self.requests = 0
+        self.connections: set[int] = set()
+
+    @property
+    def base_url(self: Self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: Service
+
+    def do_GET(self: Self) -> None:
+        self.server.requests += 1
+        self.server.connections.add(self.client_address[1])
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        time.sleep(self.server.delay)
+        body = self.path.encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self: Self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def service() -> Iterator[Service]:
+    server = Service()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_session(service: Service, **kwargs: object) -> ServiceSession:
+    config = ServiceConfig(
+        name="test", base_url=service.base_url, backoff_factor=0, backoff_jitter=0
+    )
+    for name, value in kwargs.items():
+        setattr(config, name, value)
+    return ServiceSession(config)
+
+
+class TestServiceSession:
+
+    def test_relative_urls_use_base_url(self: Self, service: Service) -> None:
+        with make_session(service) as session:
+            response = session.get("/addresses")
+
+        assert response.status_code == 200
+        assert response.text == "/addresses"
+
+    def test_connections_are_kept_alive(self: Self, service: Service) -> None:
+        with make_session(service) as session:
+            for _ in range(3):
+                session.get("/addresses")
+
+        assert service.requests == 3
+        assert len(service.connections) == 1
+
+    def test_unavailable_responses_are_retried(self: Self, service: Service) -> None:
+        service.statuses = [503, 503]
+        with make_session(service, retries=2) as session:
+            response = session.get("/addresses")
+
+        assert response.status_code == 200
+        assert service.requests == 3
+
+    def test_circuit_opens_after_consecutive_failures(self: Self, service: Service) -> None:
+        service.statuses = [500, 500]
+        errors = OUTBOUND_REQUEST_ERRORS.get(service="test", error="500")
+        with make_session(service, circuit_failure_threshold=2) as session:
+            session.get("/addresses")
+            session.get("/addresses")
+            with pytest.raises(CircuitOpenError):
+                session.get("/addresses")
+
+        assert service.requests == 2
+        assert OUTBOUND_REQUEST_ERRORS.get(service="test", error="500") == errors + 2
+
+    def test_circuit_closes_after_successful_trial(self: Self, service: Service) -> None:
+        service.statuses = [500]
+        with make_session(service, circuit_failure_threshold=1, circuit_reset_timeout=0) as session:
+            session.get("/addresses")
+            response = session.get("/addresses")
+
+        assert response.status_code == 200
+        assert session.circuit_breaker.state == "closed"
+
+    def test_failed_trial_reopens_circuit(
+        self: Self, service: Service, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        service.statuses = [500]
+        with make_session(service, circuit_failure_threshold=1, circuit_reset_timeout=0) as session:
+            session.get("/addresses")
+            assert session.circuit_breaker.state == "open"
+
+            def send(*args: object, **kwargs: object) -> None:
+                raise ValueError("not a requests error")
+
+            monkeypatch.setattr(session, "send", send)
+            with pytest.raises(ValueError):
+                session.get("/addresses")
+
+        assert session.circuit_breaker.state == "open"
+
+    def test_connection_errors_are_counted(self: Self, service: Service) -> None:
+        with make_session(service, retries=0) as session:
+            service.shutdown()
+            service.server_close()
+            with pytest.raises(requests.ConnectionError):
+                session.get("/addresses")
+
+        assert session.circuit_breaker.failures == 1
+
+    def test_timeouts_are_limited_to_deadline(self: Self, service: Service) -> None:
+        token = current_deadline.set(Deadline(500))
+        try:
+            with make_session(service, connect_timeout=0.1, read_timeout=10) as session:
+                connect_timeout, read_timeout = session.limit_timeout((0.1, 10))
+                response = session.get("/addresses")
+        finally:
+            current_deadline.reset(token)
+
+        assert connect_timeout == 0.1
+        assert 0.3 < read_timeout <= 0.4
+        assert response.status_code == 200
+
+    def test_retries_stop_at_deadline(self: Self, service: Service) -> None:
+        service.statuses = [503, 503]
+        service.delay = 0.4
+        token = current_deadline.set(Deadline(1000))
+        start = time.monotonic()
+        try:
+            with make_session(service, retries=2, read_timeout=10) as session:
+                with pytest.raises(requests.Timeout):
+                    session.get("/addresses")
+        finally:
+            current_deadline.reset(token)
+
+        assert time.monotonic() - start <= 1.0
+        assert service.requests == 1
+
+    def test_retries_which_fit_the_deadline_are_made(self: Self, service: Service) -> None:
+        service.statuses = [503, 503]
+        token = current_deadline.set(Deadline(5000))
+        try:
+            with make_session(service, retries=2, connect_timeout=0.1, read_timeout=1) as session:
+                response = session.get("/addresses")
+        finally:
+            current_deadline.reset(token)
+
+        assert response.status_code == 200
+        assert service.requests == 3
+
+    def test_passed_deadline_fails_without_calling(self: Self, service: Service) -> None:
+        token = current_deadline.set(Deadline(0))
+        try:
+            with make_session(service) as session:
+                with pytest.raises(requests.Timeout):
+                    session.get("/addresses")
+        finally:
+            current_deadline.reset(token)
+
+        assert service.requests == 0
+
+
+class TestClients:
+
+    def test_config_from_environment(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("USPS_BASE_URL", "http://usps.test")
+        monkeypatch.setenv("USPS_POOL_MAXSIZE", "4")
+        monkeypatch.setenv("USPS_READ_TIMEOUT", "2.5")
+
+        config = get_config("usps")
+
+        assert config.base_url == "http://usps.test"
+        assert config.pool_maxsize == 4
+        assert config.read_timeout == 2.5
+
+    def test_sessions_are_shared(self: Self) -> None:
+        assert get_session("eligibility") is get_session("eligibility")
@@ -0,0 +1,201 @@
+import importlib
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Self
+from urllib.parse import parse_qsl, urlparse
+
+import connexion  # type: ignore
+import pytest
+from focus_api.clients import close_sessions
+from focus_api.utils.address import address_key, normalize_address
+from focus_api.utils.cache import CACHE_LOOKUPS, MISSING, TieredCache, TTLCache
+
+address_controller = importlib.import_module("focus_api.controllers.address")
+
+URL = "/v1/addresses/validate"
+ADDRESS = {
+    "address1": "123 Main Street",
+    "address2": "Apartment 1",
+    "city": "Richmond",
+    "state": "VA",
+    "zip": "23220",
+    "country": "US",
+}
+USPS_ADDRESS = {
+    "streetAddress": "123 MAIN ST",
+    "secondaryAddress": "APT 1",
+    "city": "RICHMOND",
+    "state": "VA",
+    "ZIPCode": "23220",
+    "ZIPPlus4": "1234",
+}
+
+
+class Usps(ThreadingHTTPServer):
+    def __init__(self: Self) -> None:
+        super().__init__(("127.0.0.1", 0), UspsHandler)
+        self.queries: List[Dict[str, str]] = []
+        self.status = 200
+
+
+class UspsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: Usps
+
+    def do_GET(self: Self) -> None:
+        self.server.queries.append(dict(parse_qsl(urlparse(self.path).query)))
+        body = json.dumps({"address": USPS_ADDRESS}).encode()
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self: Self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def usps(monkeypatch: pytest.MonkeyPatch) -> Iterator[Usps]:
+    server = Usps()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("USPS_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("USPS_RETRIES", "0")
+    monkeypatch.setattr(address_controller, "_cache", None)
+    close_sessions()
+    yield server
+    close_sessions()
+    server.shutdown()
+    server.server_close()
+
+
+class TestAddressNormalization:
+
+    def test_spellings_of_an_address_normalize_the_same(self: Self) -> None:
+        respelled = {
+            **ADDRESS,
+            "address1": " 123  main st. ",
+            "address2": "apt 1",
+            "city": "RICHMOND",
+            "zip": "23220-1234",
+        }
+
+        assert normalize_address(respelled) == normalize_address(ADDRESS)
+        assert address_key(respelled) == address_key(ADDRESS)
+
+    def test_different_addresses_have_different_keys(self: Self) -> None:
+        assert address_key({**ADDRESS, "address2": "Apt 2"}) != address_key(ADDRESS)
+
+    def test_unit_numbers(self: Self) -> None:
+        assert normalize_address({"address2": "#4"})["address2"] == "APT 4"
+
+
+class TestTTLCache:
+
+    def test_least_recently_used_is_evicted(self: Self) -> None:
+        cache = TTLCache("test", maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is MISSING
+        assert cache.get("c") == 3
+
+    def test_expired_entries_are_missing(self: Self) -> None:
+        cache = TTLCache("test", ttl=0)
+        cache.set("a", 1)
+
+        assert cache.get("a") is MISSING
+        assert len(cache) == 0
+
+    def test_shared_hits_fill_memory(self: Self) -> None:
+        shared = TTLCache("shared")
+        shared.set("a", 1)
+        cache = TieredCache(TTLCache("test"), shared)
+
+        assert cache.get("a") == 1
+        assert cache.memory.get("a") == 1
+
+
+class TestAddressValidation:
+
+    def test_suggestion_from_usps(self: Self, usps: Usps, test_client: connexion.FlaskApp) -> None:
+        response = test_client.post(URL, json=ADDRESS)
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["matches"] is True
+        assert data["supplied"] == ADDRESS
+        assert data["suggested"] == {
+            "address1": "123 MAIN ST",
+            "address2": "APT 1",
+            "city": "RICHMOND",
+            "state": "VA",
+            "zip": "23220-1234",
+            "country": "US",
+        }
+        assert usps.queries == [
+            {
+                "streetAddress": "123 Main Street",
+                "secondaryAddress": "Apartment 1",
+                "city": "Richmond",
+                "state": "VA",
+                "ZIPCode": "23220",
+            }
+        ]
+
+    def test_respelled_address_is_cached(
+        self: Self, usps: Usps, test_client: connexion.FlaskApp
+    ) -> None:
+        hits = CACHE_LOOKUPS.get(cache="address", tier="memory", result="hit")
+
+        test_client.post(URL, json=ADDRESS)
+        response = test_client.post(URL, json={**ADDRESS, "address1": "123 MAIN ST."})
+
+        assert response.json()["data"]["supplied"]["address1"] == "123 MAIN ST."
+        assert len(usps.queries) == 1
+        assert CACHE_LOOKUPS.get(cache="address", tier="memory", result="hit") == hits + 1
+
+    def test_no_match(self: Self, usps: Usps, test_client: connexion.FlaskApp) -> None:
+        usps.status = 404
+
+        response = test_client.post(URL, json=ADDRESS)
+
+        assert response.status_code == 200
+        assert response.json()["data"]["matches"] is False
+        assert response.json()["data"]["suggested"] is None
+
+    def test_usps_unavailable_is_not_cached(
+        self: Self, usps: Usps, test_client: connexion.FlaskApp
+    ) -> None:
+        usps.status = 503
+        response = test_client.post(URL, json=ADDRESS)
+        assert response.status_code == 503
+
+        usps.status = 200
+        response = test_client.post(URL, json=ADDRESS)
+        assert response.status_code == 200
+        assert len(usps.queries) == 2
+
+    @pytest.mark.usefixtures("schema")
+    def test_postgres_tier_is_shared(
+        self: Self,
+        usps: Usps,
+        test_client: connexion.FlaskApp,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setenv("ADDRESS_CACHE_POSTGRES", "true")
+        # A new address each run, as the shared tier outlives the test
+        address = {**ADDRESS, "address2": f"Suite {uuid.uuid4().hex}"}
+
+        test_client.post(URL, json=address)
+        # Another worker, with an empty in-process cache
+        monkeypatch.setattr(address_controller, "_cache", None)
+        response = test_client.post(URL, json=address)
+
+        assert response.json()["data"]["suggested"]["address1"] == "123 MAIN ST"
+        assert len(usps.queries) == 1
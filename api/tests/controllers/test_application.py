@@ -0,0 +1,148 @@
+import asyncio
+import base64
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Self
+
+import connexion  # type: ignore
+import pytest
+from focus_api.controllers import application
+from focus_api.utils.offload import PoolFull
+
+PHOTO_URL = "/v1/application/6ddcf443-d1bf-4acd-83cc-b1f2d0dc2369/photo"
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2048
+
+
+@pytest.mark.usefixtures("schema")
+class TestPhoto:
+
+    def test_multipart_upload(self: Self, test_client: connexion.FlaskApp) -> None:
+        response = test_client.post(PHOTO_URL, files={"photo1": ("photo.png", PNG, "image/png")})
+        assert response.status_code == 200
+        assert response.json()["data"]["status"] == {"isValid": None}
+
+    def test_multipart_upload_rejects_mismatched_content(
+        self: Self, test_client: connexion.FlaskApp
+    ) -> None:
+        response = test_client.post(
+            PHOTO_URL, files={"photo1": ("photo.png", b"GIF89a" + PNG, "image/png")}
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == "'photo1' content does not match type image/png"
+
+    def test_multipart_upload_rejects_disallowed_type(
+        self: Self, test_client: connexion.FlaskApp
+    ) -> None:
+        response = test_client.post(PHOTO_URL, files={"photo1": ("photo.gif", PNG, "image/gif")})
+        assert response.status_code == 400
+
+    def test_multipart_upload_enforces_size_cap(
+        self: Self, test_client: connexion.FlaskApp
+    ) -> None:
+        too_large = PNG + b"\x00" * 10 * 1024 * 1024
+        response = test_client.post(
+            PHOTO_URL, files={"photo1": ("photo.png", too_large, "image/png")}
+        )
+        assert response.status_code == 413
+
+    def test_multipart_upload_rejects_extra_parts(
+        self: Self, test_client: connexion.FlaskApp
+    ) -> None:
+        response = test_client.post(
+            PHOTO_URL,
+            files={
+                "photo1": ("photo.png", PNG, "image/png"),
+                "photo4": ("photo.png", PNG, "image/png"),
+            },
+        )
+        assert response.status_code == 400
+
+    def test_shared_memory_is_copied_off_the_event_loop(
+        self: Self, test_client: connexion.FlaskApp, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        on_loop: List[str] = []
+
+        def record(function: Callable[..., Any]) -> Callable[..., Any]:
+            def wrapper(*args: Any) -> Any:
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(function.__name__)
+                except RuntimeError:
+                    pass
+                return function(*args)
+
+            return wrapper
+
+        for name in ("get_photos", "read_valid_photos", "close_photos"):
+            monkeypatch.setattr(application, name, record(getattr(application, name)))
+
+        response = test_client.post(PHOTO_URL, files={"photo1": ("photo.png", PNG, "image/png")})
+
+        assert response.status_code == 200
+        assert on_loop == []
+
+    def test_base64_json_upload(self: Self, test_client: connexion.FlaskApp) -> None:
+        response = test_client.post(PHOTO_URL, json={"photo1": base64.b64encode(PNG).decode()})
+        assert response.status_code == 200
+        assert response.json()["data"]["status"] == {"isValid": None}
+
+    def test_invalid_photo_is_not_queued(self: Self, test_client: connexion.FlaskApp) -> None:
+        response = test_client.post(
+            PHOTO_URL, json={"photo1": base64.b64encode(b"GIF89a").decode()}
+        )
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["status"] == {"isValid": False}
+        assert data["jobIds"] == {}
+        assert data["applicationStatus"]["currentStatus"] == "in_progress"
+
+    def test_valid_photos_are_queued_for_submission(
+        self: Self, test_client: connexion.FlaskApp
+    ) -> None:
+        response = test_client.post(
+            PHOTO_URL,
+            files={
+                "photo1": ("photo.png", PNG, "image/png"),
+                "photo2": ("photo.jpg", b"\xff\xd8\xff" + b"\x00" * 16, "image/jpeg"),
+            },
+        )
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["status"] == {"isValid": None}
+        assert data["applicationStatus"]["currentStatus"] == "pending_photo_validation"
+        assert data["jobIds"].keys() == {"photo1", "photo2"}
+
+        job = test_client.get(f"/v1/jobs/{data['jobIds']['photo1']}")
+        assert job.json()["data"]["kind"] == "photo"
+        assert job.json()["data"]["status"] == "pending"
+
+    def test_base64_json_upload_rejects_invalid_base64(
+        self: Self, test_client: connexion.FlaskApp
+    ) -> None:
+        response = test_client.post(PHOTO_URL, json={"photo1": "not base64!"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "'photo1' is not valid base64"
+
+    def test_busy_pool_returns_503_with_retry_after(
+        self: Self, test_client: connexion.FlaskApp, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        class FullPool:
+            async def run(self: Self, *args: Any) -> Any:
+                raise PoolFull("cpu", retry_after=3)
+
+        monkeypatch.setattr(application, "get_pool", FullPool)
+
+        response = test_client.post(PHOTO_URL, files={"photo1": ("photo.png", PNG, "image/png")})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+
+    def test_broken_pool_returns_503(
+        self: Self, test_client: connexion.FlaskApp, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        class BrokenPool:
+            async def run(self: Self, *args: Any) -> Any:
+                raise BrokenProcessPool("A process in the process pool was terminated")
+
+        monkeypatch.setattr(application, "get_pool", BrokenPool)
+
+        response = test_client.post(PHOTO_URL, files={"photo1": ("photo.png", PNG, "image/png")})
+        assert response.status_code == 503
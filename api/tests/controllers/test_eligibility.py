@@ -0,0 +1,77 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List, Self
+
+import connexion  # type: ignore
+import pytest
+from focus_api.clients import close_sessions
+from focus_api.controllers.eligibility import checks
+
+URL = "/v1/eligibility/check"
+
+
+class Eligibility(ThreadingHTTPServer):
+    def __init__(self: Self) -> None:
+        super().__init__(("127.0.0.1", 0), EligibilityHandler)
+        self.bodies: List[Any] = []
+        self.status = 200
+
+
+class EligibilityHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: Eligibility
+
+    def do_POST(self: Self) -> None:
+        self.server.bodies.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+        body = json.dumps({"isEligible": True}).encode()
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self: Self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch: pytest.MonkeyPatch) -> Iterator[Eligibility]:
+    server = Eligibility()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("ELIGIBILITY_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    assert checks.cache is not None
+    checks.cache.clear()
+    close_sessions()
+    yield server
+    close_sessions()
+    server.shutdown()
+    server.server_close()
+
+
+class TestEligibility:
+
+    def test_check(self: Self, service: Eligibility, test_client: connexion.FlaskApp) -> None:
+        response = test_client.post(URL, json={"dateExpires": "2024-05-08"})
+
+        assert response.status_code == 200
+        assert response.json()["data"] == {"isEligible": True}
+        assert service.bodies == [{"dateExpires": "2024-05-08"}]
+
+    def test_repeated_check_is_answered_from_cache(
+        self: Self, service: Eligibility, test_client: connexion.FlaskApp
+    ) -> None:
+        test_client.post(URL, json={"dateExpires": "2024-05-08"})
+        test_client.post(URL, json={"dateExpires": "2024-05-08"})
+        test_client.post(URL, json={"dateExpires": "2024-05-09"})
+
+        assert len(service.bodies) == 2
+
+    def test_service_unavailable(
+        self: Self, service: Eligibility, test_client: connexion.FlaskApp
+    ) -> None:
+        service.status = 500
+
+        response = test_client.post(URL, json={"dateExpires": "2024-05-08"})
+
+        assert response.status_code == 503
@@ -2,6 +2,9 @@ import datetime
 from typing import Self
 
 import connexion  # type: ignore
+import pytest
+from focus_api.db.pool import POOL_CHECKOUTS
+from focus_api.utils import health
 from freezegun import freeze_time
 
 
@@ -21,15 +24,28 @@ class TestHealth:
         }
 
     @freeze_time("2024-07-26")
-    def test_get_health_deep_endpoint(self: Self, test_client: connexion.FlaskApp) -> None:
-        now = datetime.datetime.now(datetime.UTC)
+    def test_get_health_deep_endpoint(
+        self: Self, test_client: connexion.FlaskApp, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # A prober checking only the database, as no external services are configured
+        monkeypatch.setattr(health, "_prober", None)
+        health.get_prober().check_all()
+        checkouts = POOL_CHECKOUTS.get(pool="primary") + POOL_CHECKOUTS.get(pool="primary_async")
+
         response = test_client.get("/v1/health/deep")
         assert response.status_code == 200
-        data = response.json()
-        assert data == {
-            "status": "up",
-            "timestamp": now.isoformat(),
-            "apiName": "api",
-            "apiVersion": "v1",
-            "components": {"db": {"status": "up"}},
+        # Served from the background check's results, without a request-path connection
+        assert (
+            POOL_CHECKOUTS.get(pool="primary") + POOL_CHECKOUTS.get(pool="primary_async")
+            == checkouts
+        )
+        data = response.json()["data"]
+        assert data["status"] == "up"
+        assert data["timestamp"] == "2024-07-26T00:00:00Z"
+        assert data["components"] == {
+            "db": {
+                "status": "up",
+                "latencyMs": data["components"]["db"]["latencyMs"],
+                "lastChecked": "2024-07-26T00:00:00Z",
+            }
         }
@@ -0,0 +1,23 @@
+from typing import Self
+
+import connexion  # type: ignore
+from focus_api.middleware.request_metrics import REQUEST_DURATION
+
+
+class TestMonitoring:
+
+    def test_get_metrics(self: Self, test_client: connexion.FlaskApp) -> None:
+        count = REQUEST_DURATION.get_count(method="GET", route="/v1/health", status="200")
+        test_client.get("/v1/health")
+
+        response = test_client.get("/v1/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE http_request_duration_seconds histogram" in response.text
+        assert (
+            'http_request_duration_seconds_count{method="GET",route="/v1/health",status="200"} '
+            f"{count + 1}\n"
+        ) in response.text
+        assert 'http_requests_in_flight{method="GET",route="/v1/metrics"} 1\n' in response.text
+        assert 'db_pool_checked_out{pool="primary"}' in response.text
@@ -0,0 +1,161 @@
+import dataclasses
+import json
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List, Self
+
+import connexion  # type: ignore
+import pytest
+import requests
+from focus_api.clients import close_sessions
+from focus_api.controllers.payment import process_payment
+from focus_api.db import jobs
+from focus_api.db.jobs import Job, PermanentJobError
+
+URL = "/v1/payment"
+CASE_ID = "6ddcf443-d1bf-4acd-83cc-b1f2d0dc2369"
+
+
+class Processor(ThreadingHTTPServer):
+    def __init__(self: Self) -> None:
+        super().__init__(("127.0.0.1", 0), ProcessorHandler)
+        self.bodies: List[Any] = []
+        self.idempotency_keys: List[str] = []
+        self.status = 200
+        # Seconds to wait after reading the payment, before answering
+        self.delay = 0.0
+
+
+class ProcessorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: Processor
+
+    def do_POST(self: Self) -> None:
+        self.server.bodies.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+        self.server.idempotency_keys.append(self.headers["Idempotency-Key"])
+        time.sleep(self.server.delay)
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self: Self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def processor(monkeypatch: pytest.MonkeyPatch) -> Iterator[Processor]:
+    server = Processor()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("PAYMENT_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    close_sessions()
+    yield server
+    close_sessions()
+    server.shutdown()
+    server.server_close()
+
+
+def payment_job(payload: Any) -> Job:
+    return Job(
+        id=uuid.uuid4(),
+        queue=jobs.DEFAULT_QUEUE,
+        kind="payment",
+        payload=payload,
+        data=None,
+        status=jobs.RUNNING,
+        attempts=1,
+        max_attempts=jobs.DEFAULT_MAX_ATTEMPTS,
+        result=None,
+        created_at=None,  # type: ignore[arg-type]
+        updated_at=None,  # type: ignore[arg-type]
+    )
+
+
+@pytest.mark.usefixtures("schema")
+class TestPayment:
+
+    def test_payment_is_queued(self: Self, test_client: connexion.FlaskApp) -> None:
+        response = test_client.post(URL, json={"caseId": CASE_ID, "eirlIndicator": "eirl"})
+
+        assert response.status_code == 202
+        data = response.json()["data"]
+        assert data["status"] == {
+            "applicationId": CASE_ID,
+            "currentStatus": "pending_payment_received",
+        }
+
+        job = test_client.get(f"/v1/jobs/{data['jobId']}")
+        assert job.status_code == 200
+        assert job.json()["data"]["kind"] == "payment"
+        assert job.json()["data"]["status"] == "pending"
+
+    def test_unknown_job(self: Self, test_client: connexion.FlaskApp) -> None:
+        response = test_client.get(f"/v1/jobs/{uuid.uuid4()}")
+
+        assert response.status_code == 404
+
+    def test_malformed_job_id(self: Self, test_client: connexion.FlaskApp) -> None:
+        response = test_client.get("/v1/jobs/not-a-uuid")
+
+        assert response.status_code == 404
+        assert response.json()["message"] == "Job not found"
+
+    def test_process_payment(self: Self, processor: Processor) -> None:
+        result = process_payment(payment_job({"caseId": CASE_ID}))
+
+        assert result["applicationId"] == CASE_ID
+        assert result["processor"] == "paygov"
+        assert processor.bodies == [{"caseId": CASE_ID}]
+
+    def test_rejected_payment_is_not_retried(self: Self, processor: Processor) -> None:
+        processor.status = 422
+        with pytest.raises(PermanentJobError):
+            process_payment(payment_job({"caseId": CASE_ID}))
+
+        processor.status = 503
+        with pytest.raises(requests.HTTPError):
+            process_payment(payment_job({"caseId": CASE_ID}))
+
+    def test_attempts_send_the_job_id_as_idempotency_key(self: Self, processor: Processor) -> None:
+        job = payment_job({"caseId": CASE_ID})
+        processor.status = 503
+        with pytest.raises(requests.HTTPError):
+            process_payment(job)
+        processor.status = 200
+        process_payment(job)
+
+        assert processor.idempotency_keys == [str(job.id), str(job.id)]
+
+    def test_timeout_after_sending_is_not_retried(
+        self: Self, processor: Processor, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("PAYMENT_READ_TIMEOUT", "0.2")
+        close_sessions()
+        processor.delay = 1
+
+        with pytest.raises(PermanentJobError, match="needs review"):
+            process_payment(payment_job({"caseId": CASE_ID}))
+
+        assert processor.bodies == [{"caseId": CASE_ID}]
+
+    def test_failure_to_connect_is_retried(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        with socket.socket() as unused:
+            unused.bind(("127.0.0.1", 0))
+            monkeypatch.setenv("PAYMENT_BASE_URL", f"http://127.0.0.1:{unused.getsockname()[1]}")
+            monkeypatch.setenv("PAYMENT_RETRIES", "0")
+            close_sessions()
+            try:
+                with pytest.raises(requests.ConnectionError):
+                    process_payment(payment_job({"caseId": CASE_ID}))
+            finally:
+                close_sessions()
+
+    def test_reclaimed_payment_is_not_sent_again(self: Self, processor: Processor) -> None:
+        job = dataclasses.replace(payment_job({"caseId": CASE_ID}), attempts=2, reclaimed=True)
+
+        with pytest.raises(PermanentJobError, match="needs review"):
+            process_payment(job)
+
+        assert processor.bodies == []
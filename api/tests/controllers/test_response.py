@@ -0,0 +1,60 @@
+import json
+from typing import Self
+
+import pytest
+from connexion.context import _receive, _scope  # type: ignore
+from focus_api.controllers.response import MetaData, PagingMetaData, success_response
+from focus_api.db.pagination import Page
+
+
+@pytest.fixture(autouse=True)
+def request_context() -> None:
+    _scope.set({"type": "http", "method": "GET", "path": "/v1/test", "headers": []})
+    _receive.set(None)
+
+
+class TestResponse:
+
+    def test_json_response_matches_api_response(self: Self) -> None:
+        data = {"nested": {"value": 1}, "items": [{"a": None}], "missing": None}
+        body, status_code, _headers = success_response("Success", data).to_api_response()
+
+        response = success_response("Success", data).to_json_response()
+
+        assert response.status_code == status_code
+        assert response.headers["Content-Type"] == "application/json"
+        assert json.loads(response.body) == body
+
+    def test_json_response_sets_request_meta(self: Self) -> None:
+        response = success_response("Success").to_json_response()
+
+        assert json.loads(response.body) == {
+            "statusCode": 200,
+            "message": "Success",
+            "meta": {"resource": "/v1/test", "method": "GET"},
+        }
+
+    def test_paging_meta_from_page(self: Self) -> None:
+        page = Page(
+            items=[],
+            page_size=10,
+            order_by="createdAt",
+            order_direction="desc",
+            cursor=None,
+            next_cursor="abc",
+            total_records=25,
+            total_is_estimate=True,
+        )
+        meta = MetaData(method="GET", resource="/v1/test", paging=PagingMetaData.from_page(page))
+
+        response = success_response("Success", meta=meta).to_json_response()
+
+        assert json.loads(response.body)["meta"]["paging"] == {
+            "pageSize": 10,
+            "totalRecords": 25,
+            "totalPages": 3,
+            "totalRecordsIsEstimate": True,
+            "orderBy": "createdAt",
+            "orderDirection": "desc",
+            "nextCursor": "abc",
+        }
@@ -0,0 +1,105 @@
+import datetime
+import uuid
+from typing import Any, Dict, Iterator, Self
+
+import pytest
+from focus_api.db import create_engine
+from focus_api.db.bulk import BULK_ROWS_LOADED, copy_rows, insert_rows
+from focus_api.db.config import get_config
+from focus_api.models.base import Base
+from sqlalchemy import JSON, Boolean, DateTime, Engine, String, func, select
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+
+class BulkItem(Base):
+    __tablename__ = "test_bulk_item"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    name: Mapped[str | None] = mapped_column(String)
+    active: Mapped[bool] = mapped_column(Boolean)
+    created_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+    extra: Mapped[Any] = mapped_column(JSON, nullable=True)
+
+
+@pytest.fixture
+def engine() -> Iterator[Engine]:
+    engine = create_engine(get_config(), name="test_bulk")
+    BulkItem.__table__.drop(engine, checkfirst=True)  # type: ignore[attr-defined]
+    BulkItem.__table__.create(engine)  # type: ignore[attr-defined]
+    yield engine
+    BulkItem.__table__.drop(engine)  # type: ignore[attr-defined]
+    engine.dispose()
+
+
+def generate_rows(count: int) -> Iterator[Dict[str, Any]]:
+    for index in range(count):
+        yield {
+            "id": uuid.uuid4(),
+            "name": None if index % 5 == 0 else f'item "{index}", {"" if index % 7 else ""}',
+            "active": index % 2 == 0,
+            "created_at": datetime.datetime(2024, 5, 1, tzinfo=datetime.UTC),
+            "extra": {"index": index},
+        }
+
+
+def count_rows(engine: Engine) -> int:
+    with Session(engine) as session:
+        return session.scalar(select(func.count()).select_from(BulkItem)) or 0
+
+
+class TestBulkLoad:
+
+    def test_copy_in_batches(self: Self, engine: Engine) -> None:
+        loaded = BULK_ROWS_LOADED.get(table="test_bulk_item", method="copy")
+
+        result = copy_rows(engine, BulkItem, generate_rows(250), batch_size=100)
+
+        assert (result.rows, result.batches) == (250, 3)
+        assert result.rows_per_second > 0
+        assert count_rows(engine) == 250
+        assert BULK_ROWS_LOADED.get(table="test_bulk_item", method="copy") == loaded + 250
+
+    def test_copy_preserves_values(self: Self, engine: Engine) -> None:
+        rows = [
+            {"id": uuid.uuid4(), "name": None, "active": True, "created_at": None, "extra": None},
+            {
+                "id": uuid.uuid4(),
+                "name": "",
+                "active": False,
+                "created_at": datetime.datetime(2024, 5, 1, 12, tzinfo=datetime.UTC),
+                "extra": {"quote": 'a "b", c'},
+            },
+        ]
+
+        copy_rows(engine, BulkItem, rows)
+
+        with Session(engine) as session:
+            loaded = {item.id: item for item in session.scalars(select(BulkItem))}
+        assert loaded[rows[0]["id"]].name is None
+        assert loaded[rows[1]["id"]].name == ""
+        assert loaded[rows[1]["id"]].active is False
+        assert loaded[rows[1]["id"]].created_at == rows[1]["created_at"]
+        assert loaded[rows[1]["id"]].extra == {"quote": 'a "b", c'}
+
+    @pytest.mark.parametrize("method", ["executemany", "values"])
+    def test_insert_in_batches(self: Self, engine: Engine, method: str) -> None:
+        rows = (
+            BulkItem(name=f"item {index}", active=True, created_at=datetime.datetime.now())
+            for index in range(25)
+        )
+
+        result = insert_rows(engine, BulkItem, rows, batch_size=10, method=method)
+
+        assert (result.rows, result.batches) == (25, 3)
+        assert count_rows(engine) == 25
+
+    def test_load_through_session(self: Self, engine: Engine) -> None:
+        with Session(engine) as session:
+            copy_rows(session, BulkItem, generate_rows(20), batch_size=5)
+            session.rollback()
+
+        # The engine is AUTOCOMMIT, like the API's, so each statement still commits.
+        assert count_rows(engine) == 20
+
+    def test_empty_load(self: Self, engine: Engine) -> None:
+        assert copy_rows(engine, BulkItem, iter([])).rows == 0
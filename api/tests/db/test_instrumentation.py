@@ -0,0 +1,135 @@
+import copy
+from typing import Any, Generator, List, Self
+
+import connexion  # type: ignore
+import focus_api.app
+import pytest
+from focus_api.db import create_engine, instrumentation
+from focus_api.db.config import get_config
+from focus_api.db.instrumentation import QueryStatsConfig
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+
+@pytest.fixture
+def engine() -> Generator[Engine, None, None]:
+    engine = create_engine(get_config(), name="test_instrumentation")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def slow_queries(monkeypatch: pytest.MonkeyPatch) -> List[Any]:
+    logged: List[Any] = []
+
+    def warning(message: str, *args: Any, **kwargs: Any) -> None:
+        if message == "Slow SQL statement":
+            logged.append(kwargs["extra"])
+
+    monkeypatch.setattr(instrumentation.logger, "warning", warning)
+    return logged
+
+
+@pytest.fixture(autouse=True)
+def uninstall() -> Generator[None, None, None]:
+    yield
+    instrumentation.uninstall()
+    instrumentation.install(QueryStatsConfig(enabled=False))
+
+
+class TestInstrumentation:
+
+    def test_nothing_is_recorded_when_disabled(self: Self, engine: Engine) -> None:
+        instrumentation.install(QueryStatsConfig(enabled=False))
+
+        assert instrumentation.start() is None
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert instrumentation.finish() is None
+
+    def test_statements_are_counted(self: Self, engine: Engine) -> None:
+        instrumentation.install(QueryStatsConfig(enabled=True, repeated_statement_threshold=3))
+
+        instrumentation.start()
+        with engine.connect() as conn:
+            for value in range(3):
+                conn.execute(text("SELECT :value"), {"value": value})
+            conn.execute(text("SELECT 2"))
+        stats = instrumentation.finish()
+
+        assert stats is not None
+        assert stats["db_query_count"] == 4
+        assert stats["db_time_ms"] > 0
+        # The three executions of SELECT :value, with different parameters
+        assert stats["db_repeated_statements"] == 1
+
+    def test_statements_outside_requests_are_not_counted(self: Self, engine: Engine) -> None:
+        instrumentation.install(QueryStatsConfig(enabled=True))
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+        assert instrumentation.finish() is None
+
+    def test_failed_statements_leave_nothing_on_connection(self: Self, engine: Engine) -> None:
+        instrumentation.install(QueryStatsConfig(enabled=True))
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            info = copy.deepcopy(conn.info)
+            for _ in range(3):
+                with pytest.raises(DBAPIError):
+                    conn.execute(text("SELECT 1 / 0"))
+            conn.execute(text("SELECT 1"))
+
+            assert conn.info == info
+
+    def test_slow_statements_are_logged(
+        self: Self, engine: Engine, slow_queries: List[Any]
+    ) -> None:
+        instrumentation.install(QueryStatsConfig(enabled=True, slow_query_ms=50))
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT pg_sleep(0.1)"))
+
+        assert len(slow_queries) == 1
+        assert slow_queries[0]["statement"] == "SELECT pg_sleep(0.1)"
+        assert slow_queries[0]["duration_ms"] >= 100
+        assert "plan" not in slow_queries[0]
+
+    def test_slow_selects_are_explained(
+        self: Self, engine: Engine, slow_queries: List[Any]
+    ) -> None:
+        instrumentation.install(
+            QueryStatsConfig(enabled=True, slow_query_ms=0, explain_slow_queries=True)
+        )
+
+        instrumentation.start()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT :value"), {"value": 1})
+        stats = instrumentation.finish()
+
+        assert "Execution Time" in slow_queries[0]["plan"]
+        # The EXPLAIN isn't counted as one of the request's statements.
+        assert stats is not None and stats["db_query_count"] == 1
+
+    def test_access_log_includes_query_stats(
+        self: Self, monkeypatch: pytest.MonkeyPatch, test_client: connexion.FlaskApp
+    ) -> None:
+        instrumentation.install(QueryStatsConfig(enabled=True))
+        access_log: List[Any] = []
+
+        def info(message: str, *args: Any, **kwargs: Any) -> None:
+            if "status_code" in kwargs.get("extra", {}):
+                access_log.append(kwargs["extra"])
+
+        monkeypatch.setattr(focus_api.app.logger, "info", info)
+
+        response = test_client.get("/v1/health")
+
+        assert response.status_code == 200
+        assert access_log[0]["db_query_count"] == 0
+        assert access_log[0]["db_time_ms"] == 0
+        assert access_log[0]["db_repeated_statements"] == 0
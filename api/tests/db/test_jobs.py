@@ -0,0 +1,173 @@
+import time
+import uuid
+from typing import Any, Dict, Iterator, Self
+
+import pytest
+from focus_api.db import create_engine, jobs
+from focus_api.db.config import get_config
+from focus_api.db.jobs import Job, PermanentJobError
+from focus_api.worker import JobWorker, JobWorkerConfig, retry_delay
+from sqlalchemy import Engine, text
+
+
+@pytest.fixture
+def engine(schema: None) -> Iterator[Engine]:
+    engine = create_engine(get_config(), name="test_jobs")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def queue() -> str:
+    # Each test has its own queue, so that it only sees its own jobs.
+    return f"test-{uuid.uuid4()}"
+
+
+def get_job(engine: Engine, job_id: uuid.UUID) -> Job:
+    with engine.connect() as connection:
+        job = jobs.get_job(connection, job_id)
+    assert job is not None
+    return job
+
+
+class TestQueue:
+
+    def test_enqueue_and_get(self: Self, engine: Engine, queue: str) -> None:
+        with engine.connect() as connection:
+            job_id = jobs.enqueue(connection, "payment", {"caseId": "1"}, data=b"\x00", queue=queue)
+
+        job = get_job(engine, job_id)
+        assert job.kind == "payment"
+        assert job.payload == {"caseId": "1"}
+        assert job.status == jobs.PENDING
+        assert job.attempts == 0
+        # Attachments aren't loaded for status lookups
+        assert job.data is None
+
+        with engine.connect() as connection:
+            assert jobs.get_job(connection, uuid.uuid4()) is None
+
+    def test_dequeue_skips_jobs_claimed_by_another_worker(
+        self: Self, engine: Engine, queue: str
+    ) -> None:
+        with engine.connect() as connection:
+            for index in range(5):
+                jobs.enqueue(connection, "photo", {"index": index}, data=b"photo", queue=queue)
+
+        transactional = engine.connect().execution_options(isolation_level="READ COMMITTED")
+        with transactional, transactional.begin():
+            first = jobs.dequeue(transactional, "first", 3, queue=queue)
+            # The first worker's rows are still locked, so these are the rest.
+            with engine.connect() as connection:
+                second = jobs.dequeue(connection, "second", 10, queue=queue)
+
+        assert len(first) == 3
+        assert len(second) == 2
+        assert {job.id for job in first}.isdisjoint(job.id for job in second)
+        assert all(job.status == jobs.RUNNING and job.attempts == 1 for job in first + second)
+        assert first[0].data == b"photo"
+
+        with engine.connect() as connection:
+            assert jobs.dequeue(connection, "third", 10, queue=queue) == []
+
+    def test_retry_until_failed(self: Self, engine: Engine, queue: str) -> None:
+        with engine.connect() as connection:
+            job_id = jobs.enqueue(connection, "payment", {}, queue=queue, max_attempts=2)
+
+            [job] = jobs.dequeue(connection, "worker", 1, queue=queue)
+            jobs.retry(connection, job, "worker", "HTTPError: 503", delay=60)
+            # Not due until the delay has passed
+            assert jobs.dequeue(connection, "worker", 1, queue=queue) == []
+            assert get_job(engine, job_id).status == jobs.PENDING
+
+            connection.execute(
+                text("UPDATE jobs SET run_at = now() WHERE id = :id"), {"id": job_id}
+            )
+            [job] = jobs.dequeue(connection, "worker", 1, queue=queue)
+            assert job.attempts == 2
+            jobs.fail(connection, job, "worker", "HTTPError: 503")
+
+        assert get_job(engine, job_id).status == jobs.FAILED
+
+    def test_stale_job_claimed_again(self: Self, engine: Engine, queue: str) -> None:
+        with engine.connect() as connection:
+            job_id = jobs.enqueue(connection, "payment", {}, queue=queue)
+            [abandoned] = jobs.dequeue(connection, "dead", 1, queue=queue)
+
+            assert jobs.dequeue(connection, "live", 1, queue=queue, stale_after=300) == []
+            [job] = jobs.dequeue(connection, "live", 1, queue=queue, stale_after=0)
+            assert job.attempts == 2
+            assert job.reclaimed and not abandoned.reclaimed
+
+            # Only the worker holding the job can finish it.
+            jobs.complete(connection, abandoned, "dead", {"from": "dead"})
+            jobs.complete(connection, job, "live", {"from": "live"})
+
+        job = get_job(engine, job_id)
+        assert job.status == jobs.SUCCEEDED
+        assert job.result == {"from": "live"}
+
+    def test_stale_job_on_last_attempt_fails(self: Self, engine: Engine, queue: str) -> None:
+        with engine.connect() as connection:
+            job_id = jobs.enqueue(connection, "payment", {}, queue=queue, max_attempts=1)
+            [abandoned] = jobs.dequeue(connection, "dead", 1, queue=queue)
+
+            assert jobs.dequeue(connection, "live", 1, queue=queue, stale_after=0) == []
+            # Its worker can't finish it any more.
+            jobs.complete(connection, abandoned, "dead", {"from": "dead"})
+
+        job = get_job(engine, job_id)
+        assert job.status == jobs.FAILED
+        assert job.attempts == 1
+        assert job.result is None
+
+
+def succeed(job: Job) -> Dict[str, Any]:
+    return {"echo": job.payload}
+
+
+def fail(job: Job) -> Dict[str, Any]:
+    raise ConnectionError("unreachable")
+
+
+def reject(job: Job) -> Dict[str, Any]:
+    raise PermanentJobError("rejected")
+
+
+class TestJobWorker:
+
+    def run_jobs(self: Self, engine: Engine, queue: str, *kinds: str) -> Dict[str, Job]:
+        with engine.connect() as connection:
+            job_ids = {
+                kind: jobs.enqueue(connection, kind, {"kind": kind}, queue=queue) for kind in kinds
+            }
+
+        worker = JobWorker(
+            engine,
+            {"succeed": succeed, "fail": fail, "reject": reject},
+            JobWorkerConfig(queue=queue, concurrency=2, batch_size=10, retry_base_seconds=60),
+        )
+        # Only as many jobs as there are threads are claimed.
+        assert worker.run_once() == min(2, len(kinds))
+        while worker.run_once() or worker.running:
+            time.sleep(0.01)
+        worker.stop()
+        worker.run()
+
+        return {kind: get_job(engine, job_id) for kind, job_id in job_ids.items()}
+
+    def test_runs_jobs_with_their_handlers(self: Self, engine: Engine, queue: str) -> None:
+        finished = self.run_jobs(engine, queue, "succeed", "fail", "reject", "unknown")
+
+        assert finished["succeed"].status == jobs.SUCCEEDED
+        assert finished["succeed"].result == {"echo": {"kind": "succeed"}}
+        # Retried later
+        assert finished["fail"].status == jobs.PENDING
+        assert finished["fail"].attempts == 1
+        assert finished["reject"].status == jobs.FAILED
+        assert finished["unknown"].status == jobs.FAILED
+
+    def test_retry_delay_backs_off(self: Self) -> None:
+        assert 2.5 <= retry_delay(1, 5, 600) <= 5
+        assert 20 <= retry_delay(4, 5, 600) <= 40
+        assert 300 <= retry_delay(20, 5, 600) <= 600
@@ -0,0 +1,135 @@
+import datetime
+import uuid
+from typing import Iterator, List, Optional, Self
+
+import pytest
+from focus_api.db import create_engine
+from focus_api.db.config import get_config
+from focus_api.db.pagination import (
+    COUNT_ESTIMATE,
+    COUNT_EXACT,
+    InvalidCursorError,
+    paginate,
+)
+from focus_api.models.base import Base
+from sqlalchemy import DateTime, Integer, String, select
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+START = datetime.datetime(2024, 5, 1, tzinfo=datetime.UTC)
+
+
+class PaginationItem(Base):
+    __tablename__ = "test_pagination_item"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+    rank: Mapped[int] = mapped_column(Integer)
+    name: Mapped[str] = mapped_column(String)
+    score: Mapped[Optional[int]] = mapped_column(Integer)
+
+
+@pytest.fixture
+def items() -> Iterator[List[PaginationItem]]:
+    engine = create_engine(get_config(), name="test_pagination")
+    PaginationItem.__table__.drop(engine, checkfirst=True)  # type: ignore[attr-defined]
+    PaginationItem.__table__.create(engine)  # type: ignore[attr-defined]
+    with Session(engine, expire_on_commit=False) as session:
+        created = [
+            PaginationItem(
+                created_at=START + datetime.timedelta(hours=index // 2),
+                rank=index % 3,
+                name=f"item {index}",
+                score=None if index % 4 == 0 else index % 5,
+            )
+            for index in range(25)
+        ]
+        session.add_all(created)
+        session.commit()
+    yield created
+    PaginationItem.__table__.drop(engine)  # type: ignore[attr-defined]
+    engine.dispose()
+
+
+@pytest.fixture
+def session(items: List[PaginationItem]) -> Iterator[Session]:
+    engine = create_engine(get_config(), name="test_pagination_session")
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def all_pages(session: Session, **kwargs: object) -> List[List[PaginationItem]]:
+    pages = []
+    cursor = None
+    while True:
+        page = paginate(session, select(PaginationItem), cursor=cursor, **kwargs)  # type: ignore[arg-type]
+        pages.append(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+class TestPaginate:
+
+    def test_pages_follow_order_without_gaps(
+        self: Self, session: Session, items: List[PaginationItem]
+    ) -> None:
+        pages = all_pages(session, order_by=[PaginationItem.created_at.desc()], page_size=10)
+
+        assert [len(page) for page in pages] == [10, 10, 5]
+        expected = sorted(items, key=lambda item: (item.created_at, item.id), reverse=True)
+        assert [item.id for page in pages for item in page] == [item.id for item in expected]
+
+    def test_mixed_directions(self: Self, session: Session, items: List[PaginationItem]) -> None:
+        pages = all_pages(
+            session,
+            order_by=[PaginationItem.rank, PaginationItem.created_at.desc()],
+            page_size=4,
+        )
+
+        ids = [item.id for page in pages for item in page]
+        assert len(ids) == len(set(ids)) == 25
+        ranks = [item.rank for page in pages for item in page]
+        assert ranks == sorted(ranks)
+
+    @pytest.mark.parametrize("descending", [False, True])
+    def test_nulls_in_sort_column(
+        self: Self, session: Session, items: List[PaginationItem], descending: bool
+    ) -> None:
+        order_by = PaginationItem.score.desc() if descending else PaginationItem.score
+        pages = all_pages(session, order_by=[order_by], page_size=4)
+
+        ids = [item.id for page in pages for item in page]
+        assert len(ids) == len(set(ids)) == 25
+        scores = [item.score for page in pages for item in page]
+        present = [score for score in scores if score is not None]
+        assert present == sorted(present, reverse=descending)
+        assert scores[len(present) :] == [None] * 7
+
+    def test_counts(self: Self, session: Session) -> None:
+        exact = paginate(
+            session, select(PaginationItem), [PaginationItem.name], page_size=10, count=COUNT_EXACT
+        )
+        assert exact.total_records == 25
+        assert exact.total_pages == 3
+        assert not exact.total_is_estimate
+
+        estimate = paginate(
+            session,
+            select(PaginationItem).where(PaginationItem.rank == 1),
+            [PaginationItem.name],
+            count=COUNT_ESTIMATE,
+        )
+        assert estimate.total_is_estimate
+        assert estimate.total_records is not None and estimate.total_records >= 0
+
+    def test_cursor_for_another_order_is_rejected(self: Self, session: Session) -> None:
+        page = paginate(session, select(PaginationItem), [PaginationItem.name], page_size=10)
+        assert page.next_cursor is not None
+
+        with pytest.raises(InvalidCursorError):
+            paginate(
+                session, select(PaginationItem), [PaginationItem.rank], cursor=page.next_cursor
+            )
+        with pytest.raises(InvalidCursorError):
+            paginate(session, select(PaginationItem), [PaginationItem.name], cursor="not a cursor")
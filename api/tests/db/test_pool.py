@@ -0,0 +1,32 @@
+from typing import Self
+
+from focus_api.db import create_engine
+from focus_api.db.config import get_config
+from focus_api.db.pool import POOL_CHECKOUTS, POOL_CONNECTIONS_OPENED, get_pool_stats
+from sqlalchemy import text
+
+
+class TestPool:
+
+    def test_engine_is_sized_from_config(self: Self) -> None:
+        config = get_config()
+        config.pool_size = 2
+        config.max_overflow = 1
+        engine = create_engine(config, name="test_sizing")
+
+        assert engine.pool.size() == 2  # type: ignore[attr-defined]
+        assert get_pool_stats()["test_sizing"]["max_overflow"] == 1
+
+    def test_checkouts_are_counted(self: Self) -> None:
+        engine = create_engine(get_config(), name="test_counters")
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1")).one()
+            assert get_pool_stats()["test_counters"]["checked_out"] == 1
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1")).one()
+
+        assert POOL_CHECKOUTS.get(pool="test_counters") == 2
+        # The second checkout reuses the pooled connection rather than opening a new one.
+        assert POOL_CONNECTIONS_OPENED.get(pool="test_counters") == 1
+        assert get_pool_stats()["test_counters"]["checked_out"] == 0
@@ -0,0 +1,60 @@
+from typing import Self
+
+from focus_api.db import create_engine, session_scope
+from focus_api.db.config import get_config
+from focus_api.db.pool import POOL_CHECKOUTS
+from focus_api.db.routing import READ_ONLY, ReplicaSet, RoutingSession
+from sqlalchemy import literal, select
+
+
+def make_session(name: str, max_lag: float = 5) -> RoutingSession:
+    # The test database stands in for both the primary and the replica; the pool names tell
+    # them apart.
+    primary = create_engine(get_config(), name=f"{name}_primary")
+    replica = create_engine(get_config(), name=f"{name}_replica")
+    return RoutingSession(bind=primary, replicas=ReplicaSet([replica], max_lag=max_lag))
+
+
+class TestRoutingSession:
+
+    def test_reads_go_to_primary_by_default(self: Self) -> None:
+        session = make_session("test_default")
+        session.execute(select(literal(1))).one()
+
+        assert POOL_CHECKOUTS.get(pool="test_default_primary") == 1
+        assert POOL_CHECKOUTS.get(pool="test_default_replica") == 0
+
+    def test_read_only_reads_go_to_replica(self: Self) -> None:
+        session = make_session("test_read_only")
+        session.info[READ_ONLY] = True
+        session.execute(select(literal(1))).one()
+
+        assert POOL_CHECKOUTS.get(pool="test_read_only_primary") == 0
+        # One checkout measures replica lag, one runs the query.
+        assert POOL_CHECKOUTS.get(pool="test_read_only_replica") == 2
+
+    def test_session_scope_uses_primary(self: Self) -> None:
+        session = make_session("test_scope")
+        session.info[READ_ONLY] = True
+        with session_scope(session):
+            session.execute(select(literal(1))).one()
+
+        assert POOL_CHECKOUTS.get(pool="test_scope_primary") == 1
+        assert POOL_CHECKOUTS.get(pool="test_scope_replica") == 0
+
+    def test_lagging_replica_falls_back_to_primary(self: Self) -> None:
+        session = make_session("test_lagging", max_lag=-1)
+        session.info[READ_ONLY] = True
+        session.execute(select(literal(1))).one()
+
+        assert POOL_CHECKOUTS.get(pool="test_lagging_primary") == 1
+
+    def test_unmeasured_replica_not_used_while_lag_is_measured(self: Self) -> None:
+        session = make_session("test_unmeasured")
+        session.info[READ_ONLY] = True
+        # Another thread is measuring the replica's lag.
+        with session.replicas._lag_lock:
+            session.execute(select(literal(1))).one()
+
+        assert POOL_CHECKOUTS.get(pool="test_unmeasured_primary") == 1
+        assert POOL_CHECKOUTS.get(pool="test_unmeasured_replica") == 0
@@ -0,0 +1,27 @@
+from typing import Iterator, Self
+
+import pytest
+from focus_api.db import create_engine
+from focus_api.db.config import get_config
+from focus_api.db.schema import create_schema
+from sqlalchemy import Engine, text
+
+
+@pytest.fixture
+def engine() -> Iterator[Engine]:
+    engine = create_engine(get_config(), name="test_schema")
+    yield engine
+    engine.dispose()
+
+
+class TestSchema:
+
+    def test_create_schema_is_idempotent(self: Self, engine: Engine) -> None:
+        create_schema(engine)
+        create_schema(engine)
+
+        with engine.connect() as connection:
+            for table in ("result_cache", "jobs"):
+                assert connection.execute(
+                    text("SELECT to_regclass(:table) IS NOT NULL"), {"table": table}
+                ).scalar_one()
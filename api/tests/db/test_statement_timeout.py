@@ -0,0 +1,59 @@
+from typing import Generator, Self
+
+import pytest
+from focus_api.db import create_engine
+from focus_api.db.config import get_config
+from focus_api.db.statement_timeout import strip_timeout
+from focus_api.utils.deadline import Deadline, current_deadline
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+
+@pytest.fixture
+def engine() -> Generator[Engine, None, None]:
+    config = get_config()
+    config.pool_size = 1
+    engine = create_engine(config, name="test_statement_timeout")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def deadline() -> Generator[Deadline, None, None]:
+    deadline = Deadline(200)
+    token = current_deadline.set(deadline)
+    yield deadline
+    current_deadline.reset(token)
+
+
+class TestStatementTimeout:
+
+    def test_statements_are_cancelled_at_deadline(
+        self: Self, engine: Engine, deadline: Deadline
+    ) -> None:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError, match="statement timeout"):
+                conn.execute(text("SELECT pg_sleep(1)"))
+
+    def test_statements_within_deadline_return_results(
+        self: Self, engine: Engine, deadline: Deadline
+    ) -> None:
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT :value"), {"value": 3}).scalar_one() == 3
+
+    def test_timeout_does_not_outlive_statement(
+        self: Self, engine: Engine, deadline: Deadline
+    ) -> None:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        current_deadline.set(None)
+
+        # The same pooled connection, still with the configured timeout
+        with engine.connect() as conn:
+            timeout = conn.execute(text("SHOW statement_timeout")).scalar_one()
+        assert timeout == "1h"
+
+    def test_statements_without_deadline_are_unchanged(self: Self) -> None:
+        assert strip_timeout("SET LOCAL statement_timeout = 150; SELECT 1") == "SELECT 1"
+        assert strip_timeout("SELECT 1") == "SELECT 1"
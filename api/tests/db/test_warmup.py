@@ -0,0 +1,73 @@
+import uuid
+from typing import Any, Generator, Self
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import CacheStats
+
+from focus_api.db import create_engine, warmup
+from focus_api.db.cache import SELECT_ENTRY
+from focus_api.db.config import get_config
+from focus_api.db.pool import POOL_CONNECTIONS_OPENED
+from focus_api.db.warmup import (
+    WarmupConfig,
+    compile_statement,
+    open_connections,
+    register_hot_statement,
+    warm_up,
+)
+
+
+@pytest.fixture
+def engine() -> Generator[Engine, None, None]:
+    config = get_config()
+    config.pool_size = 3
+    engine = create_engine(config, name="test_warmup")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def hot_statements(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Statements registered by a test are forgotten after it.
+    monkeypatch.setattr(warmup, "_hot_statements", warmup.get_hot_statements())
+
+
+class TestWarmup:
+
+    def test_hot_statements_are_compiled_into_cache(self: Self, engine: Engine) -> None:
+        statement = register_hot_statement(
+            text(f"SELECT :value AS {'v' + uuid.uuid4().hex}"), ("value",)
+        )
+
+        summary = warm_up(engine, WarmupConfig(enabled=True, connections=0))
+
+        assert summary["statements_compiled"] >= 2
+        assert summary["compiled_cache_size"] == summary["statements_compiled"]
+        with engine.connect() as conn:
+            # Executing the statement as a request would finds it compiled.
+            result = conn.execute(statement, {"value": 1})
+            assert result.context.cache_hit == CacheStats.CACHE_HIT
+            assert compile_statement(conn, SELECT_ENTRY, ("cache", "key")) == CacheStats.CACHE_HIT
+
+    def test_pool_is_filled(self: Self, engine: Engine) -> None:
+        opened = POOL_CONNECTIONS_OPENED.get(pool="test_warmup")
+
+        assert open_connections(engine, 5) == 3
+
+        assert engine.pool.checkedin() == 3  # type: ignore[attr-defined]
+        assert POOL_CONNECTIONS_OPENED.get(pool="test_warmup") == opened + 3
+
+    def test_failed_compilation_is_skipped(
+        self: Self, engine: Engine, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        def compile_statement(*args: Any) -> None:
+            raise AttributeError("_compile_w_cache")
+
+        monkeypatch.setattr(warmup, "compile_statement", compile_statement)
+
+        summary = warm_up(engine, WarmupConfig(enabled=True, connections=2))
+
+        assert summary["statements_compiled"] == 0
+        assert summary["connections_opened"] == 2
@@ -0,0 +1,37 @@
+from typing import Any, Dict, List, Optional, Self
+
+import connexion  # type: ignore
+import pytest
+from focus_api.controllers import application
+from focus_api.db.aio import current_session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+PHOTO_URL = "/v1/application/6ddcf443-d1bf-4acd-83cc-b1f2d0dc2369/photo"
+
+
+class TestAsyncControllers:
+
+    def test_async_controller_uses_async_session(
+        self: Self, test_client: connexion.FlaskApp, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        sessions: List[Optional[AsyncSession]] = []
+
+        def get_photos(body: Any) -> Dict[str, Any]:
+            sessions.append(current_session.get())
+            return {}
+
+        monkeypatch.setattr(application, "get_photos", get_photos)
+
+        response = test_client.post(PHOTO_URL, json={})
+
+        assert response.status_code == 200
+        assert len(sessions) == 1
+        assert isinstance(sessions[0], AsyncSession)
+
+    def test_sync_controller_still_served_by_flask(
+        self: Self, test_client: connexion.FlaskApp
+    ) -> None:
+        response = test_client.get("/v1/health")
+
+        assert response.status_code == 200
+        assert response.json()["data"]["status"] == "up"
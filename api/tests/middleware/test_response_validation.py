@@ -0,0 +1,122 @@
+from typing import Any, Dict, Self
+
+import connexion  # type: ignore
+import pytest
+from connexion.resolver import Resolver  # type: ignore
+from focus_api.app import get_middlewares
+from focus_api.middleware.response_validation import (
+    RESPONSE_VALIDATION_CHECKS,
+    ResponseValidationConfig,
+    get_config,
+)
+
+OPERATION_ID = "tests.middleware.widget"
+
+SPEC = {
+    "openapi": "3.0.3",
+    "info": {"title": "test", "version": "1"},
+    "paths": {
+        "/widget": {
+            "get": {
+                "operationId": OPERATION_ID,
+                "responses": {
+                    "200": {
+                        "description": "A widget",
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "required": ["name"],
+                                    "properties": {"name": {"type": "string"}},
+                                }
+                            }
+                        },
+                    }
+                },
+            }
+        }
+    },
+}
+
+
+def widget() -> Dict[str, Any]:
+    # Missing the required "name"
+    return {"size": 1}
+
+
+def create_test_app(config: ResponseValidationConfig) -> connexion.FlaskApp:
+    app = connexion.FlaskApp(__name__, middlewares=get_middlewares(config))
+    app.add_api(SPEC, resolver=Resolver(lambda _: widget), validate_responses=True)
+    return app
+
+
+class TestResponseValidation:
+
+    def test_violation_is_reported_not_enforced(self: Self) -> None:
+        invalid = RESPONSE_VALIDATION_CHECKS.get(operation=OPERATION_ID, result="invalid")
+        client = create_test_app(
+            ResponseValidationConfig(sample_rate=1, enforce=False)
+        ).test_client()
+
+        response = client.get("/widget")
+
+        assert response.status_code == 200
+        assert response.json() == {"size": 1}
+        assert RESPONSE_VALIDATION_CHECKS.get(operation=OPERATION_ID, result="invalid") == (
+            invalid + 1
+        )
+
+    def test_violation_is_enforced(self: Self) -> None:
+        client = create_test_app(
+            ResponseValidationConfig(sample_rate=1, enforce=True)
+        ).test_client()
+
+        response = client.get("/widget")
+
+        assert response.status_code == 500
+
+    def test_unsampled_response_is_not_validated(self: Self) -> None:
+        skipped = RESPONSE_VALIDATION_CHECKS.get(operation=OPERATION_ID, result="skipped")
+        config = ResponseValidationConfig(
+            sample_rate=1, operation_sample_rates={OPERATION_ID: 0}, enforce=True
+        )
+        client = create_test_app(config).test_client()
+
+        response = client.get("/widget")
+
+        assert response.status_code == 200
+        assert RESPONSE_VALIDATION_CHECKS.get(operation=OPERATION_ID, result="skipped") == (
+            skipped + 1
+        )
+
+    def test_valid_response_is_counted(self: Self, test_client: connexion.FlaskApp) -> None:
+        operation_id = "focus_api.controllers.health"
+        valid = RESPONSE_VALIDATION_CHECKS.get(operation=operation_id, result="valid")
+
+        response = test_client.get("/v1/health")
+
+        assert response.status_code == 200
+        assert RESPONSE_VALIDATION_CHECKS.get(operation=operation_id, result="valid") == valid + 1
+
+    def test_config_from_env(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("RESPONSE_VALIDATION_SAMPLE_RATE", "0.05")
+        monkeypatch.setenv(
+            "RESPONSE_VALIDATION_OPERATION_SAMPLE_RATES", f"{OPERATION_ID}=1, bad=rate,other=2"
+        )
+        monkeypatch.setenv("RESPONSE_VALIDATION_ENFORCE", "false")
+
+        config = get_config()
+
+        assert config.sample_rate == 0.05
+        assert config.operation_sample_rates == {OPERATION_ID: 1.0, "other": 1.0}
+        assert config.enforce is False
+        assert config.sample_rate_for(OPERATION_ID) == 1.0
+        assert config.sample_rate_for("focus_api.controllers.health") == 0.05
+
+    def test_default_sample_rate(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.delenv("RESPONSE_VALIDATION_SAMPLE_RATE")
+
+        assert get_config().sample_rate == 1.0
+
+        monkeypatch.setenv("ENVIRONMENT", "prod")
+        assert get_config().sample_rate == 0.01
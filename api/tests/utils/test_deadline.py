@@ -0,0 +1,38 @@
+from typing import Self
+
+import pytest
+from focus_api.app import get_specification_path
+from focus_api.utils import deadline
+from focus_api.utils.deadline import Deadline, get_budgets, get_config
+from focus_api.utils.spec_cache import load_specification
+
+
+class TestDeadline:
+
+    def test_budgets_from_spec_and_environment(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("REQUEST_BUDGETS", "focus_api.controllers.address=1500, health=bad")
+        monkeypatch.setenv("REQUEST_DEFAULT_BUDGET_MS", "10000")
+        config = get_config()
+
+        budgets = get_budgets(load_specification(get_specification_path()), config)
+
+        assert budgets["focus_api.controllers.address"] == 1500
+        assert budgets["focus_api.controllers.eligibility"] == 5000
+        assert "health" not in budgets
+        assert config.default_budget_ms == 10000
+
+    def test_remaining_time(self: Self) -> None:
+        assert 0.9 < Deadline(1000).remaining() <= 1
+        assert Deadline(0).remaining() == 0
+
+    def test_operations_without_budget_have_no_deadline(self: Self) -> None:
+        deadline.configure({"paths": {}}, deadline.DeadlineConfig(budgets={"with_budget": 100}))
+
+        token = deadline.start("without_budget")
+        assert deadline.remaining() is None
+        deadline.finish(token)
+
+        token = deadline.start("with_budget")
+        remaining = deadline.remaining()
+        deadline.finish(token)
+        assert remaining is not None and remaining <= 0.1
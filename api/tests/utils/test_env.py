@@ -0,0 +1,46 @@
+from typing import Self
+
+import pytest
+from focus_api.utils.env import get_bool_env, get_float_env, get_int_env
+from focus_api.utils.profiling import get_config
+
+
+class TestEnv:
+
+    def test_numbers(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("TEST_NUMBER", "12")
+        assert get_int_env("TEST_NUMBER") == 12
+        assert get_float_env("TEST_NUMBER") == 12.0
+
+        monkeypatch.setenv("TEST_NUMBER", "0.5")
+        assert get_int_env("TEST_NUMBER") is None
+        assert get_float_env("TEST_NUMBER") == 0.5
+
+        monkeypatch.delenv("TEST_NUMBER")
+        assert get_int_env("TEST_NUMBER") is None
+        assert get_float_env("TEST_NUMBER") is None
+
+    @pytest.mark.parametrize("value", ["", "ten", "-1", "nan", "inf", "1e400"])
+    def test_malformed_numbers_are_ignored(
+        self: Self, value: str, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("TEST_NUMBER", value)
+
+        assert get_int_env("TEST_NUMBER") is None
+        assert get_float_env("TEST_NUMBER") is None
+
+    def test_flags(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        assert get_bool_env("TEST_FLAG") is None
+        for value, expected in (("true", True), ("YES", True), ("1", True), ("off", False)):
+            monkeypatch.setenv("TEST_FLAG", value)
+            assert get_bool_env("TEST_FLAG") is expected
+
+    def test_malformed_override_keeps_default(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        default = get_config()
+        monkeypatch.setenv("PROFILE_SAMPLE_RATE", "1%")
+        monkeypatch.setenv("PROFILE_INTERVAL_MS", "fast")
+
+        config = get_config()
+
+        assert config.sample_rate == default.sample_rate
+        assert config.interval_ms == default.interval_ms
@@ -0,0 +1,68 @@
+import time
+from typing import Self
+
+from focus_api.utils.health import DEGRADED, DOWN, UP, HealthCheckConfig, HealthProber
+
+
+def ok() -> None:
+    pass
+
+
+def fail() -> None:
+    raise ConnectionError("unavailable")
+
+
+class TestHealthProber:
+
+    def test_all_up(self: Self) -> None:
+        prober = HealthProber({"db": ok, "usps": ok}, HealthCheckConfig())
+        prober.check_all()
+
+        status = prober.status()
+
+        assert status["status"] == UP
+        assert status["components"]["usps"]["status"] == UP
+        assert status["components"]["usps"]["latencyMs"] >= 0
+
+    def test_database_down_is_down(self: Self) -> None:
+        prober = HealthProber({"db": fail, "usps": ok}, HealthCheckConfig())
+        prober.check_all()
+
+        status = prober.status()
+
+        assert status["status"] == DOWN
+        assert status["components"]["db"] == {
+            "status": DOWN,
+            "latencyMs": status["components"]["db"]["latencyMs"],
+            "lastChecked": status["components"]["db"]["lastChecked"],
+            "error": "ConnectionError",
+        }
+
+    def test_service_down_is_degraded(self: Self) -> None:
+        prober = HealthProber({"db": ok, "usps": fail}, HealthCheckConfig())
+        prober.check_all()
+
+        assert prober.status()["status"] == DEGRADED
+
+    def test_unchecked_and_stale_results_are_degraded(self: Self) -> None:
+        prober = HealthProber({"db": ok}, HealthCheckConfig(stale_after=0))
+        assert prober.status()["components"]["db"]["status"] == DEGRADED
+
+        prober.check_all()
+        status = prober.status()
+
+        assert status["status"] == DEGRADED
+        assert status["components"]["db"]["error"] == "stale"
+
+    def test_background_checks(self: Self) -> None:
+        prober = HealthProber({"db": ok}, HealthCheckConfig(interval=0.01))
+        prober.start()
+        try:
+            for _ in range(500):
+                if "db" in prober.results:
+                    break
+                time.sleep(0.01)
+        finally:
+            prober.stop()
+
+        assert prober.status()["status"] == UP
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+from typing import List, Self
+
+import connexion  # type: ignore
+import focus_api.__main__
+import pytest
+from focus_api.app import LazyApp, create_app
+from focus_api.db import init
+from focus_api.db.aio import LazyAsyncSessionFactory
+from focus_api.db.pool import get_engine
+from focus_api.utils import health, prometheus
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.testclient import TestClient
+
+
+class TestLazyStartup:
+
+    def test_init_connects_only_when_asked(self: Self) -> None:
+        eager = init()
+        lazy = init(connect=False)
+
+        assert eager.session_factory.kw["bind"].pool.checkedin() == 1
+        assert lazy.session_factory.kw["bind"].pool.checkedin() == 0
+
+    def test_lazy_async_session_factory_creates_engine_on_first_call(self: Self) -> None:
+        session_factory = LazyAsyncSessionFactory()
+        assert session_factory._factory is None
+
+        session = session_factory()
+
+        assert isinstance(session, AsyncSession)
+        assert session_factory._factory is not None
+
+    def test_lazy_app_is_created_once_on_first_use(self: Self) -> None:
+        created: List[connexion.FlaskApp] = []
+
+        def factory() -> connexion.FlaskApp:
+            created.append(create_app(lazy=True))
+            return created[-1]
+
+        app = LazyApp(factory)
+        assert created == []
+
+        with TestClient(app) as client:
+            response = client.get("/v1/openapi.json")
+
+        assert response.status_code == 200
+        assert app.get() is created[0]
+        assert len(created) == 1
+
+    def test_preloading_master_starts_nothing(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Imported here, as importing it reads the database configuration
+        from focus_api import gunicorn_config
+
+        started: List[str] = []
+        monkeypatch.setattr(prometheus, "start_writer", lambda: started.append("writer"))
+        monkeypatch.setattr(health, "get_prober", lambda: started.append("prober"))
+        app = LazyApp(create_app)
+        monkeypatch.setattr(focus_api.__main__, "app", app)
+
+        gunicorn_config.when_ready(SimpleNamespace(cfg=SimpleNamespace(preload_app=True)))
+
+        assert app.get().middleware.middleware_stack is not None
+        assert started == []
+        engine = get_engine("primary")
+        assert engine is not None and engine.pool.checkedin() == 0  # type: ignore[attr-defined]
+
+        gunicorn_config.post_fork(None, None)
+
+        assert started == ["writer", "prober"]
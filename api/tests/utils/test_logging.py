@@ -0,0 +1,96 @@
+import io
+import json
+import logging
+import sys
+import threading
+from typing import Self
+
+from focus_api.utils.logging.batching import RECORDS_DROPPED, BatchingStreamHandler
+from focus_api.utils.logging.formatters import JsonFormatter
+
+
+class BlockingStream(io.StringIO):
+    """A stream whose writes wait until released."""
+
+    def __init__(self: Self) -> None:
+        super().__init__()
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write(self: Self, s: str) -> int:
+        self.writing.set()
+        self.release.wait(timeout=5)
+        return super().write(s)
+
+
+def make_record(level: int, msg: str, *args: object, **extra: object) -> logging.LogRecord:
+    record = logging.makeLogRecord({"name": "test", "levelno": level, "msg": msg, "args": args})
+    record.levelname = logging.getLevelName(level)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestJsonFormatter:
+
+    def test_format(self: Self) -> None:
+        record = make_record(logging.INFO, "%s %s", 200, "GET", status_code=200, when=object())
+
+        output = json.loads(JsonFormatter().format(record))
+
+        assert output["message"] == "200 GET"
+        assert output["status_code"] == 200
+        assert output["when"].startswith("<object object")
+        assert "msg" not in output and "args" not in output
+
+    def test_format_exception(self: Self) -> None:
+        try:
+            raise ValueError("bad")
+        except ValueError:
+            record = logging.makeLogRecord({"msg": "failed"})
+            record.exc_info = sys.exc_info()
+
+        output = json.loads(JsonFormatter().format(record))
+
+        assert "ValueError: bad" in output["exc_text"]
+
+
+class TestBatchingStreamHandler:
+
+    def test_records_are_written_in_order(self: Self) -> None:
+        stream = io.StringIO()
+        handler = BatchingStreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+
+        for i in range(10):
+            handler.handle(make_record(logging.INFO, "line %d", i))
+        handler.flush()
+
+        lines = stream.getvalue().splitlines()
+        assert [json.loads(line)["message"] for line in lines] == [f"line {i}" for i in range(10)]
+        handler.close()
+
+    def test_close_writes_remaining_records(self: Self) -> None:
+        stream = io.StringIO()
+        handler = BatchingStreamHandler(stream)
+
+        handler.handle(make_record(logging.INFO, "last"))
+        handler.close()
+
+        assert stream.getvalue() == "last\n"
+
+    def test_drop_policy_discards_info_when_full(self: Self) -> None:
+        dropped = RECORDS_DROPPED.get(level="INFO")
+        stream = BlockingStream()
+        handler = BatchingStreamHandler(stream, queue_size=1, overflow="drop")
+
+        # The writer takes the first record and blocks writing it; the second fills the queue.
+        handler.handle(make_record(logging.INFO, "written"))
+        stream.writing.wait(timeout=5)
+        handler.handle(make_record(logging.INFO, "queued"))
+        handler.handle(make_record(logging.INFO, "dropped"))
+
+        assert RECORDS_DROPPED.get(level="INFO") == dropped + 1
+
+        stream.release.set()
+        handler.close()
+        assert stream.getvalue() == "written\nqueued\n"
@@ -0,0 +1,94 @@
+from pathlib import Path
+from typing import Self
+
+import pytest
+from focus_api.utils import metrics, prometheus
+
+
+class TestHistogram:
+
+    def test_collect(self: Self) -> None:
+        histogram = metrics.Histogram("test_duration_seconds", "test", buckets=(0.1, 1))
+
+        histogram.observe(0.05, route="/a")
+        histogram.observe(0.5, route="/a")
+        histogram.observe(5, route="/a")
+
+        assert histogram.get_count(route="/a") == 3
+        assert histogram.collect() == [
+            ("test_duration_seconds_bucket", (("route", "/a"), ("le", "0.1")), 1),
+            ("test_duration_seconds_bucket", (("route", "/a"), ("le", "1")), 2),
+            ("test_duration_seconds_bucket", (("route", "/a"), ("le", "+Inf")), 3),
+            ("test_duration_seconds_sum", (("route", "/a"),), 5.55),
+            ("test_duration_seconds_count", (("route", "/a"),), 3),
+        ]
+
+
+class TestPrometheus:
+
+    def test_render(self: Self) -> None:
+        families = prometheus.aggregate(
+            [
+                {
+                    "pid": 1,
+                    "metrics": [
+                        {
+                            "name": "test_total",
+                            "kind": "counter",
+                            "description": "A test",
+                            "samples": [["test_total", [["route", '/"a"']], 2.0]],
+                        }
+                    ],
+                }
+            ]
+        )
+
+        assert prometheus.render(families) == (
+            "# HELP test_total A test\n"
+            "# TYPE test_total counter\n"
+            'test_total{route="/\\"a\\""} 2\n'
+        )
+
+    def test_workers_are_aggregated(
+        self: Self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+        counter = metrics.counter("test_worker_requests_total", "Requests")
+        gauge = metrics.gauge("test_worker_in_flight", "In flight")
+        counter.inc(2)
+        gauge.set(1)
+
+        # A worker which has exited: its counters are kept, its gauges dropped.
+        dead_pid = 2**22 + 1
+        (tmp_path / f"metrics-{dead_pid}.json").write_text(
+            '{"pid": %d, "metrics": ['
+            '{"name": "test_worker_requests_total", "kind": "counter", "description": "Requests",'
+            ' "samples": [["test_worker_requests_total", [], 3]]},'
+            '{"name": "test_worker_in_flight", "kind": "gauge", "description": "In flight",'
+            ' "samples": [["test_worker_in_flight", [], 5]]}]}' % dead_pid
+        )
+
+        output = prometheus.generate_latest()
+
+        assert "\ntest_worker_requests_total 5\n" in output
+        assert "\ntest_worker_in_flight 1\n" in output
+        # Its counters are folded into the retired file, and its own file removed.
+        assert not (tmp_path / f"metrics-{dead_pid}.json").exists()
+        assert (tmp_path / prometheus.RETIRED_FILENAME).exists()
+
+        # Another worker which had the same PID, with a file of its own
+        (tmp_path / f"metrics-{dead_pid}-reused.json").write_text(
+            '{"pid": %d, "metrics": ['
+            '{"name": "test_worker_requests_total", "kind": "counter", "description": "Requests",'
+            ' "samples": [["test_worker_requests_total", [], 4]]}]}' % dead_pid
+        )
+        counter.inc(1)
+
+        output = prometheus.generate_latest()
+
+        assert "\ntest_worker_requests_total 10\n" in output
+        assert "\ntest_worker_in_flight 1\n" in output
+        assert {path.name for path in tmp_path.glob("metrics-*.json")} == {
+            prometheus.get_filename(),
+            prometheus.RETIRED_FILENAME,
+        }
@@ -0,0 +1,106 @@
+import socket
+from typing import Any, List, Self
+
+import pytest
+from focus_api.utils.logging import network
+from urllib3 import connection
+from urllib3.util import connection as connection_util
+
+
+@pytest.fixture
+def lookups(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    """Resolve every host name to 127.0.0.1, recording the names looked up."""
+    lookups: List[str] = []
+    getaddrinfo = socket.getaddrinfo
+
+    def fake_getaddrinfo(host: str, port: int, *args: Any, **kwargs: Any) -> Any:
+        if host != "127.0.0.1":
+            lookups.append(host)
+        return getaddrinfo("127.0.0.1", port, *args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", fake_getaddrinfo)
+    return lookups
+
+
+class TestDnsCache:
+
+    def test_results_are_cached_until_ttl(self: Self, lookups: List[str]) -> None:
+        cache = network.DnsCache(ttl=60)
+        hits = network.DNS_CACHE_LOOKUPS.get(result="hit")
+
+        first = cache.getaddrinfo("service.test", 443)
+        second = cache.getaddrinfo("service.test", 443)
+
+        assert first == second
+        assert lookups == ["service.test"]
+        assert network.DNS_CACHE_LOOKUPS.get(result="hit") == hits + 1
+
+    def test_expired_results_are_resolved_again(self: Self, lookups: List[str]) -> None:
+        cache = network.DnsCache(ttl=0)
+
+        cache.getaddrinfo("service.test", 443)
+        cache.getaddrinfo("service.test", 443)
+
+        assert lookups == ["service.test", "service.test"]
+
+    def test_each_result_is_new_once(self: Self) -> None:
+        cache = network.DnsCache()
+
+        assert cache.is_new_result("service.test", 443, [("10.0.0.1", 443)])
+        assert not cache.is_new_result("service.test", 443, [("10.0.0.1", 443)])
+        assert cache.is_new_result("service.test", 443, [("10.0.0.2", 443)])
+
+    def test_connection_uses_cached_address(
+        self: Self, lookups: List[str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(network, "dns_cache", network.DnsCache())
+        create_connection = network.patch_create_connection(connection_util.create_connection)
+
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            port = server.getsockname()[1]
+            for _ in range(2):
+                create_connection(("service.test", port), timeout=3).close()
+
+        assert lookups == ["service.test"]
+
+    def test_failed_connection_invalidates_cache(
+        self: Self, lookups: List[str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(network, "dns_cache", network.DnsCache())
+        create_connection = network.patch_create_connection(connection_util.create_connection)
+
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            port = server.getsockname()[1]
+        # Nothing is listening on port any more.
+
+        for _ in range(2):
+            with pytest.raises(OSError):
+                create_connection(("service.test", port), timeout=3)
+
+        assert lookups == ["service.test", "service.test"]
+
+    def test_connect_looks_up_once(
+        self: Self, lookups: List[str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        network.init()
+        monkeypatch.setattr(network, "dns_cache", network.DnsCache())
+        misses = network.DNS_CACHE_LOOKUPS.get(result="miss")
+        hits = network.DNS_CACHE_LOOKUPS.get(result="hit")
+
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            http_connection = connection.HTTPConnection("service.test", server.getsockname()[1])
+            http_connection.connect()
+            http_connection.close()
+
+        assert lookups == ["service.test"]
+        assert network.DNS_CACHE_LOOKUPS.get(result="miss") == misses + 1
+        assert network.DNS_CACHE_LOOKUPS.get(result="hit") == hits
+
+    def test_init_patches_once(self: Self) -> None:
+        create_connection = connection_util.create_connection
+        connect = connection.HTTPConnection.connect
+
+        network.init()
+
+        assert connection_util.create_connection is create_connection
+        assert connection.HTTPConnection.connect is connect
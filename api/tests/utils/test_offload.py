@@ -0,0 +1,96 @@
+import asyncio
+import io
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Self
+
+import pytest
+from focus_api.utils.offload import (
+    TASKS,
+    OffloadConfig,
+    OffloadPool,
+    PoolFull,
+    SharedBuffer,
+    TaskTimeout,
+    attach,
+)
+from focus_api.utils.photo_quality import SharedPhoto, check_photos
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + b"\x00\x00\x02\x58\x00\x00\x03\x20"
+
+
+class TestSharedBuffer:
+
+    def test_file_is_read_in_place(self: Self) -> None:
+        data = b"photo" * 1000
+        with SharedBuffer.from_file(io.BytesIO(data), len(data)) as buffer:
+            with attach(buffer.name, buffer.size) as view:
+                assert bytes(view) == data
+
+    def test_check_photos(self: Self) -> None:
+        with SharedBuffer.from_bytes(PNG) as buffer:
+            results = check_photos([SharedPhoto("photo1", buffer.name, buffer.size)])
+
+        assert results["photo1"]["isValid"] is True
+        assert results["photo1"]["contentType"] == "image/png"
+        assert (results["photo1"]["width"], results["photo1"]["height"]) == (600, 800)
+
+
+class TestOffloadPool:
+
+    def test_runs_in_another_process(self: Self) -> None:
+        pool = OffloadPool("test", OffloadConfig(workers=1))
+        try:
+            with SharedBuffer.from_bytes(PNG) as buffer:
+                results = asyncio.run(
+                    pool.run(check_photos, [SharedPhoto("photo1", buffer.name, buffer.size)])
+                )
+        finally:
+            pool.shutdown()
+
+        assert results["photo1"]["isValid"] is True
+        assert pool.in_flight == 0
+
+    def test_rejects_tasks_beyond_queue(self: Self) -> None:
+        pool = OffloadPool("test", OffloadConfig(workers=1, max_queue=1))
+        rejected = TASKS.get(pool="test", result="rejected")
+        try:
+            futures = [pool.submit(time.sleep, 0.5), pool.submit(time.sleep, 0)]
+            assert pool.stats() == {"running": 1, "queued": 1, "utilization": 1.0}
+
+            with pytest.raises(PoolFull) as exception:
+                pool.submit(time.sleep, 0)
+            assert exception.value.retry_after == 1
+            assert TASKS.get(pool="test", result="rejected") == rejected + 1
+
+            for future in futures:
+                future.result()
+        finally:
+            pool.shutdown()
+
+    def test_task_times_out_and_frees_its_process(self: Self) -> None:
+        pool = OffloadPool("test", OffloadConfig(workers=1, timeout=0.2))
+        timeouts = TASKS.get(pool="test", result="timeout")
+        try:
+            with pytest.raises(TaskTimeout):
+                asyncio.run(pool.run(time.sleep, 5))
+
+            assert asyncio.run(pool.run(sum, [1, 2])) == 3
+        finally:
+            pool.shutdown()
+        assert TASKS.get(pool="test", result="timeout") == timeouts + 1
+
+    def test_broken_pool_is_replaced(self: Self) -> None:
+        pool = OffloadPool("test", OffloadConfig(workers=1))
+        broken = TASKS.get(pool="test", result="broken")
+        try:
+            with pytest.raises(BrokenProcessPool):
+                # The pool process exits
+                asyncio.run(pool.run(os._exit, 1))
+
+            assert asyncio.run(pool.run(sum, [1, 2])) == 3
+        finally:
+            pool.shutdown()
+        assert TASKS.get(pool="test", result="broken") == broken + 1
+        assert pool.in_flight == 0
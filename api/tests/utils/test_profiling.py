@@ -0,0 +1,91 @@
+import os
+import pstats
+import threading
+import time
+from pathlib import Path
+from typing import Self
+
+import pytest
+from focus_api.app import create_app
+from focus_api.utils.profiling import (
+    PSTATS,
+    ProfilingConfig,
+    RequestProfiler,
+    StackSampler,
+    create_profiler,
+)
+
+
+def busy_wait(seconds: float) -> None:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+class TestProfiling:
+
+    def test_profiling_is_off_by_default(self: Self) -> None:
+        assert create_profiler(ProfilingConfig()) is None
+        assert create_profiler(ProfilingConfig(directory="/tmp")) is None
+
+    def test_requests_with_token_are_profiled(
+        self: Self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+        monkeypatch.setenv("PROFILE_TOKEN", "secret")
+        test_client = create_app().test_client()
+
+        test_client.get("/v1/health", headers={"X-Profile-Token": "wrong"})
+        assert os.listdir(tmp_path) == []
+
+        response = test_client.get(
+            "/v1/health", headers={"X-Profile-Token": "secret", "X-Request-ID": "abc-123"}
+        )
+
+        assert response.status_code == 200
+        [filename] = os.listdir(tmp_path)
+        assert filename.endswith("-focus_api.controllers.health-abc-123.collapsed")
+
+    def test_sampler_records_request_thread_stacks(self: Self) -> None:
+        thread = threading.Thread(target=busy_wait, args=(0.1,))
+        thread.start()
+        assert thread.ident is not None
+        sampler = StackSampler(thread.ident, 0.001)
+        sampler.start()
+        thread.join()
+        sampler.stop()
+
+        assert sampler.stacks
+        assert all(stack.endswith("test_profiling:busy_wait") for stack in sampler.stacks)
+
+    def test_pstats_profiles_can_be_loaded(self: Self, tmp_path: Path) -> None:
+        profiler = RequestProfiler(
+            ProfilingConfig(directory=str(tmp_path), token="secret", format=PSTATS)
+        )
+
+        profile = profiler.start("operation", {"X-Profile-Token": "secret"})
+        assert profile is not None
+        busy_wait(0.01)
+        profiler.finish(profile)
+
+        [filename] = os.listdir(tmp_path)
+        stats = pstats.Stats(str(tmp_path / filename))
+        assert any(function == "busy_wait" for _, _, function in stats.stats)
+
+    def test_concurrent_profiles_are_capped(self: Self, tmp_path: Path) -> None:
+        profiler = RequestProfiler(ProfilingConfig(directory=str(tmp_path), sample_rate=1))
+
+        profile = profiler.start("operation", {})
+        assert profile is not None
+        assert profiler.start("operation", {}) is None
+        profiler.finish(profile)
+
+        assert profiler.start("operation", {}) is not None
+
+    def test_no_profiles_once_disk_cap_is_reached(self: Self, tmp_path: Path) -> None:
+        (tmp_path / "earlier.collapsed").write_text("x" * 2048)
+        profiler = RequestProfiler(
+            ProfilingConfig(directory=str(tmp_path), sample_rate=1, max_disk_mb=0.001)
+        )
+
+        assert profiler.start("operation", {}) is None
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Self
+
+import pytest
+from focus_api.utils.cache import TTLCache
+from focus_api.utils.deadline import Deadline, current_deadline
+from focus_api.utils.single_flight import SINGLE_FLIGHT_CALLS, SingleFlight
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_one_call(self: Self) -> None:
+        single_flight = SingleFlight("test-threads")
+        started = threading.Event()
+        release = threading.Event()
+        calls: List[int] = []
+
+        def slow_call() -> int:
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 42
+
+        with ThreadPoolExecutor(4) as executor:
+            leader = executor.submit(single_flight.do, "key", slow_call)
+            started.wait(5)
+            followers = [executor.submit(single_flight.do, "key", slow_call) for _ in range(3)]
+            # Let the followers start waiting before the call completes
+            while SINGLE_FLIGHT_CALLS.get(name="test-threads", result="shared") < 3:
+                time.sleep(0.001)
+            release.set()
+
+            results = [leader.result()] + [follower.result() for follower in followers]
+
+        assert results == [42, 42, 42, 42]
+        assert len(calls) == 1
+
+    def test_followers_wait_no_longer_than_their_deadline(self: Self) -> None:
+        single_flight = SingleFlight("test-deadline")
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_call() -> int:
+            started.set()
+            release.wait(5)
+            return 42
+
+        def follow() -> int:
+            current_deadline.set(Deadline(200))
+            return single_flight.do("key", slow_call)
+
+        with ThreadPoolExecutor(2) as executor:
+            leader = executor.submit(single_flight.do, "key", slow_call)
+            started.wait(5)
+            start = time.monotonic()
+            follower = executor.submit(follow)
+            with pytest.raises(TimeoutError):
+                follower.result()
+            waited = time.monotonic() - start
+            release.set()
+
+            assert leader.result() == 42
+        assert waited < 1
+
+    def test_exceptions_are_shared_and_not_cached(self: Self) -> None:
+        single_flight = SingleFlight("test-errors", TTLCache("test-errors", ttl=60))
+
+        def failing_call() -> int:
+            raise ValueError("unavailable")
+
+        with pytest.raises(ValueError):
+            single_flight.do("key", failing_call)
+        assert single_flight.do("key", lambda: 1) == 1
+
+    def test_results_are_cached(self: Self) -> None:
+        single_flight = SingleFlight("test-cache", TTLCache("test-cache", ttl=60))
+        calls: List[int] = []
+
+        def call() -> int:
+            calls.append(1)
+            return len(calls)
+
+        assert single_flight.do("key", call) == 1
+        assert single_flight.do("key", call) == 1
+        assert single_flight.do("other", call) == 2
+        assert SINGLE_FLIGHT_CALLS.get(name="test-cache", result="cached") == 1
+
+    def test_concurrent_coroutines_share_one_call(self: Self) -> None:
+        single_flight = SingleFlight("test-async")
+        calls: List[int] = []
+
+        async def slow_call() -> int:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 42
+
+        async def run() -> List[int]:
+            return await asyncio.gather(
+                *(single_flight.do_async("key", slow_call) for _ in range(4))
+            )
+
+        assert asyncio.run(run()) == [42, 42, 42, 42]
+        assert len(calls) == 1
+
+    def test_coroutine_exceptions_are_shared(self: Self) -> None:
+        single_flight = SingleFlight("test-async-errors")
+
+        async def failing_call() -> int:
+            await asyncio.sleep(0.01)
+            raise ValueError("unavailable")
+
+        async def run() -> List[object]:
+            return await asyncio.gather(
+                *(single_flight.do_async("key", failing_call) for _ in range(2)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+        assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,56 @@
+import os
+import shutil
+from pathlib import Path
+from typing import Self
+
+from focus_api.app import get_specification_path
+from focus_api.utils.spec_cache import SPEC_CACHE_LOADS, load_specification, spec_cache_key
+
+
+class TestSpecCache:
+
+    def test_second_load_is_served_from_cache(self: Self, tmp_path: Path) -> None:
+        hits = SPEC_CACHE_LOADS.get(result="hit")
+        misses = SPEC_CACHE_LOADS.get(result="miss")
+
+        loaded = load_specification(get_specification_path(), cache_dir=str(tmp_path))
+        cached = load_specification(get_specification_path(), cache_dir=str(tmp_path))
+
+        assert SPEC_CACHE_LOADS.get(result="miss") == misses + 1
+        assert SPEC_CACHE_LOADS.get(result="hit") == hits + 1
+        assert cached.spec == loaded.spec
+        assert cached.raw == loaded.raw
+        assert cached.base_path == "/v1"
+
+    def test_changed_spec_is_not_served_from_cache(self: Self, tmp_path: Path) -> None:
+        specification_path = str(tmp_path / "openapi.yaml")
+        shutil.copy(get_specification_path(), specification_path)
+        key = spec_cache_key(specification_path)
+
+        with open(specification_path, "a") as specification_file:
+            specification_file.write("\n# changed\n")
+
+        assert spec_cache_key(specification_path) != key
+
+    def test_unreadable_cache_is_ignored(self: Self, tmp_path: Path) -> None:
+        specification_path = get_specification_path()
+        cache_path = tmp_path / f"openapi-{spec_cache_key(specification_path)}.pickle"
+        cache_path.write_bytes(b"not a pickle")
+
+        specification = load_specification(specification_path, cache_dir=str(tmp_path))
+
+        assert specification.base_path == "/v1"
+        # Replaced with a valid cache
+        assert os.path.getsize(cache_path) > len(b"not a pickle")
+
+    def test_cache_writable_by_others_is_not_loaded(self: Self, tmp_path: Path) -> None:
+        specification_path = get_specification_path()
+        load_specification(specification_path, cache_dir=str(tmp_path))
+        cache_path = tmp_path / f"openapi-{spec_cache_key(specification_path)}.pickle"
+        cache_path.chmod(0o666)
+        hits = SPEC_CACHE_LOADS.get(result="hit")
+
+        specification = load_specification(specification_path, cache_dir=str(tmp_path))
+
+        assert specification.base_path == "/v1"
+        assert SPEC_CACHE_LOADS.get(result="hit") == hits
@@ -0,0 +1,77 @@
+from typing import List, Self
+
+import pytest
+from focus_api.app import build_middleware_stack, create_app
+from focus_api.db.config import DbConfig
+from focus_api.utils import workers
+from focus_api.utils.workers import RssMonitor, connections_per_worker, get_config, size_workers
+
+
+def db_config(pool_size: int = 5, max_overflow: int = 10) -> DbConfig:
+    return DbConfig(
+        connection_string="postgresql+psycopg2://localhost/focus",
+        schema="public",
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+
+
+class TestWorkerSizing:
+
+    def test_one_worker_per_cpu(self: Self) -> None:
+        assert size_workers(4, db_config()) == 4
+
+    def test_workers_capped_by_connection_budget(self: Self) -> None:
+        config = db_config(pool_size=5, max_overflow=5)
+        assert connections_per_worker(config) == 21
+
+        assert size_workers(8, config, max_connections=100) == 4
+        assert size_workers(8, config, max_connections=10) == 1
+
+    def test_cgroup_quota_caps_usable_cpus(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(workers, "read_cgroup_cpu_limit", lambda: 1.5)
+
+        assert workers.usable_cpus() <= 2
+
+    def test_config_from_environment(self: Self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("WEB_CONCURRENCY", "3")
+        monkeypatch.delenv("APP_THREADS", raising=False)
+        monkeypatch.setenv("WORKER_MAX_REQUESTS", "500")
+        monkeypatch.setenv("WORKER_MAX_RSS_MB", "512")
+
+        config = get_config(db_config(pool_size=4, max_overflow=2))
+
+        assert config.workers == 3
+        assert config.threads == 6
+        assert config.max_requests == 500
+        assert config.max_rss_mb == 512
+
+
+class TestRssMonitor:
+
+    def test_calls_back_over_limit(self: Self) -> None:
+        exceeded: List[int] = []
+
+        under = RssMonitor(1024 * 1024, 1, exceeded.append)
+        over = RssMonitor(1, 1, exceeded.append)
+
+        assert not under.check()
+        assert over.check()
+        assert len(exceeded) == 1
+        assert exceeded[0] > 1024 * 1024
+
+
+class TestPreload:
+
+    def test_app_threads_and_prebuilt_middleware_stack(
+        self: Self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("APP_THREADS", "7")
+        app = create_app(lazy=True)
+
+        build_middleware_stack(app)
+
+        assert app.middleware.middleware_stack is not None
+        assert app._middleware_app.asgi_app.executor._max_workers == 7
+        response = app.test_client().get("/v1/openapi.json")
+        assert response.status_code == 200